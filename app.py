@@ -1,23 +1,38 @@
 import logging
 import json
-from flask import Flask, request, jsonify, make_response
-from flask_mail import Mail, Message
+from flask import Flask, request, jsonify, make_response, send_file, has_request_context
 import requests
-from urllib.parse import quote_plus
+from urllib.parse import quote, quote_plus
 from functools import wraps
-from sqlalchemy import create_engine
 from time import sleep
-import pandas as pd
-from apscheduler.schedulers.background import BackgroundScheduler
 import os
 from dotenv import load_dotenv
 import re
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import time
 import threading
 import uuid
+import hashlib
+import gzip
+from collections import Counter, OrderedDict, deque
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FuturesTimeout
 import pytz
+import math
+from array import array
+from contextlib import contextmanager
+import cProfile
+import pstats
+import io
+import tempfile
+import atexit
+import fcntl
+import signal
+import socket
+import click
 from datetime import datetime
+# pandas, SQLAlchemy, APScheduler and Flask-Mail are imported where they are used, so a worker
+# serving tool calls starts without loading the analytics stack
 
 class BDTimeFormatter(logging.Formatter):
     def formatTime(self, record, datefmt=None):
@@ -44,6 +59,11 @@ logger.handlers = []  # Remove default handlers
 logger.addHandler(stream_handler)
 # logger.addHandler(file_handler)  # Uncomment to enable file logging
 
+try:
+    import orjson
+except ImportError:  # falls back to Flask's stdlib JSON
+    orjson = None
+
 load_dotenv()
 app = Flask(__name__)
 
@@ -56,7 +76,31 @@ app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
 app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 
-mail = Mail(app)
+_mail = None
+
+def get_mail():
+    """The Flask-Mail extension, set up on first use."""
+    global _mail
+    if _mail is None:
+        from flask_mail import Mail
+        _mail = Mail(app)
+    return _mail
+
+class OrjsonMixin:
+    """JSON provider methods backed by orjson, which serializes several times faster than the stdlib."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=str).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+if orjson is not None:
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(OrjsonMixin, DefaultJSONProvider):
+        pass
+
+    app.json = OrjsonProvider(app)
 
 background_tasks = {}
 
@@ -72,6 +116,7 @@ OUT_ENG_AGENT_ID = os.getenv("OUT_ENG_AGENT_ID")
 OUT_BN_AGENT_ID = os.getenv("OUT_BN_AGENT_ID")
 OUT_ENG_AGENT_PHONE_NUMBER = os.getenv("OUT_ENG_AGENT_PHONE_NUMBER")
 AUTH_TOKEN = os.getenv("AUTH_TOKEN")
+VERBEX_API_BASE_URL = os.getenv("VERBEX_API_BASE_URL", "https://api.verbex.ai")
 
 # Database Configuration
 DB_URI = os.getenv("DB_URI")
@@ -87,6 +132,123 @@ SALESFORCE_INSTANCE_URL = os.getenv("SALESFORCE_INSTANCE_URL")
 # APScheduler
 SYNC_INTERVAL_MINUTES = int(os.getenv("SYNC_INTERVAL_MINUTES")) 
 
+# Upstream latency budgets
+# ROUTE_BUDGETS overrides per route, e.g. "/products=3,/get-case-info=2.5" (seconds)
+ROUTE_BUDGETS = {
+    route.strip(): float(seconds)
+    for route, seconds in (item.split("=", 1) for item in os.getenv("ROUTE_BUDGETS", "").split(",") if "=" in item)
+}
+DEFAULT_ROUTE_BUDGET_SECONDS = float(os.getenv("DEFAULT_ROUTE_BUDGET_SECONDS", 8))
+TOOL_ROUTES = {
+    "/products", "/product-order", "/salesforce-account", "/create-salesforce-ticket", "/get-case-info",
+    "/salesforce-tickets", "/trigger-obd-closed-case", "/log-callback", "/store-rating-and-comments", "/batch"
+}
+UPSTREAM_CONNECT_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_SECONDS", 3))
+UPSTREAM_TIMEOUT_SECONDS = float(os.getenv("UPSTREAM_TIMEOUT_SECONDS", 30))
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", 32))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+HEDGE_DELAY_SECONDS = float(os.getenv("HEDGE_DELAY_SECONDS", 0.5))
+HEDGE_POOL_SIZE = int(os.getenv("HEDGE_POOL_SIZE", 32))
+
+# Salesforce case lookup cache
+CASE_CACHE_TTL_SECONDS = int(os.getenv("CASE_CACHE_TTL_SECONDS", 60))
+CASE_CACHE_MAX_ENTRIES = int(os.getenv("CASE_CACHE_MAX_ENTRIES", 2048))
+CASE_CACHE_STALE_SECONDS = int(os.getenv("CASE_CACHE_STALE_SECONDS", 900))
+
+# Response compression
+GZIP_MIN_BYTES = int(os.getenv("GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", 5))
+
+# Idempotent writes
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 3600))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 4096))
+
+# Upstream auth token reuse
+SALESFORCE_TOKEN_TTL_SECONDS = int(os.getenv("SALESFORCE_TOKEN_TTL_SECONDS", 900))
+MAGENTO_TOKEN_TTL_SECONDS = int(os.getenv("MAGENTO_TOKEN_TTL_SECONDS", 1800))
+
+# Local product catalog index
+CATALOG_INDEX_ENABLED = os.getenv("CATALOG_INDEX_ENABLED", "true").lower() == "true"
+CATALOG_REFRESH_MINUTES = int(os.getenv("CATALOG_REFRESH_MINUTES", 15))
+CATALOG_FULL_REFRESH_HOURS = int(os.getenv("CATALOG_FULL_REFRESH_HOURS", 24))
+CATALOG_PAGE_SIZE = int(os.getenv("CATALOG_PAGE_SIZE", 500))
+CATALOG_MAX_RESULTS = int(os.getenv("CATALOG_MAX_RESULTS", 10))
+CATALOG_MIN_MATCH = float(os.getenv("CATALOG_MIN_MATCH", 0.6))
+
+# Bulk stock snapshot
+STOCK_SNAPSHOT_ENABLED = os.getenv("STOCK_SNAPSHOT_ENABLED", "true").lower() == "true"
+STOCK_REFRESH_SECONDS = int(os.getenv("STOCK_REFRESH_SECONDS", 60))
+STOCK_MAX_STALENESS_SECONDS = int(os.getenv("STOCK_MAX_STALENESS_SECONDS", 300))
+STOCK_PAGE_SIZE = int(os.getenv("STOCK_PAGE_SIZE", 1000))
+STOCK_SOURCE_CODE = os.getenv("STOCK_SOURCE_CODE", "default")
+
+# Parquet snapshots for analytics (disabled unless a directory is set)
+PARQUET_EXPORT_DIR = os.getenv("PARQUET_EXPORT_DIR")
+PARQUET_COMPRESSION = os.getenv("PARQUET_COMPRESSION", "zstd")
+PARQUET_COMPACT_MINUTES = int(os.getenv("PARQUET_COMPACT_MINUTES", 60))
+
+# Write-behind buffer for /log-callback (disabled unless a directory is set)
+CALLBACK_BUFFER_DIR = os.getenv("CALLBACK_BUFFER_DIR")
+CALLBACK_FLUSH_ROWS = int(os.getenv("CALLBACK_FLUSH_ROWS", 200))
+CALLBACK_FLUSH_SECONDS = float(os.getenv("CALLBACK_FLUSH_SECONDS", 1))
+
+# Call-start prefetch
+PREFETCH_POOL_SIZE = int(os.getenv("PREFETCH_POOL_SIZE", 8))
+PREFETCH_MAX_IN_FLIGHT = int(os.getenv("PREFETCH_MAX_IN_FLIGHT", 64))
+
+# Batch tool calls
+BATCH_MAX_CALLS = int(os.getenv("BATCH_MAX_CALLS", 10))
+BATCH_POOL_SIZE = int(os.getenv("BATCH_POOL_SIZE", 16))
+
+# Threads running the Flask routes that asgi.py passes through
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", 32))
+
+# Circuit breakers (per upstream operation)
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", 0.5))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("BREAKER_SLOW_CALL_SECONDS", 5))
+BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", 30))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", 1))
+
+# Salesforce API budget: background jobs slow down below SLOWDOWN and pause below RESERVE (% of the daily limit left)
+SALESFORCE_API_SLOWDOWN_PERCENT = float(os.getenv("SALESFORCE_API_SLOWDOWN_PERCENT", 25))
+SALESFORCE_API_RESERVE_PERCENT = float(os.getenv("SALESFORCE_API_RESERVE_PERCENT", 10))
+SALESFORCE_API_THROTTLE_SECONDS = float(os.getenv("SALESFORCE_API_THROTTLE_SECONDS", 2))
+SALESFORCE_API_INFO_MAX_AGE_SECONDS = int(os.getenv("SALESFORCE_API_INFO_MAX_AGE_SECONDS", 900))
+
+# Salesforce Case change events (optional)
+CASE_CDC_ENABLED = os.getenv("CASE_CDC_ENABLED", "false").lower() == "true"
+CASE_CDC_CHANNEL = os.getenv("CASE_CDC_CHANNEL", "/data/CaseChangeEvent")
+CASE_CDC_INITIAL_REPLAY_ID = int(os.getenv("CASE_CDC_INITIAL_REPLAY_ID", -1))
+CASE_CDC_POLL_TIMEOUT_SECONDS = float(os.getenv("CASE_CDC_POLL_TIMEOUT_SECONDS", 130))
+CASE_RECONCILE_MINUTES = int(os.getenv("CASE_RECONCILE_MINUTES", 1440))
+
+# Call store partitioning / retention
+CALL_PARTITION_BY_MONTH = os.getenv("CALL_PARTITION_BY_MONTH", "false").lower() == "true"
+CALL_RETENTION_MONTHS = int(os.getenv("CALL_RETENTION_MONTHS", 0))
+ROLLUP_TIMEZONE = os.getenv("ROLLUP_TIMEZONE", "Asia/Dhaka")
+
+# Call-ended webhook; with it, the interval call sync is only a reconciliation and can run rarely
+CALL_SYNC_INTERVAL_MINUTES = int(os.getenv("CALL_SYNC_INTERVAL_MINUTES", SYNC_INTERVAL_MINUTES))
+CALL_ANALYSIS_RETRY_SECONDS = float(os.getenv("CALL_ANALYSIS_RETRY_SECONDS", 60))
+CALL_ANALYSIS_RETRIES = int(os.getenv("CALL_ANALYSIS_RETRIES", 3))
+
+# Call sync job queue; every process (or dedicated `flask sync-worker` node) claims per-agent jobs from Postgres
+CALL_SYNC_WORKERS = int(os.getenv("CALL_SYNC_WORKERS", 2))
+CALL_SYNC_LEASE_SECONDS = int(os.getenv("CALL_SYNC_LEASE_SECONDS", 300))
+CALL_SYNC_HEARTBEAT_SECONDS = float(os.getenv("CALL_SYNC_HEARTBEAT_SECONDS", 60))
+CALL_SYNC_POLL_SECONDS = float(os.getenv("CALL_SYNC_POLL_SECONDS", 15))
+CALL_SYNC_RETRY_SECONDS = float(os.getenv("CALL_SYNC_RETRY_SECONDS", 60))
+
+# Historical call backfill
+BACKFILL_PAGE_SIZE = int(os.getenv("BACKFILL_PAGE_SIZE", 100))
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", 4))
+BACKFILL_ANALYSIS_RATE_PER_SECOND = float(os.getenv("BACKFILL_ANALYSIS_RATE_PER_SECOND", 3))
+
+# Sync profiling
+SYNC_PROFILE_DIR = os.getenv("SYNC_PROFILE_DIR", tempfile.gettempdir())
+
 # Log every access
 @app.before_request
 def log_access():
@@ -101,35 +263,621 @@ def log_request_input(endpoint_name):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            import time
-            data = request.get_json()
-            try:
-                pretty_request = json.dumps(data, indent=2, ensure_ascii=False)
-            except Exception:
-                pretty_request = str(data)
+            # Bodies are logged as received/sent; parsing and pretty-printing them again costs more than the request
             colored_endpoint = f"{COLOR_BLUE}{endpoint_name}{COLOR_RESET}"
-            logger.info(f"[{colored_endpoint}] Request: {pretty_request}")
+            logger.info(f"[{colored_endpoint}] Request: {request.get_data(as_text=True)}")
 
             start_time = time.perf_counter()
-            response = func(*args, **kwargs)
+            response = make_response(func(*args, **kwargs))
             elapsed = time.perf_counter() - start_time
 
-            resp = make_response(response)
-            try:
-                resp_data = resp.get_data(as_text=True)
-                pretty_response = json.dumps(json.loads(resp_data), indent=2, ensure_ascii=False)
-            except Exception:
-                pretty_response = resp_data
-            logger.info(f"[{COLOR_GREEN}{endpoint_name}{COLOR_RESET}] Response: {pretty_response}")
+            logger.info(f"[{COLOR_GREEN}{endpoint_name}{COLOR_RESET}] Response: {response.get_data(as_text=True)}")
             logger.info(f"[{COLOR_YELLOW}{endpoint_name}{COLOR_RESET}] Response Took: {elapsed:.3f} seconds.")
 
             return response
         return wrapper
     return decorator
 
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The request's latency budget ran out before an upstream call could be made."""
+
+# Deadline (time.monotonic() value) of the tool request being served in this context, if any
+request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+# Background job (e.g. "fetch_salesforce_cases") running in this context, if any
+api_job = contextvars.ContextVar("api_job", default=None)
+
+_upstream_sessions = {}
+_upstream_sessions_lock = threading.Lock()
+_upstream_latencies = {}
+_hedge_pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix="hedge")
+
+def route_budget(path):
+    """Latency budget (seconds) for a route: ROUTE_BUDGETS overrides, else the default for tool routes."""
+    if path in ROUTE_BUDGETS:
+        return ROUTE_BUDGETS[path]
+    if path in TOOL_ROUTES:
+        return DEFAULT_ROUTE_BUDGET_SECONDS
+    return None
+
+@app.before_request
+def start_request_deadline():
+    budget = route_budget(request.path)
+    request.deadline_token = request_deadline.set(time.monotonic() + budget if budget else None)
+
+@app.teardown_request
+def clear_request_deadline(exc=None):
+    token = getattr(request, "deadline_token", None)
+    if token is not None:
+        request_deadline.reset(token)
+
+def should_gzip(response, accept_encoding):
+    return (
+        GZIP_MIN_BYTES > 0
+        and "gzip" in (accept_encoding or "").lower()
+        and response.mimetype == "application/json"
+        and 200 <= response.status_code < 300
+        and "Content-Encoding" not in response.headers
+        and (response.content_length or 0) >= GZIP_MIN_BYTES
+    )
+
+def gzip_headers(response, data):
+    response.headers["Content-Encoding"] = "gzip"
+    response.headers["Content-Length"] = str(len(data))
+    response.vary.add("Accept-Encoding")
+
+@app.after_request
+def compress_response(response):
+    """Gzips JSON responses of at least GZIP_MIN_BYTES (e.g. long ticket lists) for clients that accept it."""
+    if response.direct_passthrough or not should_gzip(response, request.headers.get("Accept-Encoding")):
+        return response
+    data = gzip.compress(response.get_data(), compresslevel=GZIP_LEVEL)
+    response.set_data(data)
+    gzip_headers(response, data)
+    return response
+
+def upstream_session(operation):
+    """One pooled session per upstream (magento, salesforce, verbex), shared by all threads."""
+    upstream = operation.split(".", 1)[0]
+    with _upstream_sessions_lock:
+        session = _upstream_sessions.get(upstream)
+        if session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=UPSTREAM_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _upstream_sessions[upstream] = session
+        return session
+
+def upstream_timeout():
+    """(connect, read) timeout for the next upstream call, cut down to what is left of the request's budget."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return (UPSTREAM_CONNECT_TIMEOUT_SECONDS, UPSTREAM_TIMEOUT_SECONDS)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request latency budget exhausted before calling upstream")
+    return (min(UPSTREAM_CONNECT_TIMEOUT_SECONDS, remaining), remaining)
+
+def record_latency(operation, seconds):
+    samples = _upstream_latencies.get(operation)
+    if samples is None:
+        samples = _upstream_latencies.setdefault(operation, deque(maxlen=200))
+    samples.append(seconds)
+
+def hedge_delay(operation):
+    """p95 latency of recent calls to `operation`, or HEDGE_DELAY_SECONDS until enough samples exist."""
+    samples = sorted(_upstream_latencies.get(operation, ()))
+    if len(samples) < 20:
+        return HEDGE_DELAY_SECONDS
+    return samples[int(len(samples) * 0.95) - 1]
+
+def _send(method, url, operation, kwargs):
+    started = time.perf_counter()
+    count_sync_upstream_call(operation)
+    response = upstream_session(operation).request(method, url, timeout=upstream_timeout(), **kwargs)
+    record_latency(operation, time.perf_counter() - started)
+    if operation.startswith("salesforce."):
+        salesforce_budget.record(operation, api_consumer(), response.headers.get("Sforce-Limit-Info"))
+    return response
+
+def _close_response(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+def _hedged_send(method, url, operation, kwargs):
+    """
+    Sends the request and, if it is still outstanding after the p95 delay, a duplicate.
+    The first successful response wins; the loser's response is closed when it arrives.
+    """
+    primary = _hedge_pool.submit(contextvars.copy_context().run, _send, method, url, operation, kwargs)
+    delay = hedge_delay(operation)
+    try:
+        return primary.result(timeout=delay)
+    except FuturesTimeout:
+        pass
+    deadline = request_deadline.get()
+    if deadline is not None and deadline - time.monotonic() <= delay:
+        return primary.result()
+
+    hedge = _hedge_pool.submit(contextvars.copy_context().run, _send, method, url, operation, kwargs)
+    done, _ = wait([primary, hedge], return_when=FIRST_COMPLETED)
+    first = done.pop()
+    other = hedge if first is primary else primary
+    if first.exception() is None:
+        other.add_done_callback(_close_response)
+        return first.result()
+    return other.result()
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream operation whose circuit breaker is open."""
+    def __init__(self, operation, retry_after):
+        super().__init__(f"Circuit for '{operation}' is open; retry in {retry_after:.0f}s")
+        self.operation = operation
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last BREAKER_WINDOW calls to one upstream operation.
+    Opens when the share of failures (errors, 5xx or calls slower than BREAKER_SLOW_CALL_SECONDS)
+    reaches BREAKER_FAILURE_RATE; after BREAKER_OPEN_SECONDS it lets BREAKER_HALF_OPEN_PROBES calls
+    through and closes again on the first success.
+    """
+    def __init__(self, operation):
+        self.operation = operation
+        self.state = "closed"
+        self.opened_at = None
+        self.probes_in_flight = 0
+        self.outcomes = deque(maxlen=BREAKER_WINDOW)
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == "open":
+                retry_after = self.opened_at + BREAKER_OPEN_SECONDS - time.monotonic()
+                if retry_after > 0:
+                    raise CircuitOpenError(self.operation, retry_after)
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self.probes_in_flight >= BREAKER_HALF_OPEN_PROBES:
+                    raise CircuitOpenError(self.operation, BREAKER_OPEN_SECONDS)
+                self.probes_in_flight += 1
+
+    def record(self, success):
+        with self._lock:
+            if self.state == "half_open":
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+                if success:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if self.state == "closed" and len(self.outcomes) >= BREAKER_MIN_CALLS \
+                    and failures / len(self.outcomes) >= BREAKER_FAILURE_RATE:
+                self._open()
+
+    def release(self):
+        """The call never reached the upstream (e.g. no budget left), so it says nothing about its health."""
+        with self._lock:
+            if self.state == "half_open":
+                self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        print(f"[BREAKER] Circuit for '{self.operation}' opened.")
+
+    def snapshot(self):
+        with self._lock:
+            outcomes = list(self.outcomes)
+            return {
+                "state": self.state,
+                "calls_in_window": len(outcomes),
+                "failure_rate": round(outcomes.count(False) / len(outcomes), 3) if outcomes else 0.0
+            }
+
+circuit_breakers = {}
+_circuit_breakers_lock = threading.Lock()
+
+class SalesforceBudgetExhausted(Exception):
+    """Raised instead of a background job's Salesforce call while the daily API budget is in reserve."""
+    def __init__(self, job, remaining_percent):
+        super().__init__(f"Salesforce API budget is down to {remaining_percent:.1f}%; '{job}' is paused")
+        self.job = job
+        self.remaining_percent = remaining_percent
+
+class SalesforceApiBudget:
+    """
+    Salesforce's daily API usage as last reported in the `Sforce-Limit-Info` header, plus our own
+    calls per endpoint or background job. Background jobs are slowed down, then paused, as the
+    remaining budget falls, so interactive tool calls keep their headroom.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.used = None
+        self.limit = None
+        self.observed_at = None
+        self.calls_by_consumer = Counter()
+        self.calls_by_operation = Counter()
+        self.throttled = Counter()
+        self.paused = Counter()
+
+    def record(self, operation, consumer, limit_info):
+        match = re.search(r"(?:^|[;,\s])api-usage=(\d+)/(\d+)", limit_info or "")
+        with self._lock:
+            self.calls_by_consumer[consumer] += 1
+            self.calls_by_operation[operation] += 1
+            if match:
+                self.used, self.limit = int(match.group(1)), int(match.group(2))
+                self.observed_at = time.monotonic()
+
+    def remaining_percent(self):
+        """Share of the daily limit left, or None when Salesforce has not told us recently."""
+        with self._lock:
+            if not self.limit or time.monotonic() - self.observed_at > SALESFORCE_API_INFO_MAX_AGE_SECONDS:
+                return None
+            return 100 * (self.limit - self.used) / self.limit
+
+    def before_background_call(self, job):
+        remaining = self.remaining_percent()
+        if remaining is None:
+            return
+        if remaining < SALESFORCE_API_RESERVE_PERCENT:
+            with self._lock:
+                self.paused[job] += 1
+            raise SalesforceBudgetExhausted(job, remaining)
+        if remaining < SALESFORCE_API_SLOWDOWN_PERCENT:
+            with self._lock:
+                self.throttled[job] += 1
+            sleep(SALESFORCE_API_THROTTLE_SECONDS)
+
+    def snapshot(self):
+        remaining = self.remaining_percent()
+        with self._lock:
+            return {
+                "used": self.used,
+                "limit": self.limit,
+                "remaining_percent": round(remaining, 2) if remaining is not None else None,
+                "calls_by_consumer": dict(self.calls_by_consumer),
+                "calls_by_operation": dict(self.calls_by_operation),
+                "throttled_calls": dict(self.throttled),
+                "paused_calls": dict(self.paused)
+            }
+
+salesforce_budget = SalesforceApiBudget()
+
+def api_consumer():
+    """Who a Salesforce call is made for: the background job, else the route being served."""
+    job = api_job.get()
+    if job:
+        return job
+    return request.path if has_request_context() else "other"
+
+def background_job(name):
+    """Labels a job's upstream calls with `name`, so they are counted and budgeted as background work."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            token = api_job.set(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                api_job.reset(token)
+        return wrapper
+    return decorator
+
+def circuit_breaker(operation):
+    with _circuit_breakers_lock:
+        breaker = circuit_breakers.get(operation)
+        if breaker is None:
+            breaker = circuit_breakers[operation] = CircuitBreaker(operation)
+        return breaker
+
+def upstream_request(method, url, operation, hedge=False, **kwargs):
+    """
+    Single entry point for outbound HTTP. Fails fast while the operation's circuit is open,
+    applies the remaining request budget as the timeout, reuses pooled connections, and hedges
+    idempotent GETs when HEDGE_ENABLED and a budget is active.
+    """
+    job = api_job.get()
+    # OAuth token requests do not count against the API limit
+    if job and operation.startswith("salesforce.") and not operation.endswith(".token"):
+        salesforce_budget.before_background_call(job)
+    breaker = circuit_breaker(operation)
+    breaker.before_call()
+    started = time.perf_counter()
+    try:
+        if hedge and HEDGE_ENABLED and method == "GET" and request_deadline.get() is not None:
+            response = _hedged_send(method, url, operation, kwargs)
+        else:
+            response = _send(method, url, operation, kwargs)
+    except DeadlineExceeded:
+        breaker.release()
+        raise
+    except requests.exceptions.RequestException:
+        breaker.record(False)
+        raise
+    breaker.record(response.status_code < 500 and time.perf_counter() - started < BREAKER_SLOW_CALL_SECONDS)
+
+    # Tokens are cached across requests; when one has expired, fetch a fresh one and retry once
+    upstream = operation.split(".", 1)[0]
+    if response.status_code == 401 and upstream in ("salesforce", "magento") \
+            and not operation.endswith(".token") and "Authorization" in kwargs.get("headers", {}):
+        token = get_salesforce_token(refresh=True) if upstream == "salesforce" else get_magento_token(refresh=True)
+        if token:
+            response.close()
+            kwargs["headers"] = {**kwargs["headers"], "Authorization": f"Bearer {token}"}
+            response = _send(method, url, operation, kwargs)
+    return response
+
+# What the voice agent can say when an upstream is failing fast
+UPSTREAM_NAMES = {
+    "magento": "our product catalogue",
+    "salesforce": "our customer records system",
+    "verbex": "our calling system"
+}
+
+def circuit_open_body(e):
+    upstream = e.operation.split(".", 1)[0]
+    return {
+        "error": "Upstream temporarily unavailable",
+        "upstream": upstream,
+        "operation": e.operation,
+        "retry_after_seconds": round(e.retry_after),
+        "message": f"Sorry, {UPSTREAM_NAMES.get(upstream, 'one of our systems')} is not responding right now. "
+                   "Please try again in a few minutes."
+    }
+
+@app.errorhandler(CircuitOpenError)
+def circuit_open_response(e):
+    response = jsonify(circuit_open_body(e))
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, round(e.retry_after)))
+    return response
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller runs the function,
+    callers arriving while it is in flight wait for it and receive the same result (or exception).
+    Nothing is kept once the call finishes, so results are never stale.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = {"done": threading.Event(), "result": None, "error": None}
+                self.executed += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            flight["done"].wait()
+            if flight["error"] is not None:
+                raise flight["error"]
+            return flight["result"]
+
+        try:
+            flight["result"] = fn()
+            return flight["result"]
+        except BaseException as e:
+            flight["error"] = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            flight["done"].set()
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache whose entries expire after `ttl_seconds`.
+    Entries carry tags (e.g. "case:00001001", "phone:017..."); invalidating a tag drops every entry
+    holding it and refuses later writes of values that were loaded before the invalidation.
+    """
+    def __init__(self, ttl_seconds, max_entries, stale_seconds=0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._invalidated = {}
+        self._seq = 0
+        self.hits = 0
+        self.misses = 0
+
+    def token(self):
+        """Marks the start of a load; pass it to `set` so loads that raced an invalidation are dropped."""
+        with self._lock:
+            return self._seq
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            now = time.monotonic()
+            if entry is None or entry[0] < now:
+                # Expired entries stay around for `get_stale` until the stale window passes as well
+                if entry is not None and entry[0] + self.stale_seconds < now:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def contains(self, key):
+        """Whether `key` holds a fresh entry, without counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry[0] >= time.monotonic()
+
+    def get_stale(self, key):
+        """Last value for `key`, even if expired (within `stale_seconds`), for use while upstream is down."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] + self.stale_seconds < time.monotonic():
+                return None
+            return entry[1]
+
+    def invalidated_since(self, tags, token):
+        with self._lock:
+            return any(self._invalidated.get(tag, (-1, 0))[0] >= token for tag in tags)
+
+    def set(self, key, value, tags, token):
+        with self._lock:
+            if any(self._invalidated.get(tag, (-1, 0))[0] >= token for tag in tags):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value, set(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *tags):
+        tags = set(tags)
+        with self._lock:
+            now = time.monotonic()
+            for tag in tags:
+                self._invalidated[tag] = (self._seq, now)
+            self._seq += 1
+            for key in [k for k, entry in self._entries.items() if entry[2] & tags]:
+                del self._entries[key]
+            # A load older than the TTL has long finished, so older invalidation marks can go
+            if len(self._invalidated) > self.max_entries:
+                horizon = now - 2 * self.ttl_seconds
+                self._invalidated = {t: mark for t, mark in self._invalidated.items() if mark[1] >= horizon}
+
+# Shared by the read-only tool endpoints; results are plain (body, status) tuples and must not be mutated
+upstream_flights = SingleFlight()
+case_cache = TTLCache(CASE_CACHE_TTL_SECONDS, CASE_CACHE_MAX_ENTRIES, CASE_CACHE_STALE_SECONDS)
+
+# First responses of idempotent writes, by key; in-flight duplicates wait on `idempotency_flights`
+idempotency_store = TTLCache(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES)
+idempotency_flights = SingleFlight()
+
+def idempotency_key(path, headers, data):
+    """
+    (key, fingerprint) of a write request: the `Idempotency-Key` header if sent, else derived from the
+    payload's `call_id` and the payload itself. None when the request carries neither.
+    """
+    fingerprint = hashlib.sha256(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+    key = headers.get("Idempotency-Key")
+    if key:
+        return (path, "key", key), fingerprint
+    if isinstance(data, dict) and data.get("call_id"):
+        return (path, "payload", fingerprint), fingerprint
+    return None
+
+def idempotency_conflict():
+    return {"error": "Idempotency-Key was already used with a different request body"}, 422
+
+def idempotent(func):
+    """
+    Runs a write endpoint once per idempotency key: duplicates get the stored first response
+    (marked `Idempotent-Replayed: true`), and duplicates arriving while it runs wait for it.
+    5xx responses are not stored, so a failed write can be retried.
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        identity = idempotency_key(request.path, request.headers, request.get_json(silent=True))
+        if identity is None:
+            return func(*args, **kwargs)
+        key, fingerprint = identity
+
+        ran_here = []
+        def run():
+            entry = idempotency_store.get(key)
+            if entry is not None:
+                return entry
+            ran_here.append(True)
+            response = app.make_response(func(*args, **kwargs))
+            entry = {"status": response.status_code, "body": response.get_data(),
+                     "mimetype": response.mimetype, "fingerprint": fingerprint}
+            if response.status_code < 500:
+                idempotency_store.set(key, entry, [], idempotency_store.token())
+            return entry
+
+        entry = idempotency_store.get(key) or idempotency_flights.do(key, run)
+        if entry["fingerprint"] != fingerprint:
+            body, status = idempotency_conflict()
+            return jsonify(body), status
+        response = app.response_class(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+        if not ran_here:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+    return wrapper
+
+def case_tags(body):
+    """Cache tags of a Salesforce case lookup result: one per CaseNumber it contains."""
+    records = body.get("tickets", [body]) if isinstance(body, dict) else []
+    return [f"case:{record['CaseNumber']}" for record in records if record.get("CaseNumber")]
+
+def cached_case_lookup(key, tags, loader):
+    """
+    Serves a Salesforce case lookup from `case_cache`, loading it through `upstream_flights` on a miss.
+    Only successful results are cached. A caller that joined a load which raced an invalidation
+    of the same case or phone loads again instead of returning pre-write data. While the Salesforce
+    circuit is open, an expired entry is served if one is still held.
+    """
+    cached = case_cache.get(key)
+    if cached is not None:
+        return cached
+
+    def load():
+        token = case_cache.token()
+        result = loader()
+        if result[1] == 200:
+            case_cache.set(key, result, tags + case_tags(result[0]), token)
+        return token, result
+
+    try:
+        for _ in range(2):
+            token, result = upstream_flights.do(key, load)
+            if not case_cache.invalidated_since(tags + case_tags(result[0]), token):
+                break
+    except CircuitOpenError:
+        # Salesforce is failing fast; an expired (but never invalidated) answer beats no answer
+        stale = case_cache.get_stale(key)
+        if stale is None:
+            raise
+        return stale
+    return result
+
+def invalidate_case(case_number=None, phone=None):
+    """Drops cached lookups for a case we just changed (and ticket lists of its account's phone)."""
+    tags = []
+    if case_number:
+        tags.append(f"case:{str(case_number).zfill(8)}")
+    if phone:
+        tags.append(f"phone:{phone}")
+    if tags:
+        case_cache.invalidate(*tags)
+
 @app.route("/", methods=["GET"])
 def health_check():
-    return jsonify({"status": "API is running"}), 200
+    breakers = {operation: breaker.snapshot() for operation, breaker in list(circuit_breakers.items())}
+    stock_age = stock_snapshot.age_seconds()
+    return jsonify({
+        "status": "API is running",
+        "degraded_upstreams": sorted(op for op, snapshot in breakers.items() if snapshot["state"] != "closed"),
+        "circuit_breakers": breakers,
+        "catalog_products": len(catalog_index.products),
+        "stock_snapshot": {
+            "skus": len(stock_snapshot),
+            "age_seconds": round(stock_age, 1) if stock_age is not None else None
+        }
+    }), 200
+
+@app.route("/salesforce-api-usage", methods=["GET"])
+def get_salesforce_api_usage():
+    return jsonify(salesforce_budget.snapshot()), 200
 
 @app.route("/test-email", methods=["POST"])
 @log_request_input("/test-email")
@@ -140,6 +888,7 @@ def test_email():
     if not email:
         return jsonify({"error": "Missing 'email' in request body"}), 400
     try:
+        from flask_mail import Message
         msg = Message(
             subject="Test Email from Verbex Wrapper API",
             recipients=[email],
@@ -154,12 +903,36 @@ Best regards,
 Support Team
 """
         )
-        mail.send(msg)
+        get_mail().send(msg)
         return jsonify({"message": f"Test email sent to {email}"}), 200
     except Exception as e:
         return jsonify({"error": f"Failed to send email: {str(e)}"}), 500
 
-def get_magento_token():
+# Access tokens shared by all requests: name -> (token, expires_at)
+_auth_tokens = {}
+
+def cached_token(name, ttl_seconds, fetch, refresh=False):
+    """
+    Returns a cached access token, fetching it (once, however many threads ask) when missing,
+    expired or `refresh` is set. Failed fetches (None) are not cached.
+    """
+    cached = _auth_tokens.get(name)
+    if cached and not refresh and cached[1] > time.monotonic():
+        return cached[0]
+    if refresh:
+        _auth_tokens.pop(name, None)
+    token = upstream_flights.do(("auth-token", name), fetch)
+    if token:
+        _auth_tokens[name] = (token, time.monotonic() + ttl_seconds)
+    return token
+
+def get_magento_token(refresh=False):
+    return cached_token("magento", MAGENTO_TOKEN_TTL_SECONDS, fetch_magento_token, refresh)
+
+def get_salesforce_token(refresh=False):
+    return cached_token("salesforce", SALESFORCE_TOKEN_TTL_SECONDS, fetch_salesforce_token, refresh)
+
+def fetch_magento_token():
     url = f"{MAGENTO_BASE_URL}/rest/V1/integration/admin/token"
     payload = {
         'username': MAGENTO_USERNAME,
@@ -167,16 +940,18 @@ def get_magento_token():
     }
 
     try:
-        response = requests.post(url, json=payload, verify=False)
+        response = upstream_request("POST", url, "magento.token", json=payload, verify=False)
         response.raise_for_status()
         return response.text.strip('"')  # Remove quotes from raw string
     except requests.exceptions.HTTPError as http_err:
         print(f"Failed to get token: {http_err} - {response.text}")
+    except CircuitOpenError:
+        raise
     except Exception as err:
         print(f"Unexpected error: {err}")
     return None
 
-def get_salesforce_token():
+def fetch_salesforce_token():
     payload = {
         'grant_type': 'password',
         'client_id': SALESFORCE_CONSUMER_ID,
@@ -186,7 +961,7 @@ def get_salesforce_token():
     }
     headers = {'Content-Type': 'application/x-www-form-urlencoded'}
 
-    response = requests.post(SALESFORCE_TOKEN_URL, headers=headers, data=payload)
+    response = upstream_request("POST", SALESFORCE_TOKEN_URL, "salesforce.token", headers=headers, data=payload)
     response.raise_for_status()
     return response.json()["access_token"]
 
@@ -196,14 +971,144 @@ def get_products():
     data = request.get_json()
     keyword = data.get("keyword", "") if data else ""
 
+    body, status = upstream_flights.do(("products", keyword.strip().lower()), lambda: search_products(keyword))
+    return jsonify(body), status
+
+class StockSnapshot:
+    """
+    Whole-catalog stock table: SKUs map to a row number, quantities live in a flat array of doubles
+    (NaN = unknown), so a lookup is one dict probe and one array read. Refreshed in bulk by
+    `refresh_stock_snapshot`, which only writes the rows whose quantity changed.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._qty = array("d")
+        self.refreshed_at = None
+
+    def age_seconds(self):
+        return None if self.refreshed_at is None else time.monotonic() - self.refreshed_at
+
+    def get(self, sku):
+        """Snapshot quantity of `sku`, or None if unknown or the snapshot is older than STOCK_MAX_STALENESS_SECONDS."""
+        age = self.age_seconds()
+        if age is None or age > STOCK_MAX_STALENESS_SECONDS:
+            return None
+        row = self._rows.get(sku)
+        if row is None:
+            return None
+        qty = self._qty[row]
+        if math.isnan(qty):
+            return None
+        return int(qty) if qty.is_integer() else qty
+
+    def apply(self, quantities):
+        """Applies a complete sweep ({sku: qty}); SKUs absent from it become unknown. Returns rows changed."""
+        changed = 0
+        with self._lock:
+            for sku, qty in quantities.items():
+                row = self._rows.get(sku)
+                if row is None:
+                    # `get` reads without the lock: store the quantity before publishing its row
+                    self._qty.append(qty)
+                    self._rows[sku] = len(self._qty) - 1
+                    changed += 1
+                elif self._qty[row] != qty:
+                    self._qty[row] = qty
+                    changed += 1
+            for sku, row in self._rows.items():
+                if sku not in quantities and not math.isnan(self._qty[row]):
+                    self._qty[row] = math.nan
+                    changed += 1
+            self.refreshed_at = time.monotonic()
+        return changed
+
+    def __len__(self):
+        return len(self._rows)
+
+stock_snapshot = StockSnapshot()
+
+def refresh_stock_snapshot():
+    """
+    Pulls quantities for the whole catalog from Magento's source-items API in pages of
+    STOCK_PAGE_SIZE and applies the differences to `stock_snapshot`.
+    """
+    try:
+        token = get_magento_token()
+        if not token:
+            return {"status": "error", "error": "Failed to authenticate with Magento"}
+        headers = {"Authorization": f"Bearer {token}"}
+        params = {
+            "searchCriteria[pageSize]": STOCK_PAGE_SIZE,
+            "searchCriteria[filterGroups][0][filters][0][field]": "source_code",
+            "searchCriteria[filterGroups][0][filters][0][value]": STOCK_SOURCE_CODE,
+            "searchCriteria[filterGroups][0][filters][0][condition_type]": "eq"
+        }
+
+        quantities = {}
+        page = 1
+        while True:
+            params["searchCriteria[currentPage]"] = page
+            response = upstream_request("GET", f"{MAGENTO_BASE_URL}/rest/V1/inventory/source-items",
+                                        "magento.stock_bulk", headers=headers, params=params, verify=False)
+            response.raise_for_status()
+            data = response.json()
+            items = data.get("items") or []
+            for item in items:
+                if item.get("sku") is not None and item.get("quantity") is not None:
+                    quantities[item["sku"]] = float(item["quantity"])
+            if not items or page * STOCK_PAGE_SIZE >= data.get("total_count", 0):
+                break
+            page += 1
+
+        changed = stock_snapshot.apply(quantities)
+        return {"status": "success", "skus": len(quantities), "changed": changed}
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        print(f"[STOCK] Snapshot refresh failed: {e}")
+        return {"status": "error", "error": str(e)}
+
+def fetch_stock_qty(sku, headers):
+    """
+    Stock quantity of one SKU: from the stock snapshot while it is fresh enough,
+    else live from Magento. None when neither can tell us right now.
+    """
+    qty = stock_snapshot.get(sku)
+    if qty is not None:
+        return qty
+    stock_url = f"{MAGENTO_BASE_URL}/rest/default/V1/stockItems/{sku}"
+    try:
+        stock_response = upstream_request("GET", stock_url, "magento.stock", hedge=True, headers=headers, verify=False)
+        stock_response.raise_for_status()
+        stock_data = stock_response.json()
+        return stock_data.get("qty")
+    except (requests.exceptions.RequestException, CircuitOpenError):
+        return None
+
+def search_products(keyword):
+    """
+    Searches products by name and attaches live stock; returns (body, status).
+    Names are matched in the local catalog index once it is loaded, else with a LIKE query to Magento.
+    """
     token = get_magento_token()
     if not token:
-        return jsonify({"error": "Failed to authenticate with Magento"}), 500
+        return {"error": "Failed to authenticate with Magento"}, 500
 
     headers = {
         "Authorization": f"Bearer {token}"
     }
 
+    if catalog_index.ready and keyword.strip():
+        matches = catalog_index.search(keyword, CATALOG_MAX_RESULTS)
+        return {"products": [
+            {
+                "name": product["name"],
+                "price": product["price"],
+                "sku": product["sku"],
+                "stock_qty": fetch_stock_qty(product["sku"], headers)
+            }
+            for product in matches
+        ]}, 200
+
     product_search_url = f"{MAGENTO_BASE_URL}/rest/V1/products"
     search_params = {
         "searchCriteria[filterGroups][0][filters][0][field]": "name",
@@ -212,7 +1117,7 @@ def get_products():
     }
 
     try:
-        response = requests.get(product_search_url, headers=headers, params=search_params, verify=False)
+        response = upstream_request("GET", product_search_url, "magento.products", hedge=True, headers=headers, params=search_params, verify=False)
         response.raise_for_status()
         products_data = response.json()
 
@@ -224,14 +1129,7 @@ def get_products():
             price = item.get("price")
 
             # Fetch stock quantity for each product
-            stock_url = f"{MAGENTO_BASE_URL}/rest/default/V1/stockItems/{sku}"
-            try:
-                stock_response = requests.get(stock_url, headers=headers, verify=False)
-                stock_response.raise_for_status()
-                stock_data = stock_response.json()
-                qty = stock_data.get("qty")
-            except requests.exceptions.RequestException:
-                qty = None 
+            qty = fetch_stock_qty(sku, headers)
 
             simplified_products.append({
                 "name": name,
@@ -240,13 +1138,186 @@ def get_products():
                 "stock_qty": qty
             })
 
-        return jsonify({"products": simplified_products}), 200
+        return {"products": simplified_products}, 200
 
     except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
+
+def normalize_product_text(value):
+    """Lowercased alphanumeric tokens, split between letters and digits ("S24" -> "s", "24")."""
+    value = re.sub(r"(?<=[a-z])(?=[0-9])|(?<=[0-9])(?=[a-z])", " ", str(value or "").lower())
+    return re.findall(r"[a-z0-9]+", value)
+
+def trigrams(compact):
+    return {compact[i:i + 3] for i in range(len(compact) - 2)}
+
+class ProductCatalogIndex:
+    """
+    In-memory inverted index over the Magento catalog (id, sku, name, price).
+    Names are indexed by token and by character trigram of the name with spaces removed, so
+    "Galaxy S 24", "galaxy s24" and small speech-to-text misspellings still find "Galaxy S24".
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.products = {}
+        self._tokens = {}
+        self._trigrams = {}
+        self._product_trigrams = {}
+        self.last_updated_at = None
+        self.loaded_at = None
+
+    @property
+    def ready(self):
+        return self.loaded_at is not None
+
+    def _unindex(self, product_id):
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        for token in set(normalize_product_text(product["name"])):
+            self._tokens.get(token, set()).discard(product_id)
+        for gram in self._product_trigrams.pop(product_id, ()):
+            self._trigrams.get(gram, set()).discard(product_id)
+
+    def _index(self, item):
+        product_id = item["id"]
+        self._unindex(product_id)
+        product = {
+            "sku": item.get("sku"),
+            "name": item.get("name") or "",
+            "price": item.get("price")
+        }
+        self.products[product_id] = product
+        tokens = normalize_product_text(product["name"])
+        for token in set(tokens):
+            self._tokens.setdefault(token, set()).add(product_id)
+        grams = trigrams("".join(tokens))
+        self._product_trigrams[product_id] = grams
+        for gram in grams:
+            self._trigrams.setdefault(gram, set()).add(product_id)
+
+    def apply(self, items, full=False):
+        """Indexes a page of Magento product items; a full load replaces the whole index atomically."""
+        if full:
+            fresh = ProductCatalogIndex()
+            for item in items:
+                fresh._index(item)
+            with self._lock:
+                self.products, self._tokens = fresh.products, fresh._tokens
+                self._trigrams, self._product_trigrams = fresh._trigrams, fresh._product_trigrams
+        else:
+            with self._lock:
+                for item in items:
+                    self._index(item)
+        updated = [item["updated_at"] for item in items if item.get("updated_at")]
+        with self._lock:
+            if updated:
+                self.last_updated_at = max(updated + ([self.last_updated_at] if self.last_updated_at else []))
+            self.loaded_at = time.time()
+
+    def search(self, keyword, limit):
+        """
+        Ranks products by how much of the query they contain (trigram containment), with token
+        matches and overall similarity as tie-breakers. Returns product dicts, best first.
+        """
+        tokens = normalize_product_text(keyword)
+        compact = "".join(tokens)
+        if not tokens:
+            return []
+        query_grams = trigrams(compact)
+
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                for product_id in self._trigrams.get(gram, ()):
+                    shared[product_id] += 1
+            token_hits = Counter()
+            for token in set(tokens):
+                for product_id in self._tokens.get(token, ()):
+                    token_hits[product_id] += 1
+            # Queries too short for trigrams ("tv") match on token prefixes
+            if not query_grams:
+                for token, product_ids in self._tokens.items():
+                    if token.startswith(compact):
+                        for product_id in product_ids:
+                            token_hits[product_id] += 1
+
+            scored = []
+            for product_id in set(shared) | set(token_hits):
+                product_grams = self._product_trigrams.get(product_id, ())
+                containment = shared[product_id] / len(query_grams) if query_grams else 1.0
+                similarity = 2 * shared[product_id] / (len(query_grams) + len(product_grams)) if query_grams else 0.0
+                token_score = min(token_hits[product_id] / len(set(tokens)), 1.0)
+                score = 0.7 * containment + 0.2 * token_score + 0.1 * similarity
+                if containment >= CATALOG_MIN_MATCH:
+                    scored.append((score, product_id))
+
+            scored.sort(key=lambda pair: (-pair[0], self.products[pair[1]]["name"]))
+            return [self.products[product_id] for _, product_id in scored[:limit]]
+
+catalog_index = ProductCatalogIndex()
+_catalog_refresh_lock = threading.Lock()
+_catalog_full_loaded_at = 0
+
+def refresh_catalog_index(full=False):
+    """
+    Pulls the Magento catalog page by page into `catalog_index`. Incremental runs only fetch
+    products with `updated_at` after the newest one already indexed; a full reload runs at start
+    and every CATALOG_FULL_REFRESH_HOURS so deleted products disappear too.
+    """
+    global _catalog_full_loaded_at
+    if not _catalog_refresh_lock.acquire(blocking=False):
+        return {"status": "skipped", "reason": "refresh already running"}
+    try:
+        full = full or not catalog_index.ready or \
+            time.monotonic() - _catalog_full_loaded_at > CATALOG_FULL_REFRESH_HOURS * 3600
+        token = get_magento_token()
+        if not token:
+            return {"status": "error", "error": "Failed to authenticate with Magento"}
+        headers = {"Authorization": f"Bearer {token}"}
+
+        params = {
+            "searchCriteria[pageSize]": CATALOG_PAGE_SIZE,
+            "searchCriteria[sortOrders][0][field]": "entity_id",
+            "searchCriteria[sortOrders][0][direction]": "ASC",
+            "fields": "items[id,sku,name,price,updated_at],total_count"
+        }
+        if not full and catalog_index.last_updated_at:
+            params.update({
+                "searchCriteria[filterGroups][0][filters][0][field]": "updated_at",
+                "searchCriteria[filterGroups][0][filters][0][value]": catalog_index.last_updated_at,
+                "searchCriteria[filterGroups][0][filters][0][condition_type]": "gt"
+            })
+
+        items = []
+        page = 1
+        while True:
+            params["searchCriteria[currentPage]"] = page
+            response = upstream_request("GET", f"{MAGENTO_BASE_URL}/rest/V1/products", "magento.catalog",
+                                        headers=headers, params=params, verify=False)
+            response.raise_for_status()
+            data = response.json()
+            page_items = [item for item in data.get("items") or [] if item.get("id") is not None]
+            items.extend(page_items)
+            if not page_items or page * CATALOG_PAGE_SIZE >= data.get("total_count", 0):
+                break
+            page += 1
+
+        catalog_index.apply(items, full=full)
+        if full:
+            _catalog_full_loaded_at = time.monotonic()
+        print(f"[CATALOG] {'Full' if full else 'Incremental'} refresh indexed {len(items)} products "
+              f"({len(catalog_index.products)} total).")
+        return {"status": "success", "full": full, "products_indexed": len(items)}
+    except (requests.exceptions.RequestException, CircuitOpenError) as e:
+        print(f"[CATALOG] Refresh failed: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        _catalog_refresh_lock.release()
 
 @app.route("/product-order", methods=["POST"])
 @log_request_input("/product-order")
+@idempotent
 def product_order():
     data = request.get_json() or {}
     customer_name = data.get("customer_name")
@@ -274,7 +1345,7 @@ def product_order():
         account_query = f"SELECT Id FROM Account WHERE Phone = '{phone}' ORDER BY CreatedDate DESC LIMIT 1"
         encoded_query = quote_plus(account_query)
         account_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={encoded_query}"
-        account_response = requests.get(account_url, headers=headers)
+        account_response = upstream_request("GET", account_url, "salesforce.query", hedge=True, headers=headers)
         account_response.raise_for_status()
         account_data = account_response.json()
         if not account_data["records"]:
@@ -285,7 +1356,7 @@ def product_order():
                 "BillingStreet": address
             }
             create_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Account"
-            create_response = requests.post(create_url, headers=headers, json=create_account_payload)
+            create_response = upstream_request("POST", create_url, "salesforce.sobjects", headers=headers, json=create_account_payload)
             create_response.raise_for_status()
             account_id = create_response.json().get("id")
         else:
@@ -303,13 +1374,13 @@ def product_order():
             "Reason": "Delivery"
         }
         case_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case"
-        case_response = requests.post(case_url, headers=headers, json=case_payload)
+        case_response = upstream_request("POST", case_url, "salesforce.sobjects", headers=headers, json=case_payload)
         case_response.raise_for_status()
         case_id = case_response.json().get("id")
 
         # Get Case Number using Case ID
         case_lookup_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case/{case_id}"
-        case_lookup_response = requests.get(case_lookup_url, headers=headers)
+        case_lookup_response = upstream_request("GET", case_lookup_url, "salesforce.sobjects", hedge=True, headers=headers)
         case_lookup_response.raise_for_status()
         case_data = case_lookup_response.json()
         case_number = case_data.get("CaseNumber")
@@ -328,18 +1399,38 @@ def product_order():
             "TrackingNumber__c": case_number
         }
         opp_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Opportunity"
-        opp_response = requests.post(opp_url, headers=headers, json=opportunity_payload)
+        opp_response = upstream_request("POST", opp_url, "salesforce.sobjects", headers=headers, json=opportunity_payload)
         opp_response.raise_for_status()
         opp_id = opp_response.json().get("id")
+        invalidate_case(case_number, phone)
 
         # Send confirmation email if email is provided
         if email:
             try:
-                total_amount = float(price) * int(quantity)
-                msg = Message(
-                    subject=f"Order Confirmation - Order #{case_number}",
-                    recipients=[email],
-                    body=f"""
+                get_mail().send(order_confirmation_email(email, customer_name, case_number, product_name, sku, quantity, price, address, phone))
+            except Exception as mail_err:
+                print(f"[EMAIL ERROR] Could not send email to {email}: {mail_err}")
+
+        return jsonify({
+            "message": "Order and delivery ticket stored in Salesforce successfully.",
+            "opportunity_id": opp_id,
+            "delivery_case_id": case_id,
+            "delivery_case_number": case_number
+        }), 201
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 500
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+def order_confirmation_email(email, customer_name, case_number, product_name, sku, quantity, price, address, phone):
+    from flask_mail import Message
+    total_amount = float(price) * int(quantity)
+    return Message(
+        subject=f"Order Confirmation - Order #{case_number}",
+        recipients=[email],
+        body=f"""
 Dear {customer_name},
 
 Your order has been placed successfully! Here are the details:
@@ -360,21 +1451,7 @@ Thank you for your purchase!
 Best regards,
 Samsung Sales Team
 """
-                )
-                mail.send(msg)
-            except Exception as mail_err:
-                print(f"[EMAIL ERROR] Could not send email to {email}: {mail_err}")
-
-        return jsonify({
-            "message": "Order and delivery ticket stored in Salesforce successfully.",
-            "opportunity_id": opp_id,
-            "delivery_case_id": case_id,
-            "delivery_case_number": case_number
-        }), 201
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
-    except Exception as e:
-        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+    )
 
 @app.route("/salesforce-account", methods=["POST"])
 @log_request_input("/salesforce-account")
@@ -385,24 +1462,31 @@ def get_salesforce_account():
     if not phone:
         return jsonify({"error": "Missing 'phone' in request body"}), 400
 
-    access_token = get_salesforce_token()
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    key = ("account", phone)
+    record_prefetch_use(phone, key)
+    body, status = cached_case_lookup(key, [f"phone:{phone}"], lambda: lookup_salesforce_account(phone))
+    return jsonify(body), status
 
+def lookup_salesforce_account(phone):
+    """Fetches the Account for a phone number and its latest Opportunity; returns (body, status)."""
     try:
+        access_token = get_salesforce_token()
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+
         # Get Account by phone
         account_query = f"SELECT Id, Name, Phone FROM Account WHERE Phone='{phone}' ORDER BY CreatedDate DESC LIMIT 1"
         encoded_account_query = quote_plus(account_query)
         account_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={encoded_account_query}"
 
-        account_response = requests.get(account_url, headers=headers)
+        account_response = upstream_request("GET", account_url, "salesforce.query", hedge=True, headers=headers)
         account_response.raise_for_status()
         account_data = account_response.json()
 
         if not account_data["records"]:
-            return jsonify({"error": "No account found for this phone number."}), 404
+            return {"error": "No account found for this phone number."}, 404
 
         account = account_data["records"][0]
         account_name = account["Name"]
@@ -419,7 +1503,7 @@ def get_salesforce_account():
         encoded_opportunity_query = quote_plus(opportunity_query)
         opportunity_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={encoded_opportunity_query}"
 
-        opportunity_response = requests.get(opportunity_url, headers=headers)
+        opportunity_response = upstream_request("GET", opportunity_url, "salesforce.query", hedge=True, headers=headers)
         opportunity_response.raise_for_status()
         opportunity_data = opportunity_response.json()
 
@@ -433,13 +1517,14 @@ def get_salesforce_account():
             "Purchase ID": opportunity["Id"] if opportunity else "N/A"
         }
 
-        return jsonify(response), 200
+        return response, 200
 
     except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
 @app.route("/create-salesforce-ticket", methods=["POST"])
 @log_request_input("/create-salesforce-ticket")
+@idempotent
 def create_salesforce_ticket():
     data = request.get_json()
     phone = data.get("phone")
@@ -469,7 +1554,7 @@ def create_salesforce_ticket():
         encoded_query = quote_plus(account_query)
         account_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={encoded_query}"
 
-        account_response = requests.get(account_url, headers=headers)
+        account_response = upstream_request("GET", account_url, "salesforce.query", hedge=True, headers=headers)
         account_response.raise_for_status()
         account_data = account_response.json()
 
@@ -480,7 +1565,7 @@ def create_salesforce_ticket():
                 "Phone": phone
             }
             create_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Account"
-            create_response = requests.post(create_url, headers=headers, json=create_account_payload)
+            create_response = upstream_request("POST", create_url, "salesforce.sobjects", headers=headers, json=create_account_payload)
             create_response.raise_for_status()
             account_id = create_response.json().get("id")
         else:
@@ -499,25 +1584,41 @@ def create_salesforce_ticket():
         }
 
         case_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case"
-        case_response = requests.post(case_url, headers=headers, json=payload)
+        case_response = upstream_request("POST", case_url, "salesforce.sobjects", headers=headers, json=payload)
         case_response.raise_for_status()
 
         case_id = case_response.json().get("id")
 
         # Get Case Number using Case ID
         case_lookup_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case/{case_id}"
-        case_lookup_response = requests.get(case_lookup_url, headers=headers)
+        case_lookup_response = upstream_request("GET", case_lookup_url, "salesforce.sobjects", hedge=True, headers=headers)
         case_lookup_response.raise_for_status()
 
         case_data = case_lookup_response.json()
         case_number = case_data.get("CaseNumber")
+        invalidate_case(case_number, phone)
 
         if email:
             try:
-                msg = Message(
-                    subject=f"Your Ticket #{case_number} has been created",
-                    recipients=[email],
-                    body=f"""
+                get_mail().send(ticket_created_email(email, customer_name, case_number, subject, description, status, priority, case_type, case_reason))
+            except Exception as mail_err:
+                print(f"[EMAIL ERROR] Could not send email to {email}: {mail_err}")
+
+        return jsonify({
+            "message": "Case created successfully",
+            "case_id": case_id,
+            "case_number": case_number
+        }), 201
+
+    except requests.exceptions.RequestException as e:
+        return jsonify({"error": str(e)}), 500
+
+def ticket_created_email(email, customer_name, case_number, subject, description, status, priority, case_type, case_reason):
+    from flask_mail import Message
+    return Message(
+        subject=f"Your Ticket #{case_number} has been created",
+        recipients=[email],
+        body=f"""
 Dear {customer_name or 'Customer'},
 
 Your support ticket has been created successfully. Here are the details:
@@ -534,19 +1635,61 @@ Thank you for contacting us.
 Best regards,
 Samsung Customer Support Team
 """
-                )
-                mail.send(msg)
-            except Exception as mail_err:
-                print(f"[EMAIL ERROR] Could not send email to {email}: {mail_err}")
+    )
 
-        return jsonify({
-            "message": "Case created successfully",
-            "case_id": case_id,
-            "case_number": case_number
-        }), 201
+CASE_INFO_FIELDS = [
+    "Id", "CaseNumber", "Subject", "Description", "Status", "Priority", "AccountId", "CreatedDate", "ClosedDate",
+    "Type", "Reason", "Customer_Note__c"
+]
+TICKET_FIELDS = [
+    "AccountId", "CaseNumber", "ClosedDate", "CreatedDate", "Description", "Reason", "Status", "Subject", "Type"
+]
 
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+def parse_fields(value, allowed):
+    """
+    The optional `fields` projection of a request (list or comma-separated string) as a tuple,
+    None when absent. Raises ValueError naming the allowed fields when one is unknown.
+    """
+    if not value:
+        return None
+    fields = [f.strip() for f in (value.split(",") if isinstance(value, str) else value) if str(f).strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(map(str, unknown))}. Allowed: {', '.join(allowed)}")
+    return tuple(dict.fromkeys(fields))
+
+def select_list(fields, default):
+    """SOQL SELECT list for a projection; CaseNumber is always read so cached results can be invalidated by case."""
+    if not fields:
+        return ", ".join(default)
+    return ", ".join(["CaseNumber"] + [f for f in fields if f != "CaseNumber"])
+
+def project(record, fields):
+    return {f: record[f] for f in fields if f in record} if fields else record
+
+def case_info_soql(case_number, fields=None):
+    return f"""
+        SELECT {select_list(fields, CASE_INFO_FIELDS)}
+        FROM Case
+        WHERE CaseNumber = '{case_number}'
+    """
+
+def tickets_by_number_soql(case_number, fields=None):
+    return f"""
+        SELECT {select_list(fields, TICKET_FIELDS)}
+        FROM Case
+        WHERE CaseNumber = '{case_number}'
+    """
+
+def phone_tickets_soql(where, fields=None):
+    columns = [f for f in fields if f != "AccountPhone"] if fields else TICKET_FIELDS
+    if not fields or "AccountPhone" in fields:
+        columns = columns + ["Account.Phone"]
+    return f"""
+        SELECT {select_list(columns, columns)}
+        FROM Case
+        WHERE {where}
+    """
 
 @app.route("/get-case-info", methods=["POST"])
 @log_request_input("/get-case-info")
@@ -560,6 +1703,18 @@ def get_case_info():
     if len(case_number) < 8:
         case_number = case_number.zfill(8)
 
+    try:
+        fields = parse_fields(data.get("fields"), CASE_INFO_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body, status = cached_case_lookup(
+        ("case-info", case_number, fields), [f"case:{case_number}"], lambda: lookup_case_info(case_number, fields)
+    )
+    return jsonify(project(body, fields) if status == 200 else body), status
+
+def lookup_case_info(case_number, fields=None):
+    """Fetches one Case by its (zero-padded) CaseNumber, optionally only some `fields`; returns (body, status)."""
     try:
         access_token = get_salesforce_token()
         headers = {
@@ -567,37 +1722,1083 @@ def get_case_info():
             "Content-Type": "application/json"
         }
 
-        # Query for case info using CaseNumber
-        soql = f"""
-            SELECT Id, CaseNumber, Subject, Description, Status,
-                   Priority, AccountId, CreatedDate, ClosedDate,
-                   Type, Reason, Customer_Note__c
-            FROM Case
-            WHERE CaseNumber = '{case_number}'
-        """
-        query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
+        # Query for case info using CaseNumber
+        query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(case_info_soql(case_number, fields))}"
+
+        response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
+        response.raise_for_status()
+
+        data = response.json()
+        records = data.get("records", [])
+
+        if not records:
+            return {"error": "No case found with that CaseNumber."}, 404
+
+        records[0].pop("attributes", None)
+        return records[0], 200
+
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}, 500
+
+_batch_pool = ThreadPoolExecutor(max_workers=BATCH_POOL_SIZE, thread_name_prefix="batch")
+
+def run_batch_call(path, arguments):
+    """Runs one tool handler as if it had been called directly; returns (status, body)."""
+    with app.test_request_context(path, method="POST", json=arguments):
+        try:
+            rv = app.view_functions[request.url_rule.endpoint]()
+        except Exception as e:
+            try:
+                rv = app.handle_user_exception(e)
+            except Exception as unhandled:
+                rv = jsonify({"error": f"Unexpected error: {str(unhandled)}"}), 500
+        response = app.make_response(rv)
+        return response.status_code, response.get_json(silent=True)
+
+@app.route("/batch", methods=["POST"])
+@log_request_input("/batch")
+def batch_tool_calls():
+    """
+    Runs several tool calls concurrently in one round-trip.
+    Expects JSON: {"calls": [{"tool": "/salesforce-account", "arguments": {...}}, ...]}
+    and returns one {"tool", "status", "body"} result per call, in order.
+    """
+    data = request.get_json() or {}
+    calls = data.get("calls")
+    if not isinstance(calls, list) or not calls:
+        return jsonify({"error": "Missing 'calls' list in request body"}), 400
+    if len(calls) > BATCH_MAX_CALLS:
+        return jsonify({"error": f"At most {BATCH_MAX_CALLS} calls per batch"}), 400
+
+    paths = []
+    for call in calls:
+        tool = str(call.get("tool", "")) if isinstance(call, dict) else ""
+        path = tool if tool.startswith("/") else f"/{tool}"
+        if path not in TOOL_ROUTES or path == "/batch":
+            return jsonify({"error": f"Unknown tool '{tool}'"}), 400
+        paths.append(path)
+
+    # Each call runs in a copy of this request's context, so it shares the batch's latency budget
+    futures = [
+        _batch_pool.submit(contextvars.copy_context().run, run_batch_call, path, call.get("arguments") or {})
+        for path, call in zip(paths, calls)
+    ]
+    results = []
+    for path, future in zip(paths, futures):
+        status, body = future.result()
+        results.append({"tool": path, "status": status, "body": body})
+    return jsonify({"results": results}), 200
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=PREFETCH_POOL_SIZE, thread_name_prefix="prefetch")
+prefetch_stats = {"started": 0, "completed": 0, "failed": 0, "merged": 0, "dropped": 0, "hits": 0, "misses": 0}
+_prefetched_phones = OrderedDict()
+_prefetches_in_flight = {}
+_prefetch_lock = threading.Lock()
+
+def record_prefetch_use(phone, key):
+    """Counts a tool lookup for a phone that was prefetched at call start as a hit or a miss."""
+    with _prefetch_lock:
+        if phone not in _prefetched_phones:
+            return
+        prefetch_stats["hits" if case_cache.contains(key) else "misses"] += 1
+
+def prefetch_caller_context(phone):
+    """
+    Warms `case_cache` with the caller's Account/latest Opportunity and Cases, using the tool lookups.
+    Returns once both lookups are queued on `_prefetch_pool`. The caller reserves the phone's entry in
+    `_prefetches_in_flight` (see `call_started`); it is removed when both lookups have finished.
+    """
+    def finished(future):
+        error = future.exception()
+        if error:
+            print(f"[PREFETCH] Failed to prefetch caller context for {phone}: {error}")
+        with _prefetch_lock:
+            pending = _prefetches_in_flight[phone]
+            pending["lookups"] -= 1
+            pending["failed"] = pending["failed"] or error is not None
+            if pending["lookups"] == 0:
+                del _prefetches_in_flight[phone]
+                prefetch_stats["failed" if pending["failed"] else "completed"] += 1
+
+    lookups = [
+        (("account", phone), lambda: lookup_salesforce_account(phone)),
+        (("cases-by-phone", phone), lambda: lookup_cases_by_phone(phone)),
+    ]
+    with _prefetch_lock:
+        _prefetches_in_flight[phone]["lookups"] = len(lookups)
+    for key, fetch in lookups:
+        _prefetch_pool.submit(cached_case_lookup, key, [f"phone:{phone}"], fetch).add_done_callback(finished)
+
+@app.route("/call-started", methods=["POST"])
+@log_request_input("/call-started")
+def call_started():
+    """
+    Webhook for the start of a call. Prefetches the caller's Salesforce context in the background
+    so the agent's first `/salesforce-account` / `/salesforce-tickets` call is served from memory.
+    Expects JSON with the caller number as "phone" (or "from_number").
+    A prefetch already running for the number is reused, and one is skipped while
+    PREFETCH_MAX_IN_FLIGHT numbers are being prefetched.
+    """
+    data = request.get_json() or {}
+    phone = data.get("phone") or data.get("from_number")
+    if not phone:
+        return jsonify({"error": "Missing 'phone' (or 'from_number') in request body"}), 400
+
+    with _prefetch_lock:
+        if phone in _prefetches_in_flight:
+            prefetch_stats["merged"] += 1
+            message = "Prefetch already in progress"
+        elif len(_prefetches_in_flight) >= PREFETCH_MAX_IN_FLIGHT:
+            prefetch_stats["dropped"] += 1
+            return jsonify({"message": "Prefetch skipped, too many in progress", "phone": phone}), 202
+        else:
+            prefetch_stats["started"] += 1
+            # Reserved here, in the same locked block as the check, so a concurrent call merges into it
+            _prefetches_in_flight[phone] = {"lookups": 0, "failed": False}
+            message = "Prefetch started"
+        _prefetched_phones[phone] = time.monotonic()
+        _prefetched_phones.move_to_end(phone)
+        while len(_prefetched_phones) > CASE_CACHE_MAX_ENTRIES:
+            _prefetched_phones.popitem(last=False)
+    if message == "Prefetch started":
+        prefetch_caller_context(phone)
+
+    return jsonify({"message": message, "phone": phone}), 202
+
+@app.route("/prefetch-stats", methods=["GET"])
+def get_prefetch_stats():
+    with _prefetch_lock:
+        stats = dict(prefetch_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else None
+    return jsonify(stats), 200
+
+# Sync job profile being recorded in this context, if any
+sync_profile = contextvars.ContextVar("sync_profile", default=None)
+
+sync_metrics = {}
+_sync_metrics_lock = threading.Lock()
+
+class SyncProfile:
+    """Wall time, CPU time, rows and upstream calls per phase of one sync job run."""
+    def __init__(self, job):
+        self.job = job
+        self.phases = {}
+        self.current = None
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.wall_seconds = None
+        self.cpu_seconds = None
+
+    def entry(self, name):
+        with self.lock:
+            return self.phases.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "rows": 0, "upstream_calls": {}})
+
+    @contextmanager
+    def phase(self, name):
+        entry = self.entry(name)
+        previous, self.current = self.current, name
+        started, cpu_started = time.perf_counter(), time.thread_time()
+        try:
+            yield entry
+        finally:
+            entry["wall_seconds"] += time.perf_counter() - started
+            entry["cpu_seconds"] += time.thread_time() - cpu_started
+            self.current = previous
+
+    def count_upstream(self, operation):
+        entry = self.entry(self.current or "other")
+        with self.lock:
+            entry["upstream_calls"][operation] = entry["upstream_calls"].get(operation, 0) + 1
+
+    def finish(self):
+        self.wall_seconds = time.perf_counter() - self.started
+        self.cpu_seconds = time.thread_time() - self.cpu_started
+
+    def summary(self):
+        return {
+            "job": self.job,
+            "wall_seconds": round(self.wall_seconds or 0, 3),
+            "cpu_seconds": round(self.cpu_seconds or 0, 3),
+            "phases": {
+                name: {
+                    "wall_seconds": round(entry["wall_seconds"], 3),
+                    "cpu_seconds": round(entry["cpu_seconds"], 3),
+                    "rows": entry["rows"],
+                    "upstream_calls": dict(entry["upstream_calls"])
+                }
+                for name, entry in self.phases.items()
+            }
+        }
+
+@contextmanager
+def sync_phase(name):
+    """Times a phase of the running sync job; yields its entry so the caller can add `rows`."""
+    profile = sync_profile.get()
+    if profile is None:
+        yield {"rows": 0}
+        return
+    with profile.phase(name) as entry:
+        yield entry
+
+def count_sync_upstream_call(operation):
+    profile = sync_profile.get()
+    if profile is not None:
+        profile.count_upstream(operation)
+
+def record_sync_metrics(profile):
+    """Adds a finished run to the per-job totals served by /sync-metrics."""
+    summary = profile.summary()
+    with _sync_metrics_lock:
+        job = sync_metrics.setdefault(profile.job, {"runs": 0, "wall_seconds_total": 0.0, "phases": {}})
+        job["runs"] += 1
+        job["wall_seconds_total"] = round(job["wall_seconds_total"] + summary["wall_seconds"], 3)
+        job["last_run"] = summary
+        for name, entry in summary["phases"].items():
+            totals = job["phases"].setdefault(name, {"wall_seconds_total": 0.0, "cpu_seconds_total": 0.0, "rows_total": 0, "upstream_calls_total": 0})
+            totals["wall_seconds_total"] = round(totals["wall_seconds_total"] + entry["wall_seconds"], 3)
+            totals["cpu_seconds_total"] = round(totals["cpu_seconds_total"] + entry["cpu_seconds"], 3)
+            totals["rows_total"] += entry["rows"]
+            totals["upstream_calls_total"] += sum(entry["upstream_calls"].values())
+
+def profiled_sync(job_name):
+    """
+    Records a SyncProfile for every run of the decorated sync job, adds it to the job's
+    result as `profile` and to /sync-metrics. `job_name` is a string or a function of the job's arguments.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profile = SyncProfile(job_name(*args, **kwargs) if callable(job_name) else job_name)
+            token = sync_profile.set(profile)
+            try:
+                result = func(*args, **kwargs)
+            finally:
+                sync_profile.reset(token)
+                profile.finish()
+                record_sync_metrics(profile)
+            if isinstance(result, dict):
+                result["profile"] = profile.summary()
+            return result
+        return wrapper
+    return decorator
+
+@app.route("/sync-metrics", methods=["GET"])
+def get_sync_metrics():
+    with _sync_metrics_lock:
+        return jsonify(json.loads(json.dumps(sync_metrics))), 200
+
+CALL_COLUMNS = [
+    "call_id", "ai_agent_id", "ai_agent_name", "call_status", "call_start_time", "call_end_time",
+    "call_duration_seconds", "call_type", "call_finish_reason", "recorded_call_audio_url",
+    "initial_response_time"
+]
+MESSAGE_COLUMNS = [
+    "call_id", "ai_agent_id", "call_start_time", "message_index", "message_role", "message_content",
+    "message_timestamp_seconds"
+]
+ANALYSIS_COLUMNS = ["call_id", "ai_agent_id", "call_start_time", "analysis_name", "analysis_result"]
+
+# Table names used before the single partitioned store; kept alive as compatibility views
+LEGACY_MESSAGE_TABLES = ["call_messages", "call_messages_in_bn", "call_messages_out_en", "call_messages_out_bn"]
+LEGACY_ANALYSIS_TABLES = ["call_analysis", "call_analysis_in_bn", "call_analysis_out_en", "call_analysis_out_bn"]
+
+_db_engine = None
+_call_schema_ready = False
+_call_schema_lock = threading.Lock()
+_known_partitions = set()
+
+def get_engine():
+    global _db_engine
+    if _db_engine is None:
+        from sqlalchemy import create_engine
+        _db_engine = create_engine(DB_URI, pool_pre_ping=True)
+    return _db_engine
+
+def text(statement):
+    """`sqlalchemy.text`, importing SQLAlchemy on first use."""
+    from sqlalchemy import text as sql_text
+    return sql_text(statement)
+
+# Registry of the Verbex agents we sync, and the queue of their call syncs. The four *_AGENT_ID
+# variables only seed the registry; more agents are added through POST /agents.
+AGENT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS verbex_agents (
+        ai_agent_id TEXT PRIMARY KEY,
+        suffix TEXT NOT NULL UNIQUE,
+        name TEXT,
+        enabled BOOLEAN NOT NULL DEFAULT TRUE,
+        sync_interval_minutes INTEGER,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS call_sync_jobs (
+        ai_agent_id TEXT PRIMARY KEY REFERENCES verbex_agents (ai_agent_id) ON DELETE CASCADE,
+        next_run_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+        lease_owner TEXT,
+        lease_expires_at TIMESTAMPTZ,
+        heartbeat_at TIMESTAMPTZ,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        last_started_at TIMESTAMPTZ,
+        last_finished_at TIMESTAMPTZ,
+        last_status TEXT,
+        last_error TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS call_sync_jobs_next_run_idx ON call_sync_jobs (next_run_at)",
+]
+AGENT_SUFFIX_PATTERN = re.compile(r"^[a-z][a-z0-9_]{0,39}$")
+
+# ai_agent_id -> suffix of registered agents, loaded from `verbex_agents`
+_agent_suffixes = {}
+
+def legacy_agents():
+    """The agents configured through the old environment variables, with the suffixes their tables always had."""
+    return [(agent_id, suffix) for agent_id, suffix in (
+        (IN_ENG_AGENT_ID, "in_en"), (IN_BN_AGENT_ID, "in_bn"), (OUT_ENG_AGENT_ID, "out_en"), (OUT_BN_AGENT_ID, "out_bn")
+    ) if agent_id]
+
+def default_agent_suffix(agent_id):
+    return "a_" + re.sub(r"[^a-z0-9]", "_", str(agent_id).lower())[:40]
+
+def agent_table_suffix(agent_id):
+    """Short, identifier-safe name of an agent, used for its partitions and compatibility views."""
+    suffix = _agent_suffixes.get(agent_id)
+    if suffix:
+        return suffix
+    if _call_schema_ready:
+        # Registered on another node since we last loaded the registry
+        try:
+            with get_engine().connect() as conn:
+                suffix = conn.execute(text("SELECT suffix FROM verbex_agents WHERE ai_agent_id = :agent_id"),
+                                      {"agent_id": agent_id}).scalar()
+        except Exception as e:
+            print(f"[AGENTS] Could not look up agent {agent_id}: {e}")
+        if suffix:
+            _agent_suffixes[agent_id] = suffix
+            return suffix
+    for legacy_id, legacy_suffix in legacy_agents():
+        if agent_id == legacy_id:
+            return legacy_suffix
+    return default_agent_suffix(agent_id)
+
+def ensure_agent_registry(conn):
+    """Creates the registry and job queue, seeds them with the configured agents and loads the suffixes."""
+    for statement in AGENT_SCHEMA:
+        conn.execute(text(statement))
+    for agent_id, suffix in legacy_agents():
+        conn.execute(text("""
+            INSERT INTO verbex_agents (ai_agent_id, suffix) VALUES (:agent_id, :suffix)
+            ON CONFLICT DO NOTHING
+        """), {"agent_id": agent_id, "suffix": suffix})
+    conn.execute(text("""
+        INSERT INTO call_sync_jobs (ai_agent_id) SELECT ai_agent_id FROM verbex_agents
+        ON CONFLICT (ai_agent_id) DO NOTHING
+    """))
+    rows = conn.execute(text("SELECT ai_agent_id, suffix FROM verbex_agents")).all()
+    _agent_suffixes.update(dict(rows))
+    return rows
+
+def create_agent_views(conn, agent_id, suffix):
+    # `call_messages` / `call_analysis` are now the shared tables, so IN_ENG moves to `*_in_en`
+    conn.execute(text(
+        f"CREATE OR REPLACE VIEW call_messages_{suffix} AS "
+        "SELECT * FROM call_messages_flat WHERE ai_agent_id = :agent_id"
+    ), {"agent_id": agent_id})
+    conn.execute(text(
+        f"CREATE OR REPLACE VIEW call_analysis_{suffix} AS "
+        "SELECT call_id, analysis_name, analysis_result FROM call_analysis WHERE ai_agent_id = :agent_id"
+    ), {"agent_id": agent_id})
+
+def registered_agents(enabled_only=True):
+    """(ai_agent_id, suffix) of the registered agents, in registration order."""
+    engine = get_engine()
+    ensure_call_schema(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT ai_agent_id, suffix FROM verbex_agents"
+            + (" WHERE enabled" if enabled_only else "") + " ORDER BY created_at, suffix"
+        )).all()
+    _agent_suffixes.update(dict(rows))
+    return [tuple(row) for row in rows]
+
+def month_start(value):
+    """First instant (UTC) of the month of `value`, or None when the call has no start time."""
+    if value is None:
+        return None
+    value = value.astimezone(timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=timezone.utc)
+
+def ensure_call_partitions(conn, keys):
+    """
+    Creates the partitions `call_messages` and `call_analysis` need for the given (agent_id, month) keys.
+    Each agent gets its own LIST partition; with CALL_PARTITION_BY_MONTH it is further split by month.
+    """
+    locked = False
+    for agent_id, month in keys:
+        for table in ("call_messages", "call_analysis"):
+            agent_part = f"{table}_p_{agent_table_suffix(agent_id)}"
+            if CALL_PARTITION_BY_MONTH:
+                wanted = (agent_part, month)
+            else:
+                wanted = (agent_part, None)
+            if wanted in _known_partitions:
+                continue
+            if not locked:
+                # A partition's foreign key locks `calls` after its parent, the reverse of `store_calls`.
+                # Locking `calls` first waits out running writers and serializes the DDL of concurrent syncs.
+                conn.execute(text("LOCK TABLE calls IN SHARE ROW EXCLUSIVE MODE"))
+                locked = True
+
+            if agent_part not in _known_partitions:
+                if CALL_PARTITION_BY_MONTH:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {agent_part} PARTITION OF {table} "
+                        "FOR VALUES IN (:agent_id) PARTITION BY RANGE (call_start_time)"
+                    ), {"agent_id": agent_id})
+                    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {agent_part}_default PARTITION OF {agent_part} DEFAULT"))
+                else:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {agent_part} PARTITION OF {table} FOR VALUES IN (:agent_id)"
+                    ), {"agent_id": agent_id})
+                _known_partitions.add(agent_part)
+
+            if CALL_PARTITION_BY_MONTH and month is not None:
+                next_month = datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+                conn.execute(text(
+                    f"CREATE TABLE IF NOT EXISTS {agent_part}_{month:%Y%m} PARTITION OF {agent_part} "
+                    "FOR VALUES FROM (:start) TO (:end)"
+                ), {"start": f"{month:%Y-%m-%d} 00:00:00+00", "end": f"{next_month:%Y-%m-%d} 00:00:00+00"})
+            _known_partitions.add(wanted)
+
+# Cast a legacy TEXT/number column into the typed columns of the normalized schema
+def _legacy_ts(column):
+    return (f"CASE WHEN {column}::text ~ '^[0-9.]+$' THEN to_timestamp({column}::text::double precision) "
+            f"ELSE NULLIF({column}::text, '')::timestamptz END")
+
+def _legacy_float(column):
+    return f"CASE WHEN {column}::text ~ '^[0-9]+(\\.[0-9]+)?$' THEN {column}::text::double precision END"
+
+def ensure_call_schema(engine):
+    """
+    Creates the `calls` fact table, the agent-partitioned `call_messages` / `call_analysis` tables
+    and the compatibility views. Plain tables left by older versions are folded in once, then dropped.
+    """
+    global _call_schema_ready
+    if _call_schema_ready:
+        return
+    with _call_schema_lock:
+        if _call_schema_ready:
+            return
+        try:
+            _create_call_schema(engine)
+        except Exception:
+            _known_partitions.clear()
+            raise
+        _call_schema_ready = True
+
+def _create_call_schema(engine):
+    with engine.begin() as conn:
+        # Loaded first, so partitions created during the migration below get the registered names
+        agents = ensure_agent_registry(conn)
+        legacy_tables = conn.execute(text("""
+            SELECT c.relname,
+                   EXISTS (SELECT 1 FROM pg_attribute a
+                           WHERE a.attrelid = c.oid AND a.attname = 'ai_agent_name' AND NOT a.attisdropped)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema() AND c.relkind = 'r' AND c.relname = ANY(:names)
+        """), {"names": LEGACY_MESSAGE_TABLES + LEGACY_ANALYSIS_TABLES}).all()
+
+        # Views are rebuilt below; dropping them first frees the names and the old tables they reference
+        conn.execute(text("DROP VIEW IF EXISTS call_messages_flat CASCADE"))
+        for name, _ in legacy_tables:
+            conn.execute(text(f'ALTER TABLE "{name}" RENAME TO "{name}__legacy"'))
+
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS calls (
+                call_id TEXT PRIMARY KEY,
+                ai_agent_id TEXT,
+                ai_agent_name TEXT,
+                call_status TEXT,
+                call_start_time TIMESTAMPTZ,
+                call_end_time TIMESTAMPTZ,
+                call_duration_seconds DOUBLE PRECISION,
+                call_type TEXT,
+                call_finish_reason TEXT,
+                recorded_call_audio_url TEXT,
+                initial_response_time DOUBLE PRECISION
+            )
+        """))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS calls_agent_start_idx ON calls (ai_agent_id, call_start_time)"))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS call_messages (
+                call_id TEXT NOT NULL REFERENCES calls (call_id) ON DELETE CASCADE,
+                ai_agent_id TEXT,
+                call_start_time TIMESTAMPTZ,
+                message_index INTEGER NOT NULL,
+                message_role TEXT,
+                message_content TEXT,
+                message_timestamp_seconds DOUBLE PRECISION
+            ) PARTITION BY LIST (ai_agent_id)
+        """))
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS call_analysis (
+                call_id TEXT NOT NULL REFERENCES calls (call_id) ON DELETE CASCADE,
+                ai_agent_id TEXT,
+                call_start_time TIMESTAMPTZ,
+                analysis_name TEXT,
+                analysis_result TEXT
+            ) PARTITION BY LIST (ai_agent_id)
+        """))
+        for table in ("call_messages", "call_analysis"):
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_p_default PARTITION OF {table} DEFAULT"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_call_id_idx ON {table} (call_id)"))
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_start_idx ON {table} (call_start_time)"))
+
+        # Old flat message rows carry the call-level columns, so `calls` is filled from them first
+        for name, is_flat in legacy_tables:
+            if is_flat:
+                conn.execute(text(f"""
+                    INSERT INTO calls ({", ".join(CALL_COLUMNS)})
+                    SELECT DISTINCT ON (call_id)
+                           call_id, ai_agent_id, ai_agent_name, call_status,
+                           {_legacy_ts("call_start_time")}, {_legacy_ts("call_end_time")},
+                           {_legacy_float("call_duration_seconds")}, call_type, call_finish_reason,
+                           recorded_call_audio_url, {_legacy_float("initial_response_time")}
+                    FROM "{name}__legacy"
+                    ORDER BY call_id, message_index DESC
+                    ON CONFLICT (call_id) DO NOTHING
+                """))
+
+        if legacy_tables:
+            months = conn.execute(text("SELECT DISTINCT ai_agent_id, call_start_time FROM calls")).all()
+            ensure_call_partitions(conn, {(agent_id, month_start(start)) for agent_id, start in months})
+
+        for name, is_flat in legacy_tables:
+            if name in LEGACY_MESSAGE_TABLES:
+                timestamp = _legacy_float("m.message_timestamp_seconds") if is_flat else "m.message_timestamp_seconds"
+                conn.execute(text(f"""
+                    INSERT INTO call_messages ({", ".join(MESSAGE_COLUMNS)})
+                    SELECT m.call_id, c.ai_agent_id, c.call_start_time, m.message_index,
+                           m.message_role, m.message_content, {timestamp}
+                    FROM "{name}__legacy" m
+                    JOIN calls c USING (call_id)
+                """))
+            else:
+                conn.execute(text(f"""
+                    INSERT INTO call_analysis ({", ".join(ANALYSIS_COLUMNS)})
+                    SELECT a.call_id, c.ai_agent_id, c.call_start_time, a.analysis_name, a.analysis_result
+                    FROM "{name}__legacy" a
+                    JOIN calls c USING (call_id)
+                """))
+            conn.execute(text(f'DROP TABLE "{name}__legacy"'))
+            print(f"[SCHEMA] Migrated legacy table '{name}' into the partitioned call store.")
+
+        # Flat view with the exact column order of the old per-message rows
+        conn.execute(text("""
+            CREATE OR REPLACE VIEW call_messages_flat AS
+            SELECT m.call_id, m.ai_agent_id, c.ai_agent_name, c.call_status,
+                   c.call_start_time, c.call_end_time, c.call_duration_seconds, c.call_type,
+                   c.call_finish_reason, c.recorded_call_audio_url, m.message_index,
+                   m.message_role, m.message_content, m.message_timestamp_seconds,
+                   c.initial_response_time
+            FROM call_messages m
+            JOIN calls c USING (call_id)
+        """))
+        for agent_id, suffix in agents:
+            create_agent_views(conn, agent_id, suffix)
+
+        rollups_exist = conn.execute(text("SELECT to_regclass('rollup_calls_daily') IS NOT NULL")).scalar()
+        for statement in ROLLUP_SCHEMA:
+            conn.execute(text(statement))
+        if not rollups_exist:
+            refresh_call_rollups(conn)
+
+@background_job("call_retention")
+def drop_expired_call_partitions():
+    """
+    Applies CALL_RETENTION_MONTHS; the scheduler runs it once a day. Monthly `call_messages` /
+    `call_analysis` partitions past the cutoff are dropped outright. `calls` itself is not partitioned
+    (both tables reference its call_id, and a partitioned table's keys must include its partition key),
+    so expired calls are deleted, and without CALL_PARTITION_BY_MONTH that delete cascades into their
+    messages and analyses row by row.
+    """
+    if not CALL_RETENTION_MONTHS:
+        return {"status": "skipped"}
+    engine = get_engine()
+    ensure_call_schema(engine)
+    current = month_start(datetime.now(timezone.utc))
+    months_back = current.year * 12 + current.month - 1 - CALL_RETENTION_MONTHS
+    cutoff = datetime(months_back // 12, months_back % 12 + 1, 1, tzinfo=timezone.utc)
+
+    dropped = 0
+    with engine.begin() as conn:
+        # Every process schedules it; one of them applies it
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext('call_retention'))")).scalar():
+            return {"status": "skipped"}
+        partitions = conn.execute(text("""
+            SELECT child.relname
+            FROM pg_inherits i
+            JOIN pg_class child ON child.oid = i.inhrelid
+            JOIN pg_class parent ON parent.oid = i.inhparent
+            WHERE parent.relname ~ '^call_(messages|analysis)_p_'
+        """)).scalars().all()
+        for name in partitions:
+            match = re.search(r"_(\d{4})(\d{2})$", name)
+            if match and datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc) < cutoff:
+                conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                dropped += 1
+        deleted = conn.execute(text("DELETE FROM calls WHERE call_start_time < :cutoff"), {"cutoff": cutoff}).rowcount
+    _known_partitions.clear()
+    if dropped or deleted:
+        print(f"[RETENTION] Dropped {dropped} call partitions and deleted {deleted} calls older than {cutoff:%Y-%m}.")
+    return {"status": "success", "partitions_dropped": dropped, "calls_deleted": deleted}
+
+# Daily rollups PowerBI reads instead of aggregating the raw call and case tables on every refresh
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS rollup_calls_daily (
+        call_date DATE NOT NULL,
+        ai_agent_id TEXT NOT NULL,
+        calls INTEGER NOT NULL,
+        total_duration_seconds DOUBLE PRECISION,
+        avg_duration_seconds DOUBLE PRECISION,
+        avg_initial_response_time DOUBLE PRECISION,
+        PRIMARY KEY (call_date, ai_agent_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_call_finish_reasons_daily (
+        call_date DATE NOT NULL,
+        ai_agent_id TEXT NOT NULL,
+        call_finish_reason TEXT NOT NULL,
+        calls INTEGER NOT NULL,
+        PRIMARY KEY (call_date, ai_agent_id, call_finish_reason)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_products_searched_daily (
+        call_date DATE NOT NULL,
+        ai_agent_id TEXT NOT NULL,
+        product TEXT NOT NULL,
+        searches INTEGER NOT NULL,
+        PRIMARY KEY (call_date, ai_agent_id, product)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_cases_daily (
+        created_date DATE NOT NULL,
+        status TEXT NOT NULL,
+        reason TEXT NOT NULL,
+        case_type TEXT NOT NULL,
+        cases INTEGER NOT NULL,
+        PRIMARY KEY (created_date, status, reason, case_type)
+    )
+    """
+]
+
+# Calls belonging to the (call_date, ai_agent_id) buckets in `k`, as an index-friendly time range
+_ROLLUP_BUCKET_CALLS = """
+    FROM calls c
+    JOIN unnest(CAST(:dates AS date[]), CAST(:agents AS text[])) AS k (call_date, ai_agent_id)
+      ON c.ai_agent_id = k.ai_agent_id
+     AND c.call_start_time >= (k.call_date::timestamp AT TIME ZONE :tz)
+     AND c.call_start_time < ((k.call_date + 1)::timestamp AT TIME ZONE :tz)
+"""
+
+def rollup_buckets(call_rows):
+    """(call_date, ai_agent_id) buckets touched by the given calls, in ROLLUP_TIMEZONE days."""
+    tz = pytz.timezone(ROLLUP_TIMEZONE)
+    return {
+        (row["call_start_time"].astimezone(tz).date(), row["ai_agent_id"])
+        for row in call_rows
+        if row["call_start_time"] is not None and row["ai_agent_id"] is not None
+    }
+
+def refresh_call_rollups(conn, buckets=None):
+    """
+    Recomputes the call rollups for the given (call_date, ai_agent_id) buckets only.
+    Passing None rebuilds every bucket, which is used once when the rollup tables are first created.
+    """
+    if buckets is None:
+        buckets = set(conn.execute(text(
+            "SELECT DISTINCT (call_start_time AT TIME ZONE :tz)::date, ai_agent_id FROM calls "
+            "WHERE call_start_time IS NOT NULL AND ai_agent_id IS NOT NULL"
+        ), {"tz": ROLLUP_TIMEZONE}).all())
+    if not buckets:
+        return
+    params = {
+        "dates": [date for date, _ in buckets],
+        "agents": [agent_id for _, agent_id in buckets],
+        "tz": ROLLUP_TIMEZONE
+    }
+    for table in ("rollup_calls_daily", "rollup_call_finish_reasons_daily", "rollup_products_searched_daily"):
+        conn.execute(text(f"""
+            DELETE FROM {table} r
+            USING unnest(CAST(:dates AS date[]), CAST(:agents AS text[])) AS k (call_date, ai_agent_id)
+            WHERE r.call_date = k.call_date AND r.ai_agent_id = k.ai_agent_id
+        """), params)
+
+    conn.execute(text(f"""
+        INSERT INTO rollup_calls_daily
+        SELECT k.call_date, k.ai_agent_id, count(*), sum(c.call_duration_seconds),
+               avg(c.call_duration_seconds), avg(c.initial_response_time)
+        {_ROLLUP_BUCKET_CALLS}
+        GROUP BY k.call_date, k.ai_agent_id
+    """), params)
+    conn.execute(text(f"""
+        INSERT INTO rollup_call_finish_reasons_daily
+        SELECT k.call_date, k.ai_agent_id, coalesce(c.call_finish_reason, 'unknown'), count(*)
+        {_ROLLUP_BUCKET_CALLS}
+        GROUP BY 1, 2, 3
+    """), params)
+    conn.execute(text(f"""
+        INSERT INTO rollup_products_searched_daily
+        SELECT k.call_date, k.ai_agent_id, a.analysis_result, count(*)
+        {_ROLLUP_BUCKET_CALLS}
+        JOIN call_analysis a ON a.call_id = c.call_id AND a.ai_agent_id = c.ai_agent_id
+        WHERE a.analysis_name = 'Products Searched' AND a.analysis_result IS NOT NULL
+        GROUP BY 1, 2, 3
+    """), params)
+
+def refresh_case_rollups(conn, created_dates=None):
+    """Recomputes `rollup_cases_daily` from `salesforce_cases` for the given dates (all dates when None)."""
+    params = {"tz": ROLLUP_TIMEZONE, "dates": list(created_dates or [])}
+    date_filter = "" if created_dates is None else "WHERE created_date = ANY(CAST(:dates AS date[]))"
+    conn.execute(text(f"DELETE FROM rollup_cases_daily {date_filter}"), params)
+    conn.execute(text(f"""
+        INSERT INTO rollup_cases_daily
+        SELECT created_date, status, reason, case_type, count(*)
+        FROM (
+            SELECT ("CreatedDate"::timestamptz AT TIME ZONE :tz)::date AS created_date,
+                   coalesce("Status", 'unknown') AS status,
+                   coalesce("Reason", 'unknown') AS reason,
+                   coalesce("Type", 'unknown') AS case_type
+            FROM salesforce_cases
+            WHERE "CreatedDate" IS NOT NULL
+        ) cases
+        {date_filter}
+        GROUP BY 1, 2, 3, 4
+    """), params)
+
+def parse_timestamp(value):
+    """Verbex timestamps arrive as ISO strings (sometimes epoch seconds); returns an aware datetime or None."""
+    if value in (None, ""):
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, timezone.utc)
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+def parse_call(call, agent_id):
+    """Splits one Verbex call into its `calls` row and its slim `call_messages` rows."""
+    call_id = call.get("_id")
+    initial_response_time = None
+    message_rows = []
+
+    messages = call.get("messages", [])
+    if not isinstance(messages, list):
+        return None, []
+
+    for msg_index, message in enumerate(messages):
+        message_role = message.get('role')
+        message_content = message.get('content')
+        message_timestamp_seconds = None
+
+        if isinstance(message_content, str):
+            try:
+                ts_part, message_content = message_content.split('s - ', 1)
+                if ts_part.startswith('('):
+                    ts_part = ts_part[1:]
+
+                if 'Playing welcome message' in message_content:
+                    initial_response_time = float(ts_part)
+
+                message_content = message_content.split(')', 1)[1].strip()
+                message_timestamp_seconds = float(ts_part)
+            except Exception:
+                message_timestamp_seconds = None
+                message_content = message.get('content')
+
+        if message_content != '':
+            message_rows.append({
+                'call_id': call_id,
+                'message_index': msg_index,
+                'message_role': message_role,
+                'message_content': message_content,
+                'message_timestamp_seconds': message_timestamp_seconds
+            })
+
+    call_row = {
+        'call_id': call_id,
+        'ai_agent_id': agent_id,
+        'ai_agent_name': call.get("ai_agent_name"),
+        'call_status': call.get("call_status"),
+        'call_start_time': parse_timestamp(call.get("call_start_time")),
+        'call_end_time': parse_timestamp(call.get("call_end_time")),
+        'call_duration_seconds': call.get("call_duration_seconds"),
+        'call_type': call.get("call_type"),
+        'call_finish_reason': call.get("call_finish_reason"),
+        'recorded_call_audio_url': call.get("recorded_call_audio_url"),
+        'initial_response_time': initial_response_time
+    }
+    return call_row, message_rows
+
+def fetch_call_analysis(agent_id, call_id, headers):
+    """Fetches the post-call analysis of one call as `call_analysis` rows."""
+    analysis_rows = []
+    analysis_url = f"{VERBEX_API_BASE_URL}/v2/ai-agents/{agent_id}/postcall-analysis/results/{call_id}"
+    try:
+        analysis_response = upstream_request("GET", analysis_url, "verbex.analysis", headers=headers)
+        analysis_json = analysis_response.json()
 
-        response = requests.get(query_url, headers=headers)
-        response.raise_for_status()
+        items = analysis_json.get('data', {}).get('items', [])
+        for item in items:
+            name = item.get('name')
+            result = item.get('result')
 
-        data = response.json()
-        records = data.get("records", [])
+            if name == 'Products Searched ' and result:
+                # Split using regex to get numbered items (1. ..., 2. ..., etc.)
+                products = re.split(r'\d+\.\s*', result)
+                products = [p.strip() for p in products if p.strip()]  # remove empty entries
 
-        if not records:
-            return jsonify({"error": "No case found with that CaseNumber."}), 404
+                for product in products:
+                    analysis_rows.append({
+                        'call_id': call_id,
+                        'analysis_name': name.strip(),
+                        'analysis_result': product
+                    })
+            else:
+                analysis_rows.append({
+                    'call_id': call_id,
+                    'analysis_name': name,
+                    'analysis_result': result
+                })
 
-        return jsonify(records[0]), 200
+    except Exception as e:
+        print(f"Analysis failed for {call_id}: {e}")
+    return analysis_rows
 
-    except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+def store_calls(engine, call_rows, message_rows, analysis_rows):
+    """
+    Upserts calls by `call_id`: their previous messages and analysis go with them (via cascade)
+    and everything is re-inserted, together with the rollup buckets it touches, in one transaction.
+    """
+    if not call_rows:
+        return
+    calls_by_id = {row["call_id"]: row for row in call_rows}
+    for row in message_rows + analysis_rows:
+        call = calls_by_id[row["call_id"]]
+        row["ai_agent_id"] = call["ai_agent_id"]
+        row["call_start_time"] = call["call_start_time"]
+
+    import pandas as pd
+
+    with sync_phase("dataframe_build") as phase:
+        df_calls = pd.DataFrame(call_rows, columns=CALL_COLUMNS)
+        df_messages = pd.DataFrame(message_rows, columns=MESSAGE_COLUMNS)
+        df_analysis = pd.DataFrame(analysis_rows, columns=ANALYSIS_COLUMNS)
+        phase["rows"] += len(call_rows) + len(message_rows) + len(analysis_rows)
+
+    # Partition DDL runs in its own transaction so the set of known partitions never gets ahead of the database
+    with sync_phase("partition_ddl"), engine.begin() as conn:
+        ensure_call_partitions(conn, {(row["ai_agent_id"], month_start(row["call_start_time"])) for row in call_rows})
+
+    with engine.begin() as conn:
+        with sync_phase("to_sql") as phase:
+            # The webhook, the queued sync and a backfill can store the same call at once. Under READ COMMITTED
+            # both would delete nothing and one insert would fail on the key, so writers of a call_id take
+            # turns; locks are taken in key order so overlapping batches cannot deadlock.
+            conn.execute(text("""
+                SELECT pg_advisory_xact_lock(key)
+                FROM (SELECT DISTINCT hashtextextended(call_id, 0) AS key FROM unnest(CAST(:call_ids AS text[])) AS call_id
+                      ORDER BY key) AS keys
+            """), {"call_ids": list(calls_by_id)})
+            conn.execute(text("DELETE FROM calls WHERE call_id = ANY(:call_ids)"), {"call_ids": list(calls_by_id)})
+            df_calls.to_sql("calls", conn, if_exists="append", index=False)
+            if message_rows:
+                df_messages.to_sql("call_messages", conn, if_exists="append", index=False, method="multi", chunksize=1000)
+            if analysis_rows:
+                df_analysis.to_sql("call_analysis", conn, if_exists="append", index=False, method="multi", chunksize=1000)
+            phase["rows"] += len(call_rows) + len(message_rows) + len(analysis_rows)
+        with sync_phase("rollups"):
+            refresh_call_rollups(conn, rollup_buckets(call_rows))
+
+_parquet_manifest_lock = threading.Lock()
+
+@contextmanager
+def parquet_export_lock():
+    """Serializes exports across threads and, through a lock file in PARQUET_EXPORT_DIR, across processes."""
+    with _parquet_manifest_lock:
+        os.makedirs(PARQUET_EXPORT_DIR, exist_ok=True)
+        with open(os.path.join(PARQUET_EXPORT_DIR, ".manifest.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+def read_parquet_manifest():
+    try:
+        with open(os.path.join(PARQUET_EXPORT_DIR, "manifest.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def write_parquet_manifest(manifest):
+    manifest_path = os.path.join(PARQUET_EXPORT_DIR, "manifest.json")
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+def parquet_day_files(entry):
+    """Files of one dataset/day manifest entry (the previous manifest format held a single file)."""
+    return [entry] if "path" in entry else entry.get("files", [])
+
+def export_parquet(dataset, partitions, run_id, columns=None, replace=False):
+    """
+    Writes rows of one dataset as compressed Parquet under PARQUET_EXPORT_DIR: one new `part-<run_id>.parquet`
+    per `date=YYYY-MM-DD` partition of `partitions` ({day, or None for "unknown": rows}), listed in manifest.json.
+    Call datasets add a file per run and are merged per day later by `compact_parquet`; with `replace` the new
+    file supersedes the day's files instead (the case snapshot). Does nothing unless PARQUET_EXPORT_DIR is set.
+    """
+    if not PARQUET_EXPORT_DIR or not partitions:
+        return []
+    import pandas as pd
+    files, replaced = [], []
+    with parquet_export_lock():
+        manifest = read_parquet_manifest()
+        current = manifest.setdefault("datasets", {}).setdefault(dataset, {})
+        for day, rows in sorted(partitions.items(), key=lambda item: str(item[0])):
+            if not len(rows):
+                continue
+            day = day.isoformat() if day else "unknown"
+            directory = os.path.join(PARQUET_EXPORT_DIR, dataset, f"date={day}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{run_id}.parquet")
+            frame = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows, columns=columns)
+            frame.to_parquet(path + ".tmp", engine="pyarrow", compression=PARQUET_COMPRESSION, index=False)
+            os.replace(path + ".tmp", path)
+            written = {
+                "path": os.path.relpath(path, PARQUET_EXPORT_DIR),
+                "rows": len(frame),
+                "run_id": run_id,
+                "written_at": datetime.now(timezone.utc).isoformat()
+            }
+            previous = parquet_day_files(current.get(day, {}))
+            if replace:
+                replaced.extend(previous)
+                previous = []
+            current[day] = {"files": previous + [written]}
+            files.append(dict(written, date=day))
+        # The manifest moves to the new files before the old ones go, so it never names a deleted file
+        write_parquet_manifest(manifest)
+        for old in replaced:
+            try:
+                os.remove(os.path.join(PARQUET_EXPORT_DIR, old["path"]))
+            except FileNotFoundError:
+                pass
+    return files
+
+def compact_parquet_day(dataset, day):
+    """
+    Merges the files of one call dataset/day into one, keeping each call's rows from the newest file that
+    holds the call, and removes part files the manifest does not list. Returns True if anything changed.
+    """
+    import pandas as pd
+    with parquet_export_lock():
+        manifest = read_parquet_manifest()
+        current = manifest.get("datasets", {}).get(dataset, {})
+        files = parquet_day_files(current.get(day, {}))
+        directory = os.path.join(PARQUET_EXPORT_DIR, dataset, f"date={day}")
+        listed = {os.path.basename(f["path"]) for f in files}
+        # Left by an export that crashed before its manifest update, or by older versions
+        stray = [name for name in os.listdir(directory) if name.startswith("part-") and name not in listed] \
+            if os.path.isdir(directory) else []
+        if len(files) < 2 and not stray:
+            return False
+
+        if len(files) >= 2:
+            frame = pd.concat([pd.read_parquet(os.path.join(PARQUET_EXPORT_DIR, f["path"])).assign(_file=i)
+                               for i, f in enumerate(files)], ignore_index=True)
+            frame = frame[frame["_file"] == frame.groupby("call_id")["_file"].transform("max")]
+            frame = frame.drop(columns="_file")
+            run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+            path = os.path.join(directory, f"part-{run_id}.parquet")
+            frame.to_parquet(path + ".tmp", engine="pyarrow", compression=PARQUET_COMPRESSION, index=False)
+            os.replace(path + ".tmp", path)
+            current[day] = {"files": [{
+                "path": os.path.relpath(path, PARQUET_EXPORT_DIR),
+                "rows": len(frame),
+                "run_id": run_id,
+                "written_at": datetime.now(timezone.utc).isoformat()
+            }]}
+            write_parquet_manifest(manifest)
+            stray.extend(listed)
+        for name in stray:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return True
+
+@background_job("parquet_compaction")
+def compact_parquet():
+    """
+    Compacts the call datasets' Parquet days, so a call exported by several runs is held once. Works on
+    the Parquet files alone and takes the export lock one day at a time, so exports are not held up.
+    """
+    if not PARQUET_EXPORT_DIR:
+        return {"status": "skipped"}
+    days_compacted = 0
+    try:
+        for dataset in CALL_PARQUET_DATASETS:
+            with parquet_export_lock():
+                days = sorted(read_parquet_manifest().get("datasets", {}).get(dataset, {}))
+            for day in days:
+                days_compacted += compact_parquet_day(dataset, day)
+    except Exception as e:
+        print(f"[PARQUET] Could not compact call exports: {e}")
+        return {"status": "error", "error": str(e), "days_compacted": days_compacted}
+    return {"status": "success", "days_compacted": days_compacted}
+
+def call_date(row):
+    """Day (in ROLLUP_TIMEZONE) a call row belongs to, matching the rollup tables."""
+    start = row.get("call_start_time")
+    return start.astimezone(pytz.timezone(ROLLUP_TIMEZONE)).date() if start else None
+
+CALL_PARQUET_DATASETS = {"calls": CALL_COLUMNS, "call_messages": MESSAGE_COLUMNS, "call_analysis": ANALYSIS_COLUMNS}
+
+def export_calls_parquet(call_rows, message_rows, analysis_rows):
+    """Adds the rows just stored to the call datasets' Parquet files, one new file per call day they touch."""
+    if not PARQUET_EXPORT_DIR or not call_rows:
+        return
+    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    try:
+        for dataset, rows in (("calls", call_rows), ("call_messages", message_rows),
+                              ("call_analysis", analysis_rows)):
+            partitions = {}
+            for row in rows:
+                partitions.setdefault(call_date(row), []).append(row)
+            export_parquet(dataset, partitions, run_id, CALL_PARQUET_DATASETS[dataset])
+    except Exception as e:
+        print(f"[PARQUET] Could not export calls: {e}")
 
+@profiled_sync(lambda agent_id=IN_ENG_AGENT_ID, log_auto=False: f"calls:{agent_table_suffix(agent_id)}")
 def fetch_and_store_calls(agent_id=IN_ENG_AGENT_ID, log_auto=False):
     try:
         headers = {'Authorization': f'Bearer {AUTH_TOKEN}'}
-        engine = create_engine(DB_URI)
+        engine = get_engine()
+        with sync_phase("schema"):
+            ensure_call_schema(engine)
 
-        calls_url = f"https://api.verbex.ai/v1/calls?ai_agent_ids={agent_id}&page_size=100&sort_direction=desc"
-        calls_response = requests.get(calls_url, headers=headers)
+        calls_url = f"{VERBEX_API_BASE_URL}/v1/calls?ai_agent_ids={agent_id}&page_size=100&sort_direction=desc"
+        with sync_phase("verbex_list") as phase:
+            calls_response = upstream_request("GET", calls_url, "verbex.calls", headers=headers)
         if calls_response.status_code != 200:
             print(f"[ERROR] Failed to fetch calls: {calls_response.status_code} {calls_response.text}")
             return {
@@ -613,128 +2814,41 @@ def fetch_and_store_calls(agent_id=IN_ENG_AGENT_ID, log_auto=False):
                 "error": f"Could not parse JSON: {e} - Response: {calls_response.text}"
             }
         calls = calls_data.get('calls', [])
+        phase["rows"] += len(calls)
 
+        all_calls = []
         all_messages = []
         all_analyses = []
 
         for call in calls:
-            call_id = call.get("_id")
-            ai_agent_name = call.get("ai_agent_name")
-            call_status = call.get("call_status")
-            call_start_time = call.get("call_start_time")
-            call_end_time = call.get("call_end_time")
-            recorded_call_audio_url = call.get("recorded_call_audio_url")
-            call_duration_seconds = call.get("call_duration_seconds")
-            call_type = call.get("call_type")
-            call_finish_reason = call.get("call_finish_reason")
-            initial_response_time = None
-            messages = call.get("messages", [])
-
-            if not isinstance(messages, list):
+            with sync_phase("message_parsing") as phase:
+                call_row, message_rows = parse_call(call, agent_id)
+                phase["rows"] += len(message_rows)
+            if call_row is None:
                 continue
+            all_calls.append(call_row)
+            all_messages.extend(message_rows)
 
-            for msg_index, message in enumerate(messages):
-                message_role = message.get('role')
-                message_content = message.get('content')
-
-                if isinstance(message_content, str):
-                    try:
-                        ts_part, message_content = message_content.split('s - ', 1)
-                        if ts_part.startswith('('):
-                            ts_part = ts_part[1:]
-
-                        if 'Playing welcome message' in message_content:
-                            initial_response_time = ts_part
-
-                        message_content = message_content.split(')', 1)[1].strip()
-                        message_timestamp_seconds = float(ts_part)
-                    except Exception:
-                        message_timestamp_seconds = None
-                        message_content = message.get('content')
-
-                if message_content != '':
-                    all_messages.append({
-                        'call_id': call_id,
-                        'ai_agent_id': agent_id,
-                        'ai_agent_name': ai_agent_name,
-                        'call_status': call_status,
-                        'call_start_time': call_start_time,
-                        'call_end_time': call_end_time,
-                        'call_duration_seconds': call_duration_seconds,
-                        'call_type': call_type,
-                        'call_finish_reason': call_finish_reason,
-                        'recorded_call_audio_url': recorded_call_audio_url,
-                        'message_index': msg_index,
-                        'message_role': message_role,
-                        'message_content': message_content,
-                        'message_timestamp_seconds': message_timestamp_seconds,
-                        'initial_response_time': initial_response_time
-                    })
-
-            # Post-call analysis
-            analysis_url = f"https://api.verbex.ai/v2/ai-agents/{agent_id}/postcall-analysis/results/{call_id}"
-            try:
-                analysis_response = requests.get(analysis_url, headers=headers)
-                analysis_json = analysis_response.json()
-
-                items = analysis_json.get('data', {}).get('items', [])
-                if not items:
-                    continue
-
-                for item in items:
-                    name = item.get('name')
-                    result = item.get('result')
-
-                    if name == 'Products Searched ' and result:
-                        # Split using regex to get numbered items (1. ..., 2. ..., etc.)
-                        products = re.split(r'\d+\.\s*', result)
-                        products = [p.strip() for p in products if p.strip()]  # remove empty entries
-
-                        for product in products:
-                            all_analyses.append({
-                                'call_id': call_id,
-                                'analysis_name': name.strip(),
-                                'analysis_result': product
-                            })
-                    else:
-                        all_analyses.append({
-                            'call_id': call_id,
-                            'analysis_name': name,
-                            'analysis_result': result
-                        })
+            with sync_phase("analysis_fetch") as phase:
+                analysis_rows = fetch_call_analysis(agent_id, call_row["call_id"], headers)
+                phase["rows"] += len(analysis_rows)
+            all_analyses.extend(analysis_rows)
 
-            except Exception as e:
-                print(f"Analysis failed for {call_id}: {e}")
-
-            sleep(0.3)
-
-        df_messages = pd.DataFrame(all_messages)
-        df_analysis = pd.DataFrame(all_analyses)
-
-        if agent_id == IN_BN_AGENT_ID:
-            mssg_table = "call_messages_in_bn"
-            anal_table = "call_analysis_in_bn"
-        elif agent_id == OUT_ENG_AGENT_ID:
-            mssg_table = "call_messages_out_en"
-            anal_table = "call_analysis_out_en"
-        elif agent_id == OUT_BN_AGENT_ID:
-            mssg_table = "call_messages_out_bn"
-            anal_table = "call_analysis_out_bn"
-        else:
-            mssg_table = "call_messages"
-            anal_table = "call_analysis"
+            with sync_phase("analysis_throttle"):
+                sleep(0.3)
 
-        df_messages.to_sql(mssg_table, engine, if_exists="replace", index=False)
-        df_analysis.to_sql(anal_table, engine, if_exists="replace", index=False)
+        store_calls(engine, all_calls, all_messages, all_analyses)
+        with sync_phase("parquet_export"):
+            export_calls_parquet(all_calls, all_messages, all_analyses)
 
         if log_auto:
-            print(f"[AUTO SYNC] Synced {len(calls)} calls, {len(df_messages)} messages, {len(df_analysis)} analyses.")
+            print(f"[AUTO SYNC] Synced {len(calls)} calls, {len(all_messages)} messages, {len(all_analyses)} analyses.")
 
         return {
             "status": "success",
             "calls_processed": len(calls),
-            "messages_saved": len(df_messages),
-            "analyses_saved": len(df_analysis)
+            "messages_saved": len(all_messages),
+            "analyses_saved": len(all_analyses)
         }
 
     except Exception as e:
@@ -744,6 +2858,525 @@ def fetch_and_store_calls(agent_id=IN_ENG_AGENT_ID, log_auto=False):
             "error": str(e)
         }
 
+# One ingestion per call_id at a time; a repeated event joins the running one
+call_ingest_flights = SingleFlight()
+
+def ingest_call(call_id, agent_id=None, call=None):
+    """
+    Stores one finished Verbex call, its messages and its post-call analysis without waiting for the
+    next sync. The call is fetched from Verbex unless the event carried it. Uses the sync's parsing and
+    `store_calls`, which upserts by call_id, so a repeated event rewrites the same rows.
+    """
+    try:
+        headers = {'Authorization': f'Bearer {AUTH_TOKEN}'}
+        if call is None:
+            call_url = f"{VERBEX_API_BASE_URL}/v1/calls/{quote(call_id, safe='')}"
+            response = upstream_request("GET", call_url, "verbex.call", headers=headers)
+            if response.status_code != 200:
+                return {"status": "error", "error": f"Failed to fetch call: {response.status_code} {response.text}"}
+            call = response.json()
+        call = dict(call, _id=call_id)
+        agent_id = agent_id or call.get("ai_agent_id")
+        if not agent_id:
+            return {"status": "error", "error": f"No ai_agent_id for call {call_id}"}
+
+        call_row, message_rows = parse_call(call, agent_id)
+        if call_row is None:
+            return {"status": "error", "error": f"Call {call_id} has no messages list"}
+        analysis_rows = fetch_call_analysis(agent_id, call_id, headers)
+
+        engine = get_engine()
+        ensure_call_schema(engine)
+        store_calls(engine, [call_row], message_rows, analysis_rows)
+        export_calls_parquet([call_row], message_rows, analysis_rows)
+        return {
+            "status": "success",
+            "call_id": call_id,
+            "messages_saved": len(message_rows),
+            "analyses_saved": len(analysis_rows)
+        }
+    except Exception as e:
+        print(f"[CALL INGEST] {call_id}: {e}")
+        return {"status": "error", "error": str(e)}
+
+def ingest_call_in_background(call_id, agent_id=None, call=None):
+    """Ingests a call; while Verbex has no analysis for it yet, ingests it again every CALL_ANALYSIS_RETRY_SECONDS."""
+    for attempt in range(CALL_ANALYSIS_RETRIES + 1):
+        if attempt:
+            sleep(CALL_ANALYSIS_RETRY_SECONDS)
+        result = call_ingest_flights.do(call_id, lambda: ingest_call(call_id, agent_id, call))
+        print(f"[CALL INGEST] {call_id}: {result}")
+        if result["status"] != "success" or result["analyses_saved"]:
+            return
+
+@app.route("/call-ended", methods=["POST"])
+@log_request_input("/call-ended")
+def call_ended():
+    """
+    Webhook for the end of a call. Stores the call in the background, so it reaches the call store
+    and the rollups in seconds instead of at the next sync. Expects JSON with "call_id" and, unless
+    the call carries it, "ai_agent_id"; a full call object under "call" saves fetching it again.
+    """
+    data = request.get_json() or {}
+    call = data.get("call") if isinstance(data.get("call"), dict) else None
+    call_id = data.get("call_id") or (call or {}).get("_id")
+    if not call_id:
+        return jsonify({"error": "Missing 'call_id' in request body"}), 400
+
+    agent_id = data.get("ai_agent_id") or data.get("agent_id")
+    threading.Thread(target=ingest_call_in_background, args=(str(call_id), agent_id, call), daemon=True).start()
+    return jsonify({"message": "Call ingestion started", "call_id": call_id}), 202
+
+class AgentRegistryError(Exception):
+    pass
+
+def register_agent(agent_id, fields):
+    """
+    Adds an agent to the registry and queues its call sync, or updates the given fields of a registered one.
+    The suffix names the agent's partitions and views, so it cannot change once it is registered,
+    and a new agent whose calls are already stored must keep the name those partitions have.
+    """
+    engine = get_engine()
+    ensure_call_schema(engine)
+    with engine.begin() as conn:
+        current = conn.execute(text("SELECT suffix FROM verbex_agents WHERE ai_agent_id = :agent_id FOR UPDATE"),
+                               {"agent_id": agent_id}).scalar()
+        suffix = fields.get("suffix") or current or agent_table_suffix(agent_id)
+        if current:
+            if suffix != current:
+                raise AgentRegistryError(f"Agent {agent_id} is registered as '{current}'; its suffix cannot change")
+            updates = [name for name in ("name", "enabled", "sync_interval_minutes") if name in fields]
+            if updates:
+                conn.execute(text(
+                    f"UPDATE verbex_agents SET {', '.join(f'{name} = :{name}' for name in updates)} "
+                    "WHERE ai_agent_id = :agent_id"
+                ), dict({name: fields[name] for name in updates}, agent_id=agent_id))
+        else:
+            stored_as = agent_table_suffix(agent_id)
+            has_calls = conn.execute(text("SELECT EXISTS (SELECT 1 FROM calls WHERE ai_agent_id = :agent_id)"),
+                                     {"agent_id": agent_id}).scalar()
+            if has_calls and suffix != stored_as:
+                raise AgentRegistryError(f"Calls of agent {agent_id} are already stored as '{stored_as}'")
+            taken_by = conn.execute(text("SELECT ai_agent_id FROM verbex_agents WHERE suffix = :suffix"),
+                                    {"suffix": suffix}).scalar()
+            if taken_by:
+                raise AgentRegistryError(f"Suffix '{suffix}' is already used by agent {taken_by}")
+            conn.execute(text("""
+                INSERT INTO verbex_agents (ai_agent_id, suffix, name, enabled, sync_interval_minutes)
+                VALUES (:agent_id, :suffix, :name, :enabled, :sync_interval_minutes)
+            """), {"agent_id": agent_id, "suffix": suffix, "name": fields.get("name"),
+                   "enabled": fields.get("enabled", True), "sync_interval_minutes": fields.get("sync_interval_minutes")})
+            conn.execute(text("INSERT INTO call_sync_jobs (ai_agent_id) VALUES (:agent_id)"), {"agent_id": agent_id})
+            create_agent_views(conn, agent_id, suffix)
+    _agent_suffixes[agent_id] = suffix
+    return {"ai_agent_id": agent_id, "suffix": suffix, "created": not current}
+
+def list_agents():
+    """The registry joined with each agent's sync job."""
+    engine = get_engine()
+    ensure_call_schema(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT a.ai_agent_id, a.suffix, a.name, a.enabled, a.sync_interval_minutes, a.created_at,
+                   j.next_run_at, j.lease_owner, j.lease_expires_at, j.heartbeat_at, j.attempts,
+                   j.last_started_at, j.last_finished_at, j.last_status, j.last_error
+            FROM verbex_agents a
+            LEFT JOIN call_sync_jobs j USING (ai_agent_id)
+            ORDER BY a.created_at, a.suffix
+        """)).mappings().all()
+    return [{key: value.isoformat() if isinstance(value, datetime) else value for key, value in row.items()}
+            for row in rows]
+
+call_sync_stats = {"claimed": 0, "succeeded": 0, "failed": 0, "leases_lost": 0, "errors": 0, "last_error": None}
+_call_sync_stats_lock = threading.Lock()
+call_sync_workers = []
+
+class CallSyncWorker:
+    """
+    Runs the call syncs queued in `call_sync_jobs`. Each job is one agent; a worker claims a due job with
+    FOR UPDATE SKIP LOCKED, so workers in any number of processes and nodes never take the same agent,
+    and holds it under a lease it renews every CALL_SYNC_HEARTBEAT_SECONDS while the sync runs.
+    A job whose worker died is claimed again once its lease expires.
+    """
+    def __init__(self, index=0):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{index}"
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name=f"call-sync-{self.worker_id}", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def claim(self, agent_id=None):
+        """Leases the most overdue job, or with `agent_id` that agent's job whether it is due or not; None if taken."""
+        engine = get_engine()
+        ensure_call_schema(engine)
+        with engine.begin() as conn:
+            job = conn.execute(text("""
+                UPDATE call_sync_jobs j
+                SET lease_owner = :worker_id,
+                    lease_expires_at = now() + make_interval(secs => :lease_seconds),
+                    heartbeat_at = now(), last_started_at = now(), attempts = j.attempts + 1
+                FROM verbex_agents a
+                WHERE a.ai_agent_id = j.ai_agent_id
+                  AND j.ai_agent_id = (
+                      SELECT q.ai_agent_id
+                      FROM call_sync_jobs q
+                      JOIN verbex_agents qa USING (ai_agent_id)
+                      WHERE (CASE WHEN CAST(:agent_id AS text) IS NULL THEN qa.enabled AND q.next_run_at <= now()
+                                  ELSE q.ai_agent_id = :agent_id END)
+                        AND (q.lease_expires_at IS NULL OR q.lease_expires_at < now())
+                      ORDER BY q.next_run_at
+                      LIMIT 1
+                      FOR UPDATE OF q SKIP LOCKED
+                  )
+                RETURNING j.ai_agent_id, a.suffix, COALESCE(a.sync_interval_minutes, :interval) AS interval_minutes,
+                          j.attempts
+            """), {"worker_id": self.worker_id, "lease_seconds": CALL_SYNC_LEASE_SECONDS,
+                   "interval": CALL_SYNC_INTERVAL_MINUTES, "agent_id": agent_id}).mappings().first()
+        if job:
+            _agent_suffixes[job["ai_agent_id"]] = job["suffix"]
+        return job
+
+    def heartbeat(self, agent_id, done):
+        while not done.wait(CALL_SYNC_HEARTBEAT_SECONDS):
+            try:
+                with get_engine().begin() as conn:
+                    renewed = conn.execute(text("""
+                        UPDATE call_sync_jobs
+                        SET lease_expires_at = now() + make_interval(secs => :lease_seconds), heartbeat_at = now()
+                        WHERE ai_agent_id = :agent_id AND lease_owner = :worker_id
+                    """), {"agent_id": agent_id, "worker_id": self.worker_id,
+                           "lease_seconds": CALL_SYNC_LEASE_SECONDS}).rowcount
+            except Exception as e:
+                print(f"[CALL SYNC] {self.worker_id} could not renew the lease on {agent_id}: {e}")
+                continue
+            if not renewed:
+                print(f"[CALL SYNC] {self.worker_id} lost the lease on {agent_id}")
+                with _call_sync_stats_lock:
+                    call_sync_stats["leases_lost"] += 1
+                return
+
+    def finish(self, job, result):
+        succeeded = result.get("status") == "success"
+        if succeeded:
+            # Keeps the cadence of the previous interval jobs: the next run is due one interval after this one started
+            delay, since = job["interval_minutes"] * 60, "last_started_at"
+        else:
+            delay, since = min(job["interval_minutes"] * 60, CALL_SYNC_RETRY_SECONDS * 2 ** (job["attempts"] - 1)), "now()"
+        with get_engine().begin() as conn:
+            released = conn.execute(text(f"""
+                UPDATE call_sync_jobs
+                SET lease_owner = NULL, lease_expires_at = NULL, last_finished_at = now(),
+                    last_status = :status, last_error = :error,
+                    attempts = CASE WHEN :succeeded THEN 0 ELSE attempts END,
+                    next_run_at = CASE WHEN next_run_at > last_started_at THEN next_run_at  -- queued while it ran
+                                       ELSE {since} + make_interval(secs => :delay) END
+                WHERE ai_agent_id = :agent_id AND lease_owner = :worker_id
+            """), {"agent_id": job["ai_agent_id"], "worker_id": self.worker_id, "status": result.get("status"),
+                   "error": result.get("error"), "succeeded": succeeded, "delay": delay}).rowcount
+        if released:
+            with _call_sync_stats_lock:
+                call_sync_stats["succeeded" if succeeded else "failed"] += 1
+
+    def run_job(self, job):
+        with _call_sync_stats_lock:
+            call_sync_stats["claimed"] += 1
+        done = threading.Event()
+        threading.Thread(target=self.heartbeat, args=(job["ai_agent_id"], done), daemon=True).start()
+        try:
+            result = fetch_and_store_calls(agent_id=job["ai_agent_id"], log_auto=True)
+        finally:
+            done.set()
+        self.finish(job, result)
+        return result
+
+    @background_job("call_sync")
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                job = self.claim()
+                if job is None:
+                    self._stop.wait(CALL_SYNC_POLL_SECONDS)
+                    continue
+                self.run_job(job)
+            except Exception as e:
+                with _call_sync_stats_lock:
+                    call_sync_stats.update(errors=call_sync_stats["errors"] + 1, last_error=str(e))
+                print(f"[CALL SYNC] {self.worker_id}: {e}")
+                self._stop.wait(CALL_SYNC_POLL_SECONDS)
+
+def sync_agent_now(agent_id):
+    """
+    Runs one agent's call sync in this thread under the job's lease, so it never overlaps a queue worker
+    syncing the same agent; while another worker holds it, waits (up to CALL_SYNC_LEASE_SECONDS) for that run to end.
+    """
+    worker = CallSyncWorker(f"manual-{threading.get_ident()}")
+    deadline = time.monotonic() + CALL_SYNC_LEASE_SECONDS
+    while (job := worker.claim(agent_id)) is None:
+        if time.monotonic() >= deadline:
+            return {"status": "error", "error": f"Agent {agent_id} is still being synced by another worker"}
+        sleep(1)
+    return worker.run_job(job)
+
+def start_call_sync_workers(count=CALL_SYNC_WORKERS):
+    workers = [CallSyncWorker(len(call_sync_workers) + i).start() for i in range(count)]
+    call_sync_workers.extend(workers)
+    return workers
+
+@app.route("/agents", methods=["GET"])
+def get_agents():
+    """Registered agents with the state of their sync jobs, and this process's sync workers."""
+    try:
+        agents = list_agents()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    with _call_sync_stats_lock:
+        workers = dict(call_sync_stats, workers=[worker.worker_id for worker in call_sync_workers])
+    return jsonify({"agents": agents, "workers": workers}), 200
+
+@app.route("/agents", methods=["POST"])
+@log_request_input("/agents")
+def post_agent():
+    """
+    Registers a Verbex agent, whose calls are then synced by the job queue, or updates a registered one.
+    JSON: {"ai_agent_id": "...", "suffix": "out_hi", "name": "...", "enabled": true, "sync_interval_minutes": 10};
+    only "ai_agent_id" is required, and on update only the fields given change.
+    """
+    data = request.get_json(silent=True) or {}
+    agent_id = data.get("ai_agent_id")
+    if not agent_id or not isinstance(agent_id, str):
+        return jsonify({"error": "Missing 'ai_agent_id' in request body"}), 400
+    suffix = data.get("suffix")
+    if suffix is not None and (not isinstance(suffix, str) or not AGENT_SUFFIX_PATTERN.match(suffix)
+                               or suffix == "flat" or suffix.startswith("p_")):
+        return jsonify({"error": "'suffix' must be lowercase letters, digits and '_', start with a letter, "
+                                 "and be neither 'flat' nor start with 'p_'"}), 400
+    if "enabled" in data and not isinstance(data["enabled"], bool):
+        return jsonify({"error": "'enabled' must be true or false"}), 400
+    interval = data.get("sync_interval_minutes")
+    if interval is not None and (not isinstance(interval, int) or isinstance(interval, bool) or interval < 1):
+        return jsonify({"error": "'sync_interval_minutes' must be a positive integer or null"}), 400
+
+    fields = {name: data[name] for name in ("suffix", "name", "enabled", "sync_interval_minutes") if name in data}
+    try:
+        agent = register_agent(agent_id, fields)
+    except AgentRegistryError as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        print(f"[AGENTS] Could not register agent {agent_id}: {e}")
+        return jsonify({"error": str(e)}), 500
+    return jsonify(agent), 201 if agent["created"] else 200
+
+@app.route("/agents/<suffix>/sync", methods=["POST"])
+def queue_agent_sync(suffix):
+    """Makes an agent's call sync due now; the next free worker on any node runs it."""
+    engine = get_engine()
+    ensure_call_schema(engine)
+    with engine.begin() as conn:
+        queued = conn.execute(text("""
+            UPDATE call_sync_jobs SET next_run_at = now()
+            WHERE ai_agent_id = (SELECT ai_agent_id FROM verbex_agents WHERE suffix = :suffix)
+        """), {"suffix": suffix}).rowcount
+    if not queued:
+        return jsonify({"error": f"Unknown agent '{suffix}'"}), 404
+    return jsonify({"message": "Sync queued", "agent": suffix}), 202
+
+@app.cli.command("sync-worker")
+@click.option("--workers", default=CALL_SYNC_WORKERS, show_default=True, help="Worker threads in this process.")
+def sync_worker_command(workers):
+    """Runs call sync workers in the foreground, for nodes that only sync."""
+    start_call_sync_workers(workers)
+    print(f"[CALL SYNC] {workers} workers claiming jobs; Ctrl+C to stop")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        for worker in call_sync_workers:
+            worker.stop()
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across all threads that share it."""
+    def __init__(self, rate_per_second):
+        self.interval = 1 / rate_per_second if rate_per_second > 0 else 0
+        self._lock = threading.Lock()
+        self._next_at = time.monotonic()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait_for > 0:
+            sleep(wait_for)
+
+# Shared by all backfill workers, so the analysis API sees one steady rate however many pages run at once
+backfill_analysis_limiter = RateLimiter(BACKFILL_ANALYSIS_RATE_PER_SECOND)
+_backfill_lock = threading.Lock()
+
+BACKFILL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS call_backfill_pages (
+        ai_agent_id text NOT NULL,
+        page_size integer NOT NULL,
+        page integer NOT NULL,
+        calls integer NOT NULL,
+        messages integer NOT NULL,
+        analyses integer NOT NULL,
+        completed_at timestamptz NOT NULL DEFAULT now(),
+        PRIMARY KEY (ai_agent_id, page_size, page)
+    )
+"""
+
+def backfill_calls(agent_id, progress, restart=False):
+    """
+    Loads an agent's whole Verbex call history, oldest first, with BACKFILL_WORKERS page workers.
+    Each full page is stored with `store_calls` and checkpointed in `call_backfill_pages`, so a rerun
+    skips the pages already loaded; the last, partial page is fetched again every time.
+    Pages that fail are logged and left for the next run. `progress` is updated in place.
+    """
+    headers = {'Authorization': f'Bearer {AUTH_TOKEN}'}
+    page_size = BACKFILL_PAGE_SIZE
+    engine = get_engine()
+    ensure_call_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text(BACKFILL_SCHEMA))
+        if restart:
+            conn.execute(text("DELETE FROM call_backfill_pages WHERE ai_agent_id = :agent_id"), {"agent_id": agent_id})
+        done_pages = set(conn.execute(text(
+            "SELECT page FROM call_backfill_pages WHERE ai_agent_id = :agent_id AND page_size = :page_size"
+        ), {"agent_id": agent_id, "page_size": page_size}).scalars())
+
+    lock = threading.Lock()
+    cursor = {"next_page": 1, "last_page": None}
+    progress.update({"pages_skipped": len(done_pages), "pages_done": 0, "pages_failed": 0,
+                     "calls": 0, "messages": 0, "analyses": 0})
+
+    def claim_page():
+        with lock:
+            while cursor["next_page"] in done_pages:
+                cursor["next_page"] += 1
+            page = cursor["next_page"]
+            if cursor["last_page"] is not None and page > cursor["last_page"]:
+                return None
+            cursor["next_page"] += 1
+            return page
+
+    def load_page(page):
+        # Ascending order keeps a page's calls stable while new calls arrive at the end
+        calls_url = (f"{VERBEX_API_BASE_URL}/v1/calls?ai_agent_ids={agent_id}&page_size={page_size}"
+                     f"&page={page}&sort_direction=asc")
+        calls_response = upstream_request("GET", calls_url, "verbex.calls", headers=headers)
+        calls_response.raise_for_status()
+        calls = calls_response.json().get('calls', [])
+        if len(calls) < page_size:
+            with lock:
+                if cursor["last_page"] is None or page < cursor["last_page"]:
+                    cursor["last_page"] = page
+
+        call_rows, message_rows, analysis_rows = [], [], []
+        for call in calls:
+            call_row, rows = parse_call(call, agent_id)
+            if call_row is None:
+                continue
+            call_rows.append(call_row)
+            message_rows.extend(rows)
+            backfill_analysis_limiter.acquire()
+            analysis_rows.extend(fetch_call_analysis(agent_id, call_row["call_id"], headers))
+
+        store_calls(engine, call_rows, message_rows, analysis_rows)
+        export_calls_parquet(call_rows, message_rows, analysis_rows)
+        if len(calls) == page_size:
+            with engine.begin() as conn:
+                conn.execute(text("""
+                    INSERT INTO call_backfill_pages (ai_agent_id, page_size, page, calls, messages, analyses)
+                    VALUES (:agent_id, :page_size, :page, :calls, :messages, :analyses)
+                    ON CONFLICT (ai_agent_id, page_size, page) DO NOTHING
+                """), {"agent_id": agent_id, "page_size": page_size, "page": page, "calls": len(call_rows),
+                       "messages": len(message_rows), "analyses": len(analysis_rows)})
+        with lock:
+            progress["pages_done"] += 1
+            progress["calls"] += len(call_rows)
+            progress["messages"] += len(message_rows)
+            progress["analyses"] += len(analysis_rows)
+
+    def worker():
+        while True:
+            page = claim_page()
+            if page is None:
+                return
+            try:
+                load_page(page)
+            except Exception as e:
+                # This worker stops; the page is not checkpointed, so the next run picks it up again
+                print(f"[BACKFILL] Page {page} of agent {agent_id} failed: {e}")
+                with lock:
+                    progress["pages_failed"] += 1
+                return
+
+    workers = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, BACKFILL_WORKERS))]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    progress["status"] = "success" if progress["pages_failed"] == 0 else "partial"
+    return progress
+
+def run_backfill_in_background(task_id, agent_ids, restart=False):
+    """Backfills each agent in turn; progress is visible through /sync-status/<task_id> while it runs."""
+    progress = {agent_table_suffix(agent_id): {"status": "pending"} for agent_id in agent_ids}
+    background_tasks[task_id] = {"status": "running", "result": None, "progress": progress}
+    try:
+        for agent_id in agent_ids:
+            agent_progress = progress[agent_table_suffix(agent_id)]
+            agent_progress["status"] = "running"
+            backfill_calls(agent_id, agent_progress, restart)
+        background_tasks[task_id] = {"status": "completed", "result": progress}
+    except Exception as e:
+        print(f"[ERROR] Backfill failed for task_id: {task_id}. Error: {str(e)}")
+        background_tasks[task_id] = {"status": "failed", "result": str(e), "progress": progress}
+    finally:
+        _backfill_lock.release()
+
+@app.route("/backfill-calls", methods=["POST"])
+@log_request_input("/backfill-calls")
+def backfill_calls_endpoint():
+    """
+    Starts a historical backfill of Verbex calls in the background.
+    Optional JSON: {"agents": ["in_en", "out_bn", ...], "restart": false}; defaults to all registered agents.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        agents_by_suffix = {suffix: agent_id for agent_id, suffix in registered_agents(enabled_only=False)}
+    except Exception as e:
+        return jsonify({"error": f"Could not read the agent registry: {e}"}), 500
+    requested = data.get("agents") or list(agents_by_suffix)
+    unknown = [agent for agent in requested if agent not in agents_by_suffix]
+    if unknown:
+        return jsonify({"error": f"Unknown agents: {', '.join(unknown)}"}), 400
+    if not _backfill_lock.acquire(blocking=False):
+        return jsonify({"error": "A backfill is already running"}), 409
+
+    task_id = str(uuid.uuid4())
+    thread = threading.Thread(target=run_backfill_in_background,
+                              args=(task_id, [agents_by_suffix[agent] for agent in requested], bool(data.get("restart"))))
+    thread.daemon = True
+    thread.start()
+
+    return jsonify({
+        "message": "Backfill started in the background.",
+        "task_id": task_id,
+        "status_url": f"/sync-status/{task_id}"
+    }), 202
+
+@app.cli.command("backfill-calls")
+def backfill_calls_command():
+    """Backfills the call history of all registered agents in the foreground."""
+    _backfill_lock.acquire()
+    task_id = str(uuid.uuid4())
+    run_backfill_in_background(task_id, [agent_id for agent_id, _ in registered_agents(enabled_only=False)])
+    print(json.dumps(background_tasks[task_id], indent=2, default=str))
+
 @app.route("/salesforce-tickets", methods=["POST"])
 @log_request_input("/salesforce-tickets")
 def get_salesforce_tickets():
@@ -755,6 +3388,32 @@ def get_salesforce_tickets():
     if not (case_number or (owner_phone and reason)):
         return jsonify({"error": "Provide either 'case_number' or both 'owner_phone' and 'reason' in request body"}), 400
 
+    if case_number and len(case_number) < 8:
+        case_number = case_number.zfill(8)
+
+    try:
+        fields = parse_fields(data.get("fields"), TICKET_FIELDS + ["AccountPhone"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if case_number:
+        key, tags = ("tickets", case_number, fields), [f"case:{case_number}"]
+    else:
+        key, tags = ("tickets", owner_phone, reason, fields), [f"phone:{owner_phone}"]
+        # A call-start prefetch holds every case of this phone; answer from it when present
+        record_prefetch_use(owner_phone, ("cases-by-phone", owner_phone))
+        prefetched = case_cache.get(("cases-by-phone", owner_phone))
+        if prefetched is not None and prefetched[1] == 200:
+            # SOQL compares strings case-insensitively, so the local filter does too
+            tickets = [t for t in prefetched[0]["tickets"] if (t.get("Reason") or "").lower() == reason.lower()]
+            return jsonify({"tickets": [project(t, fields) for t in tickets]}), 200
+    body, status = cached_case_lookup(key, tags, lambda: lookup_salesforce_tickets(case_number, owner_phone, reason, fields))
+    if status == 200 and fields:
+        body = {"tickets": [project(t, fields) for t in body["tickets"]]}
+    return jsonify(body), status
+
+def lookup_salesforce_tickets(case_number, owner_phone, reason, fields=None):
+    """Lists Cases by CaseNumber, or by Reason and account phone, optionally only some `fields`; returns (body, status)."""
     try:
         access_token = get_salesforce_token()
         headers = {
@@ -763,16 +3422,8 @@ def get_salesforce_tickets():
         }
 
         if case_number:
-            if len(case_number) < 8:
-                case_number = case_number.zfill(8)
-            soql = f"""
-                SELECT AccountId, CaseNumber, ClosedDate, CreatedDate, 
-                       Description, Reason, Status, Subject, Type
-                FROM Case
-                WHERE CaseNumber = '{case_number}'
-            """
-            query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
-            response = requests.get(query_url, headers=headers)
+            query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(tickets_by_number_soql(case_number, fields))}"
+            response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
             response.raise_for_status()
             data = response.json()
             records = data.get("records", [])
@@ -782,39 +3433,60 @@ def get_salesforce_tickets():
                 if "attributes" in record:
                     del record["attributes"]
             
-            return jsonify({"tickets": records}), 200
+            return {"tickets": records}, 200
 
         # Else, search by Reason and phone using JOIN to avoid multiple API calls
-        soql = f"""
-            SELECT AccountId, CaseNumber, ClosedDate, CreatedDate,
-                   Description, Reason, Status, Subject, Type, Account.Phone
-            FROM Case
-            WHERE Reason = '{reason}' AND Account.Phone = '{owner_phone}'
-        """
-        query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
-        response = requests.get(query_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        records = data.get("records", [])
-
-        # Add AccountPhone field to each record for consistency
-        tickets = []
-        for rec in records:
-            # Remove attributes field
-            if "attributes" in rec:
-                del rec["attributes"]
-            
-            rec["AccountPhone"] = rec.get("Account", {}).get("Phone") if rec.get("Account") else None
-            # Remove the nested Account object to keep response clean
-            if "Account" in rec:
-                del rec["Account"]
-            tickets.append(rec)
+        return query_phone_tickets(headers, f"Reason = '{reason}' AND Account.Phone = '{owner_phone}'", fields), 200
+    except requests.exceptions.RequestException as e:
+        return {"error": str(e)}, 500
 
-        return jsonify({"tickets": tickets}), 200
+def lookup_cases_by_phone(phone):
+    """All Cases of the account(s) with this phone, in the `/salesforce-tickets` shape; returns (body, status)."""
+    try:
+        access_token = get_salesforce_token()
+        headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        }
+        return query_phone_tickets(headers, f"Account.Phone = '{phone}'"), 200
     except requests.exceptions.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+        return {"error": str(e)}, 500
 
+def query_phone_tickets(headers, where, fields=None):
+    query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(phone_tickets_soql(where, fields))}"
+    response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
+    response.raise_for_status()
+    data = response.json()
+    return {"tickets": phone_ticket_records(data.get("records", []))}
+
+def phone_ticket_records(records):
+    # Add AccountPhone field to each record for consistency
+    tickets = []
+    for rec in records:
+        # Remove attributes field
+        if "attributes" in rec:
+            del rec["attributes"]
+
+        rec["AccountPhone"] = rec.get("Account", {}).get("Phone") if rec.get("Account") else None
+        # Remove the nested Account object to keep response clean
+        if "Account" in rec:
+            del rec["Account"]
+        tickets.append(rec)
+
+    return tickets
+
+CASE_COLUMNS = [
+    "Id", "CaseNumber", "Subject", "Status", "Priority", "Origin", "Type", "Reason", "AccountId", "CreatedDate",
+    "ClosedDate"
+]
+
+@profiled_sync("salesforce_cases")
+@background_job("fetch_salesforce_cases")
 def fetch_salesforce_cases():
+    """
+    Replaces `salesforce_cases` with every Case of SALESFORCE_USERNAME. Returns the job result; its
+    "status" is "success" only when the cases were written, so callers can tell a failed sync.
+    """
     access_token = get_salesforce_token()
     headers = {
         "Authorization": f"Bearer {access_token}",
@@ -822,7 +3494,7 @@ def fetch_salesforce_cases():
     }
 
     base_query = (
-        "SELECT Id, CaseNumber, Subject, Status, Priority, Origin, Type, Reason, AccountId, CreatedDate, ClosedDate "
+        f"SELECT {', '.join(CASE_COLUMNS)} "
         "FROM Case "
         f"WHERE Owner.Username = '{SALESFORCE_USERNAME}'"
     )
@@ -833,41 +3505,355 @@ def fetch_salesforce_cases():
     cases = []
 
     try:
-        while query_url:
-            response = requests.get(query_url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        with sync_phase("salesforce_query") as phase:
+            while query_url:
+                response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
+                response.raise_for_status()
+                data = response.json()
 
-            cases.extend(data.get("records", []))
+                cases.extend(data.get("records", []))
 
-            next_records_url = data.get("nextRecordsUrl")
-            if next_records_url:
-                query_url = f"{SALESFORCE_INSTANCE_URL}{next_records_url}"
-            else:
-                break
+                next_records_url = data.get("nextRecordsUrl")
+                if next_records_url:
+                    query_url = f"{SALESFORCE_INSTANCE_URL}{next_records_url}"
+                else:
+                    break
+            phase["rows"] += len(cases)
         
         if cases:
+            import pandas as pd
             try:
-                df_cases = pd.DataFrame(cases)
-                
-                if 'attributes' in df_cases.columns:
-                    df_cases = df_cases.drop(columns=['attributes'])
-
-                engine = create_engine(DB_URI)
-                df_cases.to_sql("salesforce_cases", engine, if_exists="replace", index=False)
+                with sync_phase("dataframe_build") as phase:
+                    df_cases = pd.DataFrame(cases)
+
+                    if 'attributes' in df_cases.columns:
+                        df_cases = df_cases.drop(columns=['attributes'])
+                    phase["rows"] += len(df_cases)
+
+                engine = get_engine()
+                with engine.begin() as conn:
+                    with sync_phase("to_sql") as phase:
+                        df_cases.to_sql("salesforce_cases", conn, if_exists="replace", index=False)
+                        phase["rows"] += len(df_cases)
+                    with sync_phase("rollups"):
+                        for statement in ROLLUP_SCHEMA:
+                            conn.execute(text(statement))
+                        refresh_case_rollups(conn)
                 
                 print(f"Successfully saved {len(df_cases)} Salesforce cases to the 'salesforce_cases' table.")
 
             except Exception as db_error:
                 print(f"[ERROR] Could not save Salesforce cases to database: {db_error}")
+                return {"status": "error", "error": str(db_error), "tickets_saved": 0}
+
+            try:
+                with sync_phase("parquet_export"):
+                    run_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+                    # One snapshot per export day; a later run that day replaces it
+                    today = datetime.now(pytz.timezone(ROLLUP_TIMEZONE)).date()
+                    export_parquet("salesforce_cases", {today: df_cases}, run_id, replace=True)
+            except Exception as e:
+                print(f"[PARQUET] Could not export Salesforce cases: {e}")
 
         return {
+            "status": "success",
             "tickets_saved": len(cases),
         }
 
+    except SalesforceBudgetExhausted as e:
+        print(f"[SALESFORCE BUDGET] {e}")
+        return {"status": "paused", "error": str(e)}
     except requests.exceptions.RequestException as e:
+        print(f"[ERROR] Could not fetch Salesforce cases: {e}")
+        return {"status": "error", "error": str(e)}
+
+CASE_CHANGE_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS salesforce_cases (" + ", ".join(f'"{c}" text' for c in CASE_COLUMNS) + ")",
+    """
+    CREATE TABLE IF NOT EXISTS case_change_replay (
+        channel text PRIMARY KEY,
+        replay_id bigint NOT NULL,
+        updated_at timestamptz NOT NULL DEFAULT now()
+    )
+    """
+]
+
+case_change_stats = {
+    "connected": False, "events": 0, "cases_changed": 0, "cases_refetched": 0, "full_syncs": 0,
+    "last_replay_id": None, "last_event_at": None, "errors": 0, "last_error": None
+}
+_case_change_lock = threading.Lock()
+case_change_consumer = None
+
+class CaseChangeStreamError(Exception):
+    pass
+
+def case_change_event(message):
+    """
+    (payload, replay_id, channel) of one Case change event: either a CometD message of the change
+    event channel ({"channel", "data": {"payload", "event": {"replayId"}}}) or a bare event payload.
+    """
+    data = message.get("data")
+    if isinstance(data, dict) and "payload" in data:
+        return data["payload"], (data.get("event") or {}).get("replayId"), message.get("channel")
+    return message, None, None
+
+def case_changes(messages):
+    """Parses change events into (change_type, record_ids, fields) in order, plus the highest replay ID per channel."""
+    changes, checkpoints = [], {}
+    for message in messages:
+        payload, replay_id, channel = case_change_event(message)
+        if replay_id is not None and channel:
+            checkpoints[channel] = max(int(replay_id), checkpoints.get(channel, int(replay_id)))
+        header = payload.get("ChangeEventHeader") or {}
+        if header.get("entityName", "Case") != "Case":
+            continue
+        change_type = header.get("changeType") or ("UPDATE" if payload.get("Id") else "")
+        record_ids = header.get("recordIds") or [payload.get("Id")]
+        # Ids end up in SOQL and SQL; Salesforce ids are 15 or 18 alphanumerics
+        record_ids = [i for i in record_ids if re.fullmatch(r"[A-Za-z0-9]{15}(?:[A-Za-z0-9]{3})?", str(i or ""))]
+        if change_type == "UPDATE":
+            # Update events carry only the changed fields; the rest of the payload is null
+            changed = header.get("changedFields") or [c for c in CASE_COLUMNS if payload.get(c) is not None]
+            fields = {c: payload.get(c) for c in CASE_COLUMNS if c in changed and c != "Id"}
+            if "OwnerId" in changed:
+                fields["OwnerId"] = payload.get("OwnerId")
+        else:
+            fields = {c: payload.get(c) for c in CASE_COLUMNS if c != "Id"}
+        if change_type:
+            changes.append((change_type, record_ids, fields))
+    return changes, checkpoints
+
+def case_keys(conn, case_ids):
+    """{Id: (CaseNumber, created date in ROLLUP_TIMEZONE)} of the given cases held in `salesforce_cases`."""
+    rows = conn.execute(text("""
+        SELECT "Id", "CaseNumber", ("CreatedDate"::timestamptz AT TIME ZONE :tz)::date
+        FROM salesforce_cases
+        WHERE "Id" = ANY(:ids)
+    """), {"tz": ROLLUP_TIMEZONE, "ids": list(case_ids)})
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+def replace_case_row(conn, case_id, fields):
+    columns = ", ".join(f'"{c}"' for c in CASE_COLUMNS)
+    values = ", ".join(f":{c}" for c in CASE_COLUMNS)
+    conn.execute(text('DELETE FROM salesforce_cases WHERE "Id" = :Id'), {"Id": case_id})
+    conn.execute(text(f"INSERT INTO salesforce_cases ({columns}) VALUES ({values})"),
+                 {**{c: fields.get(c) for c in CASE_COLUMNS}, "Id": case_id})
+
+def fetch_cases_by_id(case_ids):
+    """Reads the given Cases of SALESFORCE_USERNAME back from Salesforce, 200 ids per query; returns {Id: record}."""
+    headers = {
+        "Authorization": f"Bearer {get_salesforce_token()}",
+        "Content-Type": "application/json"
+    }
+    ids, records = sorted(case_ids), {}
+    for start in range(0, len(ids), 200):
+        id_list = ", ".join(f"'{i}'" for i in ids[start:start + 200])
+        soql = (
+            f"SELECT {', '.join(CASE_COLUMNS)} FROM Case "
+            f"WHERE Owner.Username = '{SALESFORCE_USERNAME}' AND Id IN ({id_list})"
+        )
+        query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
+        response = upstream_request("GET", query_url, "salesforce.query", headers=headers)
+        response.raise_for_status()
+        for record in response.json().get("records", []):
+            record.pop("attributes", None)
+            records[record["Id"]] = record
+    return records
+
+def resync_cases():
+    """Full case sync in place of lost change events; raises CaseChangeStreamError if it fails."""
+    result = fetch_salesforce_cases()
+    if result.get("status") != "success":
+        raise CaseChangeStreamError(f"Full case sync {result.get('status')}: {result.get('error')}")
+    with _case_change_lock:
+        case_change_stats["full_syncs"] += 1
+
+def apply_case_changes(messages):
+    """
+    Applies Case change events (Change Data Capture shape) to `salesforce_cases`, `rollup_cases_daily`
+    and the case lookup cache, in one transaction that also moves the replay checkpoint of their channel.
+    The channel carries every Case in the org, so created, undeleted and re-assigned cases, updates to
+    cases the table does not hold yet, and gap events are read back through `fetch_cases_by_id`, which
+    only returns cases of SALESFORCE_USERNAME; a read-back case it does not return is removed.
+    A GAP_OVERFLOW event (too many changes to stream) runs a full case sync instead; if that fails,
+    this raises before the checkpoint moves, so the events are replayed.
+    Returns the number of cases changed.
+    """
+    changes, checkpoints = case_changes(messages)
+    if any(change_type == "GAP_OVERFLOW" for change_type, _, _ in changes):
+        resync_cases()
+        changes = []
+
+    case_ids = {i for _, record_ids, _ in changes for i in record_ids}
+    engine = get_engine()
+    with engine.begin() as conn:
+        for statement in CASE_CHANGE_SCHEMA + ROLLUP_SCHEMA:
+            conn.execute(text(statement))
+        known = case_keys(conn, case_ids)
+    refetch = {
+        i for change_type, record_ids, fields in changes for i in record_ids
+        if (change_type.startswith("GAP_") and change_type != "GAP_DELETE")
+        or change_type in ("CREATE", "UNDELETE")
+        or (change_type == "UPDATE" and (i not in known or "OwnerId" in fields))
+    }
+    # Read back before the write transaction, so it is not held open across Salesforce calls
+    fetched = fetch_cases_by_id(refetch) if refetch else {}
+
+    with engine.begin() as conn:
+        before = case_keys(conn, case_ids)
+        for change_type, record_ids, fields in changes:
+            for case_id in record_ids:
+                if change_type in ("DELETE", "GAP_DELETE"):
+                    conn.execute(text('DELETE FROM salesforce_cases WHERE "Id" = :Id'), {"Id": case_id})
+                elif case_id in refetch:
+                    continue
+                elif change_type == "UPDATE" and fields:
+                    assignments = ", ".join(f'"{c}" = :{c}' for c in fields)
+                    conn.execute(text(f'UPDATE salesforce_cases SET {assignments} WHERE "Id" = :Id'),
+                                 {**fields, "Id": case_id})
+        for case_id in refetch:
+            if case_id in fetched:
+                replace_case_row(conn, case_id, fetched[case_id])
+            else:
+                # Another user's case, or one moved away from ours
+                conn.execute(text('DELETE FROM salesforce_cases WHERE "Id" = :Id'), {"Id": case_id})
+        after = case_keys(conn, case_ids)
+        dates = {date for _, date in list(before.values()) + list(after.values()) if date is not None}
+        if dates:
+            refresh_case_rollups(conn, dates)
+        for channel, replay_id in checkpoints.items():
+            conn.execute(text("""
+                INSERT INTO case_change_replay (channel, replay_id) VALUES (:channel, :replay_id)
+                ON CONFLICT (channel) DO UPDATE SET replay_id = EXCLUDED.replay_id, updated_at = now()
+            """), {"channel": channel, "replay_id": replay_id})
+
+    # Only after the commit, so a lookup cannot re-cache the old row in between
+    for case_number, _ in list(before.values()) + list(after.values()):
+        invalidate_case(case_number)
+
+    with _case_change_lock:
+        case_change_stats["events"] += len(messages)
+        case_change_stats["cases_changed"] += len(case_ids)
+        case_change_stats["cases_refetched"] += len(fetched)
+        case_change_stats["last_event_at"] = datetime.now(timezone.utc).isoformat()
+        if checkpoints:
+            case_change_stats["last_replay_id"] = max(checkpoints.values())
+    return len(case_ids)
+
+def load_replay_id(channel):
+    """Replay ID to resume `channel` from: the checkpoint, else CASE_CDC_INITIAL_REPLAY_ID (-1 new events, -2 all retained)."""
+    with get_engine().begin() as conn:
+        for statement in CASE_CHANGE_SCHEMA:
+            conn.execute(text(statement))
+        replay_id = conn.execute(text("SELECT replay_id FROM case_change_replay WHERE channel = :channel"),
+                                 {"channel": channel}).scalar()
+    return CASE_CDC_INITIAL_REPLAY_ID if replay_id is None else replay_id
+
+class CaseChangeConsumer:
+    """
+    Long-polls the Salesforce Streaming API (CometD) for Case change events on one channel and applies
+    them with `apply_case_changes`. It resumes from the replay ID checkpointed in `case_change_replay`;
+    after any error it handshakes again and replays from the checkpoint, so events are not lost.
+    When the checkpoint is older than Salesforce retains events, it subscribes afresh and runs a full sync.
+    """
+    def __init__(self, channel=CASE_CDC_CHANNEL):
+        self.channel = channel
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, name="case-change-consumer", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def cometd(self, session, messages):
+        response = session.post(f"{SALESFORCE_INSTANCE_URL}/cometd/59.0", json=messages,
+                                timeout=(UPSTREAM_CONNECT_TIMEOUT_SECONDS, CASE_CDC_POLL_TIMEOUT_SECONDS))
+        if response.status_code == 401:
+            get_salesforce_token(refresh=True)
+        response.raise_for_status()
+        return response.json()
+
+    def subscribe(self, session, replay_id):
+        return self.cometd(session, [{
+            "channel": "/meta/subscribe", "clientId": self.client_id, "subscription": self.channel,
+            "ext": {"replay": {self.channel: replay_id}}
+        }])[0]
+
+    def connect(self, session):
+        session.headers["Authorization"] = f"Bearer {get_salesforce_token()}"
+        handshake = self.cometd(session, [{
+            "channel": "/meta/handshake", "version": "1.0", "supportedConnectionTypes": ["long-polling"],
+            "ext": {"replay": True}
+        }])[0]
+        if not handshake.get("successful"):
+            raise CaseChangeStreamError(f"Handshake failed: {handshake.get('error')}")
+        self.client_id = handshake["clientId"]
+
+        replay_id = load_replay_id(self.channel)
+        reply = self.subscribe(session, replay_id)
+        if not reply.get("successful") and replay_id >= 0 and "replayid" in str(reply.get("error", "")).lower():
+            print(f"[CASE CDC] Replay ID {replay_id} is no longer retained; subscribing to new events and resyncing")
+            replay_id = -1
+            reply = self.subscribe(session, replay_id)
+            if reply.get("successful"):
+                # Drop the stale checkpoint only once the resync is stored; if it fails we reconnect and retry
+                resync_cases()
+                with get_engine().begin() as conn:
+                    conn.execute(text("DELETE FROM case_change_replay WHERE channel = :channel"),
+                                 {"channel": self.channel})
+        if not reply.get("successful"):
+            raise CaseChangeStreamError(f"Subscribe to {self.channel} failed: {reply.get('error')}")
+        print(f"[CASE CDC] Subscribed to {self.channel} from replay ID {replay_id}")
+
+    @background_job("case_change_events")
+    def run(self):
+        session = requests.Session()
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self.connect(session)
+                with _case_change_lock:
+                    case_change_stats["connected"] = True
+                backoff = 1
+                while not self._stop.is_set():
+                    replies = self.cometd(session, [{
+                        "channel": "/meta/connect", "clientId": self.client_id, "connectionType": "long-polling"
+                    }])
+                    events = [m for m in replies if m.get("channel") == self.channel]
+                    if events:
+                        apply_case_changes(events)
+                    status = next((m for m in replies if m.get("channel") == "/meta/connect"), {})
+                    if not status.get("successful", True):
+                        raise CaseChangeStreamError(f"Connect failed: {status.get('error')}")
+            except Exception as e:
+                with _case_change_lock:
+                    case_change_stats.update(connected=False, errors=case_change_stats["errors"] + 1, last_error=str(e))
+                print(f"[CASE CDC] {e}; reconnecting in {backoff}s")
+                self._stop.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+@app.route("/case-change-events", methods=["POST"])
+@log_request_input("/case-change-events")
+def case_change_events():
+    """Applies Case change events pushed to us (relayed CDC events, or an Apex trigger posting the same shape)."""
+    data = request.get_json(silent=True)
+    events = data.get("events", [data]) if isinstance(data, dict) else data
+    if not events or not isinstance(events, list) or not all(isinstance(e, dict) for e in events):
+        return jsonify({"error": "Expected a change event, a list of change events, or {\"events\": [...]}."}), 400
+    try:
+        return jsonify({"cases_changed": apply_case_changes(events)}), 200
+    except Exception as e:
+        print(f"[CASE CDC] Could not apply pushed case changes: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route("/case-change-stats", methods=["GET"])
+def get_case_change_stats():
+    with _case_change_lock:
+        return jsonify(dict(case_change_stats, enabled=CASE_CDC_ENABLED, channel=CASE_CDC_CHANNEL)), 200
+
 # reason = case_category = category of ticket = Service, Complaint, Delivery
 # type = case_status = service info = Product Fixed, Product Not Fixed.
 
@@ -916,51 +3902,89 @@ def trigger_outbound_call(to_number= "+8801852341413",
         "Authorization": f"Bearer {AUTH_TOKEN}"
     }
     try:
-        response = requests.post('https://api.verbex.ai/v1/calls/dial-outbound-phone-call', json=data, headers=headers)
+        response = upstream_request("POST", f"{VERBEX_API_BASE_URL}/v1/calls/dial-outbound-phone-call", "verbex.dial", json=data, headers=headers)
         response.raise_for_status()
         return response.json()
-    except requests.RequestException as e:
+    except (requests.RequestException, CircuitOpenError) as e:
         return {"error": str(e)}
 
+# sObject Collections takes at most 200 records per request
+ESCALATION_BATCH_SIZE = 200
+
+def escalate_cases(cases, headers):
+    """
+    Sets Status='Escalated' and Priority='High' on the given cases with one sObject Collections request
+    per ESCALATION_BATCH_SIZE cases. Records are updated independently (allOrNone=false); returns the
+    cases Salesforce updated.
+    """
+    update_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/composite/sobjects"
+    escalated = []
+    for start in range(0, len(cases), ESCALATION_BATCH_SIZE):
+        batch = cases[start:start + ESCALATION_BATCH_SIZE]
+        payload = {
+            "allOrNone": False,
+            "records": [
+                {"attributes": {"type": "Case"}, "id": case["Id"], "Status": "Escalated", "Priority": "High"}
+                for case in batch
+            ]
+        }
+        response = upstream_request("PATCH", update_url, "salesforce.composite", headers=headers, json=payload)
+        response.raise_for_status()
+        for case, result in zip(batch, response.json()):
+            if result.get("success"):
+                escalated.append(case)
+            else:
+                print(f"[ERROR] Could not escalate case {case['CaseNumber']} ({case['Id']}): {result.get('errors')}")
+    return escalated
+
+@background_job("scheduled_outbound_call")
 def scheduled_outbound_call():
+    """
+    Escalates the open cases of SALESFORCE_USERNAME created more than a day ago and calls each customer,
+    10 minutes apart. The age filter runs in SOQL and the updates go out in batches, so a run makes
+    one query per 2,000 cases and one update per 200 instead of a request per case.
+    """
     access_token = get_salesforce_token()
     headers = {
         "Authorization": f"Bearer {access_token}",
         "Content-Type": "application/json"
     }
 
+    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
     soql = f"""
         SELECT Id, CaseNumber, Subject, Description, Status, Priority, CreatedDate, ClosedDate, Type, Reason, Account.Name, Account.Phone
         FROM Case
         WHERE Owner.Username = '{SALESFORCE_USERNAME}' AND Status != 'Closed'
+          AND CreatedDate <= {cutoff:%Y-%m-%dT%H:%M:%SZ}
+        ORDER BY CreatedDate
     """
 
     encoded_query = quote_plus(soql)
     query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={encoded_query}"
 
-    try:
-        response = requests.get(query_url, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        records = data.get("records", [])
-        case = records[0]
+    responses = []
+    escalated = []
 
-        now = datetime.now(timezone.utc)
-        # Salesforce datetime format
-        sf_dt_format = "%Y-%m-%dT%H:%M:%S.%f%z"
+    try:
+        records = []
+        while query_url:
+            response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
+            response.raise_for_status()
+            data = response.json()
+            records.extend(data.get("records", []))
+            next_records_url = data.get("nextRecordsUrl")
+            query_url = f"{SALESFORCE_INSTANCE_URL}{next_records_url}" if next_records_url else None
 
         if not records:
             print("No cases found for outbound call.")
-            return
-        
-        responses = [] 
 
-        for case in records:
-            created_dt = datetime.strptime(case["CreatedDate"], sf_dt_format)
-            delta = now - created_dt
+        # Each batch is escalated just before its calls, so a run that stops early leaves few cases escalated but not called
+        for start in range(0, len(records), ESCALATION_BATCH_SIZE):
+            batch = escalate_cases(records[start:start + ESCALATION_BATCH_SIZE], headers)
+            escalated.extend(batch)
 
-            if delta.days >= 1:
-                account_phone = case.get("Account", {}).get("Phone", "")
+            for case in batch:
+                account_phone = (case.get("Account") or {}).get("Phone", "")
                 case_id = case["Id"]
                 case_number = case["CaseNumber"]
                 subject = case["Subject"]
@@ -968,22 +3992,13 @@ def scheduled_outbound_call():
                 case_type = case.get("Type")
                 case_category = case.get("Reason")
                 case_created = case["CreatedDate"]
-
-                # Update case status to 'Escalated'
-                update_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case/{case_id}"
-                update_payload = {
-                    "Status": "Escalated",
-                    "Priority": "High"
-                }
-                update_headers = {
-                    "Authorization": f"Bearer {access_token}",
-                    "Content-Type": "application/json"
-                }
-
-                response = requests.patch(update_url, headers=update_headers, json=update_payload)
-                response.raise_for_status()
+                invalidate_case(case_number, account_phone)
 
                 print(f"✅ Updated case {case_number} ({case_id}) to Status='Escalated' and Priority='High'")
+                if responses:
+                    #🕒 Wait for 10 minutes (600 seconds) before next call
+                    print("Waiting 10 minutes before next call...")
+                    time.sleep(600)
                 print(f"Triggering outbound call to {account_phone} for case: {case_number} ({case_id}) with subject: '{subject}' and description: '{description}' and status: {case_type} and category: {case_category} and case date: {case_created}.")
 
                 call_response = trigger_outbound_call(to_number=account_phone,
@@ -994,24 +4009,24 @@ def scheduled_outbound_call():
                                     call_reason="escalate",
                                     case_category=case_category,
                                     case_created=case_created)
-                
+
                 responses.append(call_response)
-            
-                #🕒 Wait for 10 minutes (600 seconds) before next call
-                print("Waiting 10 minutes before next call...")
-                time.sleep(600)
 
+    except SalesforceBudgetExhausted as e:
+        print(f"[SALESFORCE BUDGET] {e}")
     except requests.exceptions.RequestException as e:
         print(f"[ERROR] Failed to fetch cases for outbound call: {str(e)}")
 
     return jsonify({
+        "cases_escalated": len(escalated),
         "calls_triggered": len(responses),
         "details": responses
     }), 200
 
 def scheduled_callback_call():
+    import pandas as pd
     try:
-        engine = create_engine(DB_URI)
+        engine = get_engine()
         
         # Fetch callbacks that haven't been made yet
         with engine.connect() as connection:
@@ -1042,7 +4057,6 @@ def scheduled_callback_call():
             if "error" not in call_response:
                 # Update the record to mark as called
                 with engine.connect() as connection:
-                    from sqlalchemy import text
                     update_query = text("UPDATE to_callback SET called_again = TRUE WHERE call_id = :call_id")
                     connection.execute(update_query, {"call_id": row['call_id']})
                     connection.commit()
@@ -1076,24 +4090,35 @@ def scheduled_callback_call_endpoint():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def run_sync_in_background(task_id):
-    """A helper function to run all the time-consuming sync tasks in the background."""
+_sync_cprofile_lock = threading.Lock()
+
+def sync_profile_path(task_id):
+    return os.path.join(SYNC_PROFILE_DIR, f"sync-{task_id}.prof")
+
+def run_sync_in_background(task_id, profile=False):
+    """
+    A helper function to run all the time-consuming sync tasks in the background.
+    With `profile`, the run is recorded with cProfile (the caller holds `_sync_cprofile_lock`).
+    """
     print(f"Starting background sync for task_id: {task_id}")
     background_tasks[task_id] = {"status": "running", "result": None}
+    profiler = cProfile.Profile() if profile else None
     try:
-        calls_in_eng = fetch_and_store_calls(agent_id=IN_ENG_AGENT_ID, log_auto=True)
-        calls_in_bn = fetch_and_store_calls(agent_id=IN_BN_AGENT_ID, log_auto=True)
-        calls_out_eng = fetch_and_store_calls(agent_id=OUT_ENG_AGENT_ID, log_auto=True)
-        calls_out_bn = fetch_and_store_calls(agent_id=OUT_BN_AGENT_ID, log_auto=True)
+        if profiler:
+            profiler.enable()
+        agents = registered_agents()
+        results = {agent_id: sync_agent_now(agent_id) for agent_id, _ in agents}
         cases = fetch_salesforce_cases()
 
         result = {
-            "calls_in_eng": calls_in_eng,
-            "calls_in_bn": calls_in_bn,
-            "calls_out_eng": calls_out_eng,
-            "calls_out_bn": calls_out_bn,
+            "calls": {suffix: results[agent_id] for agent_id, suffix in agents},
             "cases": cases
         }
+        # Keys of the results before the agent registry, kept for existing /sync-status readers
+        for agent_id, key in ((IN_ENG_AGENT_ID, "calls_in_eng"), (IN_BN_AGENT_ID, "calls_in_bn"),
+                              (OUT_ENG_AGENT_ID, "calls_out_eng"), (OUT_BN_AGENT_ID, "calls_out_bn")):
+            if agent_id in results:
+                result[key] = results[agent_id]
         background_tasks[task_id] = {"status": "completed", "result": result}
         print(f"Background sync completed for task_id: {task_id}")
 
@@ -1101,14 +4126,28 @@ def run_sync_in_background(task_id):
         print(f"[ERROR] Background sync failed for task_id: {task_id}. Error: {str(e)}")
         background_tasks[task_id] = {"status": "failed", "result": str(e)}
 
+    finally:
+        if profiler:
+            profiler.disable()
+            try:
+                profiler.dump_stats(sync_profile_path(task_id))
+                background_tasks[task_id]["profile_url"] = f"/sync-status/{task_id}/profile"
+            except OSError as e:
+                print(f"[ERROR] Could not save sync profile for task_id: {task_id}. Error: {e}")
+            _sync_cprofile_lock.release()
+
 @app.route("/sync-calls-tickets", methods=["GET"])
 def sync_calls_endpoint():
     """
     Triggers the synchronization of calls and tickets in a background thread
     and returns a task ID to check the status.
     """
+    profile = request.args.get("profile", "false").lower() == "true"
+    if profile and not _sync_cprofile_lock.acquire(blocking=False):
+        return jsonify({"error": "A profiled sync is already running"}), 409
+
     task_id = str(uuid.uuid4())
-    thread = threading.Thread(target=run_sync_in_background, args=(task_id,))
+    thread = threading.Thread(target=run_sync_in_background, args=(task_id, profile))
     thread.daemon = True
     thread.start()
 
@@ -1127,13 +4166,34 @@ def get_sync_status(task_id):
 
     if task["status"] == "running":
         response = {"status": "running"}
+        if task.get("progress"):
+            response["progress"] = task["progress"]
     else:
         response = {
             "status": task["status"],
             "result": task["result"]
         }
+        if task.get("profile_url"):
+            response["profile_url"] = task["profile_url"]
     return jsonify(response), 200
 
+@app.route("/sync-status/<task_id>/profile", methods=["GET"])
+def get_sync_profile(task_id):
+    """Downloads the cProfile stats of a profiled sync run (`?format=text` for the top functions)."""
+    task = background_tasks.get(task_id)
+    if not task or not task.get("profile_url"):
+        return jsonify({"error": "No profile for this task"}), 404
+
+    path = sync_profile_path(task_id)
+    if request.args.get("format") == "text":
+        limit = request.args.get("limit", "50")
+        if not limit.isdecimal():
+            return jsonify({"error": "'limit' must be a positive integer"}), 400
+        stream = io.StringIO()
+        pstats.Stats(path, stream=stream).sort_stats("cumulative").print_stats(min(max(int(limit), 1), 500))
+        return stream.getvalue(), 200, {"Content-Type": "text/plain; charset=utf-8"}
+    return send_file(path, mimetype="application/octet-stream", as_attachment=True, download_name=f"sync-{task_id}.prof")
+
 @app.route("/trigger-obd-closed-case", methods=["POST"])
 @log_request_input("/trigger-obd-closed-case")
 def trigger_obd_closed_case():
@@ -1149,6 +4209,9 @@ def trigger_obd_closed_case():
         case_category = case.get('reason')
         customer_note = case.get('customerNote')
 
+        # Salesforce just closed this case; cached lookups still show the old status
+        invalidate_case(case_number, account_phone)
+
         print(f"Triggering outbound call to {account_phone} for case: {case_number} ({case_id}) "
               f"with subject: '{subject}' and description: '{description}' and status: {case_type} "
               f"and category: {case_category} " f"and note: {customer_note}.")
@@ -1174,8 +4237,273 @@ def trigger_obd_closed_case():
         print(f"Unexpected error: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+CALLBACK_COLUMNS = [
+    "to_number", "case_id", "case_status", "case_subject", "case_description", "call_reason", "case_category",
+    "call_id", "called_again", "preferred_time", "logged_at", "case_created"
+]
+CALLBACK_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS to_callback (
+        {", ".join(f"{c} boolean" if c == "called_again" else f"{c} text" for c in CALLBACK_COLUMNS)}
+    )
+    """,
+    # Set by the write-behind buffer, so a batch written again after a crash inserts nothing twice
+    "ALTER TABLE to_callback ADD COLUMN IF NOT EXISTS buffer_record_id text",
+    "CREATE UNIQUE INDEX IF NOT EXISTS to_callback_buffer_record_id_idx ON to_callback (buffer_record_id)",
+]
+_callback_table_ready = False
+
+def write_callbacks(records):
+    """
+    Inserts callback records into `to_callback` in one transaction, 500 rows per INSERT.
+    Records carrying a `buffer_record_id` that is already in the table are left out; returns the rows inserted.
+    """
+    global _callback_table_ready
+    columns = CALLBACK_COLUMNS + ["buffer_record_id"]
+    inserted = 0
+    with get_engine().begin() as conn:
+        if not _callback_table_ready:
+            for statement in CALLBACK_SCHEMA:
+                conn.execute(text(statement))
+        for start in range(0, len(records), 500):
+            chunk = records[start:start + 500]
+            values = ", ".join("(" + ", ".join(f":{c}_{i}" for c in columns) + ")" for i in range(len(chunk)))
+            params = {f"{c}_{i}": record.get(c) for i, record in enumerate(chunk) for c in columns}
+            inserted += conn.execute(text(
+                f"INSERT INTO to_callback ({', '.join(columns)}) VALUES {values} "
+                "ON CONFLICT (buffer_record_id) DO NOTHING"
+            ), params).rowcount
+    _callback_table_ready = True
+    return inserted
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+class CallbackBuffer:
+    """
+    Write-behind buffer for `/log-callback`. A record is appended to this buffer's JSONL segment
+    in `directory` and fsynced before the request is answered; appends that arrive during an fsync
+    share the next one. A flusher thread moves the rows to `to_callback` in multi-row INSERTs once
+    CALLBACK_FLUSH_ROWS are pending or the oldest has waited CALLBACK_FLUSH_SECONDS. A segment is
+    deleted only after its rows are committed, so segments left by a crash, or by a process that
+    is gone, are replayed. Segments are named after the host, pid and a random instance id, so
+    containers and hosts can share the directory; each buffer holds an flock on its own lock file
+    while it runs, and a segment whose owner's lock can be taken is an orphan. Every record gets a
+    `buffer_record_id`, so rows a replayed batch had already committed are skipped, and nothing else is.
+    """
+    def __init__(self, directory, flush_rows=CALLBACK_FLUSH_ROWS, flush_seconds=CALLBACK_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.pid = os.getpid()
+        host = re.sub(r"[^A-Za-z0-9-]", "-", socket.gethostname())[:40]
+        self.instance = f"{host}_{self.pid}_{uuid.uuid4().hex[:8]}"
+        self.stats = Counter()
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._closed = False
+        self._file = None
+        self._lock_file = None
+        self._written = 0
+        self._synced = 0
+        self._pending = 0
+        self._oldest_at = None
+
+    def _active_path(self):
+        return os.path.join(self.directory, f"cb.{self.instance}.jsonl")
+
+    def _batch_path(self):
+        return os.path.join(self.directory, f"cb.{self.instance}.{time.time_ns()}.batch")
+
+    def _lock_path(self, instance):
+        return os.path.join(self.directory, f"cb.{instance}.lock")
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # Taken before the first segment exists and held until the process ends
+        self._lock_file = open(self._lock_path(self.instance), "a")
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        self._file = open(self._active_path(), "a", encoding="utf-8")
+        threading.Thread(target=self._run, name="callback-buffer", daemon=True).start()
+        atexit.register(self.close)
+        self._handle_signals()
+        return self
+
+    def _handle_signals(self):
+        """
+        SIGTERM (how gunicorn, hypercorn and `docker stop` end a process) skips atexit unless handled.
+        The handlers flush in a non-daemon thread, which the interpreter waits for before it exits, and
+        then pass the signal on to the handler they replaced.
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(signum)
+
+            def handler(signum, frame, previous=previous):
+                # Not flushed inline: the signal may have interrupted this thread inside the buffer's locks
+                threading.Thread(target=self.close, name="callback-buffer-close").start()
+                if callable(previous):
+                    previous(signum, frame)
+                elif previous != signal.SIG_IGN:
+                    raise SystemExit(128 + signum)
+            try:
+                signal.signal(signum, handler)
+            except ValueError:
+                # Only the main thread can install handlers; a normal exit still runs atexit
+                return
+
+    def append(self, record):
+        record = dict(record, buffer_record_id=uuid.uuid4().hex)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._written += 1
+            position = self._written
+            self._pending += 1
+            self._oldest_at = self._oldest_at or time.monotonic()
+            self.stats["buffered"] += 1
+            full = self._pending >= self.flush_rows
+        # Group commit: whoever holds the sync lock fsyncs everything written so far
+        with self._sync_lock:
+            if self._synced < position:
+                with self._lock:
+                    written, fd = self._written, self._file.fileno()
+                os.fsync(fd)
+                self._synced = written
+        if full:
+            self._wake.set()
+
+    def _rotate(self):
+        """Closes the active segment as a batch file and starts a new one."""
+        with self._sync_lock, self._lock:
+            if not self._pending:
+                return
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self._active_path(), self._batch_path())
+            self._file = open(self._active_path(), "a", encoding="utf-8")
+            self._synced = self._written
+            self._pending = 0
+            self._oldest_at = None
+
+    def _claim(self, name):
+        try:
+            os.replace(os.path.join(self.directory, name), self._batch_path())
+        except FileNotFoundError:
+            pass
+
+    def _claim_orphans(self):
+        """
+        Takes over the segments of buffers that are gone: their owner's lock file can be locked, or is missing.
+        The claimer holds that lock while renaming, so two buffers never take the same segments.
+        """
+        owners = {}
+        for name in os.listdir(self.directory):
+            match = re.fullmatch(r"cb\.([A-Za-z0-9_-]+)\.(jsonl|\d+\.batch|lock)", name)
+            if match and match.group(1) != self.instance:
+                # A lock file alone is left by a buffer that exited with everything flushed; it is removed below
+                segments = owners.setdefault(match.group(1), [])
+                if match.group(2) != "lock":
+                    segments.append(name)
+            # Segments of older versions, named by pid only; ours are left by an earlier process with our pid
+            match = re.fullmatch(r"callbacks-(\d+)(?:-\d+)?\.(?:jsonl|batch)", name)
+            if match and (int(match.group(1)) == self.pid or not pid_alive(int(match.group(1)))):
+                self._claim(name)
+        for instance, names in owners.items():
+            with open(self._lock_path(instance), "a") as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                for name in names:
+                    self._claim(name)
+                try:
+                    os.remove(self._lock_path(instance))
+                except FileNotFoundError:
+                    pass
+
+    def flush(self, force=False):
+        """Writes every batch of this process to Postgres; rotates the active segment first when it is due."""
+        with self._flush_lock:
+            with self._lock:
+                due = self._pending and (
+                    force or self._pending >= self.flush_rows or time.monotonic() - self._oldest_at >= self.flush_seconds
+                )
+            if due:
+                self._rotate()
+            self._claim_orphans()
+            prefix = f"cb.{self.instance}."
+            for name in sorted(n for n in os.listdir(self.directory) if n.startswith(prefix) and n.endswith(".batch")):
+                path = os.path.join(self.directory, name)
+                records = []
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            records.append(json.loads(line))
+                        except ValueError:
+                            print(f"[CALLBACK BUFFER] Skipping a torn line in {name}")
+                inserted = write_callbacks(records) if records else 0
+                os.remove(path)
+                self.stats["flushes"] += 1
+                self.stats["flushed"] += inserted
+                self.stats["skipped_as_replayed"] += len(records) - inserted
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Batches stay on disk and are retried on the next tick
+                self.last_error = str(e)
+                self.stats["flush_errors"] += 1
+                print(f"[CALLBACK BUFFER] Flush failed: {e}")
+
+    def close(self):
+        """Flushes everything still buffered; runs at exit and on SIGTERM/SIGINT."""
+        with self._flush_lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._stopped.set()
+        self._wake.set()
+        try:
+            self.flush(force=True)
+        except Exception as e:
+            print(f"[CALLBACK BUFFER] Could not flush on shutdown, rows stay in {self.directory}: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            pending = self._pending
+        return dict(self.stats, pending=pending, directory=self.directory, last_error=self.last_error)
+
+_callback_buffer = None
+_callback_buffer_lock = threading.Lock()
+
+def callback_buffer():
+    """This process's write-behind buffer when CALLBACK_BUFFER_DIR is set, else None. Started on first use."""
+    global _callback_buffer
+    if not CALLBACK_BUFFER_DIR:
+        return None
+    with _callback_buffer_lock:
+        if _callback_buffer is None or _callback_buffer.pid != os.getpid():
+            _callback_buffer = CallbackBuffer(CALLBACK_BUFFER_DIR).start()
+        return _callback_buffer
+
 @app.route("/log-callback", methods=["POST"])
 @log_request_input("/log-callback")
+@idempotent
 def log_callback():
     data = request.json
 
@@ -1195,17 +4523,22 @@ def log_callback():
             "case_created": data["case_created"]
         }
 
-        df = pd.DataFrame([record])
-
-        engine = create_engine(DB_URI)
-                
-        df.to_sql("to_callback", engine, if_exists="append", index=False)
+        buffer = callback_buffer()
+        if buffer is not None:
+            buffer.append(record)
+        else:
+            write_callbacks([record])
 
         return jsonify({"message": "Callback logged successfully"}), 201
 
     except Exception as e:
         return jsonify({"error": f"Failed to log callback: {str(e)}"}), 500
 
+@app.route("/callback-buffer-stats", methods=["GET"])
+def get_callback_buffer_stats():
+    buffer = callback_buffer()
+    return jsonify(buffer.snapshot() if buffer is not None else {"enabled": False}), 200
+
 @app.route("/store-rating-and-comments", methods=["POST"])
 @log_request_input("/store-rating-and-comments")
 def store_rating_and_comments():
@@ -1235,7 +4568,7 @@ def store_rating_and_comments():
         soql = f"SELECT Id FROM Case WHERE CaseNumber = '{case_number}'"
         query_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
         
-        query_response = requests.get(query_url, headers=headers)
+        query_response = upstream_request("GET", query_url, "salesforce.query", hedge=True, headers=headers)
         query_response.raise_for_status()
         
         records = query_response.json().get("records", [])
@@ -1253,7 +4586,8 @@ def store_rating_and_comments():
         update_url = f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case/{case_id}"
         print(f"Patching record at URL: {update_url}")
 
-        response = requests.patch(update_url, headers=headers, json=payload)
+        response = upstream_request("PATCH", update_url, "salesforce.sobjects", headers=headers, json=payload)
+        invalidate_case(case_number)
         
         if response.status_code == 204:
             print(f"Successfully updated Case {case_id} with rating ({rating}) and comments.")
@@ -1273,22 +4607,46 @@ def store_rating_and_comments():
         print(f"Salesforce API error for CaseNumber {case_number}: {error_details}")
         return jsonify({"error": "Failed to update Salesforce case.", "details": error_details}), http_err.response.status_code
     
+    except CircuitOpenError:
+        raise
+
     except Exception as e:
         print(f"An unexpected error occurred while processing CaseNumber {case_number}: {str(e)}")
         return jsonify({"error": f"An unexpected error occurred: {str(e)}"}), 500
     
 
-if __name__ == "__main__":
+def start_scheduler():
+    """Starts the background sync and refresh jobs of this process."""
+    global case_change_consumer
+    from apscheduler.schedulers.background import BackgroundScheduler
     scheduler = BackgroundScheduler()
-    scheduler.add_job(lambda: fetch_and_store_calls(agent_id=IN_ENG_AGENT_ID, log_auto=True), 'interval', minutes=SYNC_INTERVAL_MINUTES)
-    scheduler.add_job(lambda: fetch_and_store_calls(agent_id=IN_BN_AGENT_ID, log_auto=True), 'interval', minutes=SYNC_INTERVAL_MINUTES)
-    
-    scheduler.add_job(lambda: fetch_and_store_calls(agent_id=OUT_ENG_AGENT_ID, log_auto=True), 'interval', minutes=SYNC_INTERVAL_MINUTES)
-    scheduler.add_job(lambda: fetch_and_store_calls(agent_id=OUT_BN_AGENT_ID, log_auto=True), 'interval', minutes=SYNC_INTERVAL_MINUTES)
-
-    scheduler.add_job(lambda: fetch_salesforce_cases(), 'interval', minutes=SYNC_INTERVAL_MINUTES)
+    if DB_URI:
+        # Call syncs come from the job queue, shared with every other process and node
+        start_call_sync_workers()
+
+    if CASE_CDC_ENABLED:
+        # Case changes stream in; the full poll only reconciles what the stream may have missed
+        scheduler.add_job(lambda: fetch_salesforce_cases(), 'interval', minutes=CASE_RECONCILE_MINUTES)
+        case_change_consumer = CaseChangeConsumer().start()
+    else:
+        scheduler.add_job(lambda: fetch_salesforce_cases(), 'interval', minutes=SYNC_INTERVAL_MINUTES)
+    if CATALOG_INDEX_ENABLED:
+        scheduler.add_job(refresh_catalog_index, 'interval', minutes=CATALOG_REFRESH_MINUTES,
+                          next_run_time=datetime.now(timezone.utc))
+    if STOCK_SNAPSHOT_ENABLED:
+        scheduler.add_job(refresh_stock_snapshot, 'interval', seconds=STOCK_REFRESH_SECONDS,
+                          next_run_time=datetime.now(timezone.utc), max_instances=1, coalesce=True)
+    if DB_URI and CALL_RETENTION_MONTHS:
+        scheduler.add_job(drop_expired_call_partitions, 'interval', days=1, next_run_time=datetime.now(timezone.utc))
+    if PARQUET_EXPORT_DIR:
+        scheduler.add_job(compact_parquet, 'interval', minutes=PARQUET_COMPACT_MINUTES, max_instances=1, coalesce=True)
     # scheduler.add_job(scheduled_outbound_call, 'interval', minutes=SYNC_INTERVAL_MINUTES)
     # scheduler.add_job(scheduled_callback_call, 'interval', minutes=SYNC_INTERVAL_MINUTES)
     scheduler.start()
+    # Replays callbacks a previous run left in the write-behind buffer
+    callback_buffer()
+    return scheduler
 
+if __name__ == "__main__":
+    start_scheduler()
     app.run(host = '0.0.0.0', port = 4288, debug=True)
@@ -0,0 +1,711 @@
+"""
+Async (ASGI) execution mode for the tool endpoints.
+
+/products, /product-order, /salesforce-account, /create-salesforce-ticket, /get-case-info and
+/salesforce-tickets run as coroutines on pooled httpx clients, with the same request/response
+contracts as app.py, so a waiting tool call holds a coroutine instead of an OS thread. Every other
+route (webhooks, sync, batch, health) is passed through to the Flask app, and both halves share the
+caches, circuit breakers, tokens, catalog index and stock snapshot of app.py.
+
+    hypercorn asgi:application --bind 0.0.0.0:4288
+"""
+import asyncio
+import gzip
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from urllib.parse import quote_plus
+
+import httpx
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from quart import Quart, request, jsonify, has_request_context
+
+import app as sync_app
+from app import (
+    MAGENTO_BASE_URL, MAGENTO_USERNAME, MAGENTO_PASSWORD, SALESFORCE_CONSUMER_ID, SALESFORCE_CONSUMER_SECRET,
+    SALESFORCE_USERNAME, SALESFORCE_PASSWORD, SALESFORCE_TOKEN_URL, SALESFORCE_INSTANCE_URL,
+    SALESFORCE_TOKEN_TTL_SECONDS, MAGENTO_TOKEN_TTL_SECONDS, UPSTREAM_CONNECT_TIMEOUT_SECONDS,
+    UPSTREAM_TIMEOUT_SECONDS, UPSTREAM_POOL_SIZE, HEDGE_ENABLED, BREAKER_SLOW_CALL_SECONDS, CATALOG_MAX_RESULTS,
+    CircuitOpenError, request_deadline, route_budget, circuit_breaker, circuit_open_body, record_latency,
+    hedge_delay, case_cache, case_tags, invalidate_case, record_prefetch_use, catalog_index, stock_snapshot,
+    phone_ticket_records, order_confirmation_email, ticket_created_email, logger, idempotency_store,
+    idempotency_key, idempotency_conflict, salesforce_budget, orjson, OrjsonMixin, GZIP_LEVEL, should_gzip,
+    gzip_headers, CASE_INFO_FIELDS, TICKET_FIELDS, parse_fields, project, case_info_soql, tickets_by_number_soql,
+    phone_tickets_soql, ASGI_WSGI_THREADS
+)
+
+ASYNC_ROUTES = {
+    "/products", "/product-order", "/salesforce-account", "/create-salesforce-ticket", "/get-case-info",
+    "/salesforce-tickets"
+}
+
+app = Quart(__name__)
+
+if orjson is not None:
+    from quart.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(OrjsonMixin, DefaultJSONProvider):
+        pass
+
+    app.json = OrjsonProvider(app)
+
+class AsyncDeadlineExceeded(httpx.TimeoutException):
+    """The request's latency budget ran out before an upstream call could be made."""
+
+class AsyncSingleFlight:
+    """
+    Coalesces concurrent coroutines for the same key, like `SingleFlight`: the first caller starts
+    the call, later callers await the same task. A caller that goes away does not cancel it for the others.
+    """
+    def __init__(self):
+        self._in_flight = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key, fn):
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = self._in_flight[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+upstream_flights = AsyncSingleFlight()
+idempotency_flights = AsyncSingleFlight()
+
+_clients = {}
+_mail_tasks = set()
+
+def upstream_client(operation):
+    """One pooled client per upstream (magento, salesforce, verbex), shared by all requests on the loop."""
+    upstream = operation.split(".", 1)[0]
+    client = _clients.get(upstream)
+    if client is None:
+        client = _clients[upstream] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=UPSTREAM_POOL_SIZE, max_keepalive_connections=UPSTREAM_POOL_SIZE),
+            verify=upstream != "magento"
+        )
+    return client
+
+def upstream_timeout():
+    """httpx timeout for the next upstream call, cut down to what is left of the request's budget."""
+    deadline = request_deadline.get()
+    if deadline is None:
+        return httpx.Timeout(UPSTREAM_TIMEOUT_SECONDS, connect=UPSTREAM_CONNECT_TIMEOUT_SECONDS)
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise AsyncDeadlineExceeded("Request latency budget exhausted before calling upstream")
+    return httpx.Timeout(remaining, connect=min(UPSTREAM_CONNECT_TIMEOUT_SECONDS, remaining))
+
+async def _send(method, url, operation, kwargs):
+    started = time.perf_counter()
+    response = await upstream_client(operation).request(method, url, timeout=upstream_timeout(), **kwargs)
+    record_latency(operation, time.perf_counter() - started)
+    if operation.startswith("salesforce."):
+        salesforce_budget.record(operation, request.path if has_request_context() else "other",
+                                 response.headers.get("Sforce-Limit-Info"))
+    return response
+
+async def _hedged_send(method, url, operation, kwargs):
+    """Sends the request and, if it is still outstanding after the p95 delay, a duplicate; the first success wins."""
+    primary = asyncio.ensure_future(_send(method, url, operation, kwargs))
+    delay = hedge_delay(operation)
+    done, _ = await asyncio.wait({primary}, timeout=delay)
+    deadline = request_deadline.get()
+    if done or (deadline is not None and deadline - time.monotonic() <= delay):
+        return await primary
+
+    hedge = asyncio.ensure_future(_send(method, url, operation, kwargs))
+    done, _ = await asyncio.wait({primary, hedge}, return_when=asyncio.FIRST_COMPLETED)
+    first = done.pop()
+    other = hedge if first is primary else primary
+    if first.exception() is None:
+        other.cancel()
+        return first.result()
+    return await other
+
+async def upstream_request(method, url, operation, hedge=False, **kwargs):
+    """Async counterpart of `app.upstream_request`, sharing its circuit breakers and latency samples."""
+    breaker = circuit_breaker(operation)
+    breaker.before_call()
+    started = time.perf_counter()
+    try:
+        if hedge and HEDGE_ENABLED and method == "GET" and request_deadline.get() is not None:
+            response = await _hedged_send(method, url, operation, kwargs)
+        else:
+            response = await _send(method, url, operation, kwargs)
+    except AsyncDeadlineExceeded:
+        breaker.release()
+        raise
+    except httpx.HTTPError:
+        breaker.record(False)
+        raise
+    breaker.record(response.status_code < 500 and time.perf_counter() - started < BREAKER_SLOW_CALL_SECONDS)
+
+    # Tokens are cached across requests; when one has expired, fetch a fresh one and retry once
+    upstream = operation.split(".", 1)[0]
+    if response.status_code == 401 and upstream in ("salesforce", "magento") \
+            and not operation.endswith(".token") and "Authorization" in kwargs.get("headers", {}):
+        token = await (get_salesforce_token(refresh=True) if upstream == "salesforce" else get_magento_token(refresh=True))
+        if token:
+            kwargs["headers"] = {**kwargs["headers"], "Authorization": f"Bearer {token}"}
+            response = await _send(method, url, operation, kwargs)
+    return response
+
+async def cached_token(name, ttl_seconds, fetch, refresh=False):
+    """Async counterpart of `app.cached_token`; both modes share the same token cache."""
+    cached = sync_app._auth_tokens.get(name)
+    if cached and not refresh and cached[1] > time.monotonic():
+        return cached[0]
+    if refresh:
+        sync_app._auth_tokens.pop(name, None)
+    token = await upstream_flights.do(("auth-token", name), fetch)
+    if token:
+        sync_app._auth_tokens[name] = (token, time.monotonic() + ttl_seconds)
+    return token
+
+async def get_magento_token(refresh=False):
+    return await cached_token("magento", MAGENTO_TOKEN_TTL_SECONDS, fetch_magento_token, refresh)
+
+async def get_salesforce_token(refresh=False):
+    return await cached_token("salesforce", SALESFORCE_TOKEN_TTL_SECONDS, fetch_salesforce_token, refresh)
+
+async def fetch_magento_token():
+    url = f"{MAGENTO_BASE_URL}/rest/V1/integration/admin/token"
+    payload = {
+        'username': MAGENTO_USERNAME,
+        'password': MAGENTO_PASSWORD
+    }
+    try:
+        response = await upstream_request("POST", url, "magento.token", json=payload)
+        response.raise_for_status()
+        return response.text.strip('"')
+    except httpx.HTTPStatusError as http_err:
+        print(f"Failed to get token: {http_err} - {http_err.response.text}")
+    except CircuitOpenError:
+        raise
+    except Exception as err:
+        print(f"Unexpected error: {err}")
+    return None
+
+async def fetch_salesforce_token():
+    payload = {
+        'grant_type': 'password',
+        'client_id': SALESFORCE_CONSUMER_ID,
+        'client_secret': SALESFORCE_CONSUMER_SECRET,
+        'username': SALESFORCE_USERNAME,
+        'password': SALESFORCE_PASSWORD
+    }
+    response = await upstream_request("POST", SALESFORCE_TOKEN_URL, "salesforce.token", data=payload)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def salesforce_headers():
+    return {
+        "Authorization": f"Bearer {await get_salesforce_token()}",
+        "Content-Type": "application/json"
+    }
+
+def soql_url(soql):
+    return f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/query?q={quote_plus(soql)}"
+
+async def cached_case_lookup(key, tags, loader):
+    """Async counterpart of `app.cached_case_lookup`, on the same `case_cache`."""
+    cached = case_cache.get(key)
+    if cached is not None:
+        return cached
+
+    async def load():
+        token = case_cache.token()
+        result = await loader()
+        if result[1] == 200:
+            case_cache.set(key, result, tags + case_tags(result[0]), token)
+        return token, result
+
+    try:
+        for _ in range(2):
+            token, result = await upstream_flights.do(key, load)
+            if not case_cache.invalidated_since(tags + case_tags(result[0]), token):
+                break
+    except CircuitOpenError:
+        stale = case_cache.get_stale(key)
+        if stale is None:
+            raise
+        return stale
+    return result
+
+def send_mail_in_background(build, *args):
+    """Sends an email built by `build(*args)` on a worker thread, after the response has gone out."""
+    def send():
+        with sync_app.app.app_context():
+            try:
+                sync_app.get_mail().send(build(*args))
+            except Exception as mail_err:
+                print(f"[EMAIL ERROR] Could not send email to {args[0]}: {mail_err}")
+    task = asyncio.ensure_future(asyncio.to_thread(send))
+    _mail_tasks.add(task)
+    task.add_done_callback(_mail_tasks.discard)
+
+def log_request_input(endpoint_name):
+    """Async counterpart of `app.log_request_input`."""
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            logger.info(f"[\033[94m{endpoint_name}\033[0m] Request: {await request.get_data(as_text=True)}")
+            start_time = time.perf_counter()
+            response = await func(*args, **kwargs)
+            elapsed = time.perf_counter() - start_time
+            body = response[0] if isinstance(response, tuple) else response
+            logger.info(f"[\033[92m{endpoint_name}\033[0m] Response: {(await body.get_data(as_text=True))}")
+            logger.info(f"[\033[93m{endpoint_name}\033[0m] Response Took: {elapsed:.3f} seconds.")
+            return response
+        return wrapper
+    return decorator
+
+def idempotent(func):
+    """Async counterpart of `app.idempotent`, sharing its response store."""
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        identity = idempotency_key(request.path, request.headers, await request.get_json(silent=True))
+        if identity is None:
+            return await func(*args, **kwargs)
+        key, fingerprint = identity
+
+        ran_here = []
+        async def run():
+            entry = idempotency_store.get(key)
+            if entry is not None:
+                return entry
+            ran_here.append(True)
+            response = await app.make_response(await func(*args, **kwargs))
+            entry = {"status": response.status_code, "body": await response.get_data(),
+                     "mimetype": response.mimetype, "fingerprint": fingerprint}
+            if response.status_code < 500:
+                idempotency_store.set(key, entry, [], idempotency_store.token())
+            return entry
+
+        entry = idempotency_store.get(key) or await idempotency_flights.do(key, run)
+        if entry["fingerprint"] != fingerprint:
+            body, status = idempotency_conflict()
+            return jsonify(body), status
+        response = app.response_class(entry["body"], status=entry["status"], mimetype=entry["mimetype"])
+        if not ran_here:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+    return wrapper
+
+@app.before_serving
+async def start_background_jobs():
+    app.scheduler = sync_app.start_scheduler()
+
+@app.after_serving
+async def close_clients():
+    app.scheduler.shutdown(wait=False)
+    if sync_app.case_change_consumer is not None:
+        sync_app.case_change_consumer.stop()
+    for worker in sync_app.call_sync_workers:
+        worker.stop()
+    if sync_app._callback_buffer is not None:
+        await asyncio.to_thread(sync_app._callback_buffer.close)
+    for client in _clients.values():
+        await client.aclose()
+    _wsgi_pool.shutdown(wait=False)
+
+@app.before_request
+async def start_request_deadline():
+    # Each request runs in its own task, so the deadline set here is gone with it
+    budget = route_budget(request.path)
+    request_deadline.set(time.monotonic() + budget if budget else None)
+
+@app.after_request
+async def compress_response(response):
+    if not should_gzip(response, request.headers.get("Accept-Encoding")):
+        return response
+    data = gzip.compress(await response.get_data(), compresslevel=GZIP_LEVEL)
+    response.set_data(data)
+    gzip_headers(response, data)
+    return response
+
+@app.errorhandler(CircuitOpenError)
+async def circuit_open_response(e):
+    response = jsonify(circuit_open_body(e))
+    response.status_code = 503
+    response.headers["Retry-After"] = str(max(1, round(e.retry_after)))
+    return response
+
+@app.route("/products", methods=["POST"])
+@log_request_input("/products")
+async def get_products():
+    data = await request.get_json()
+    keyword = data.get("keyword", "") if data else ""
+
+    body, status = await upstream_flights.do(("products", keyword.strip().lower()), lambda: search_products(keyword))
+    return jsonify(body), status
+
+async def fetch_stock_qty(sku, headers):
+    qty = stock_snapshot.get(sku)
+    if qty is not None:
+        return qty
+    stock_url = f"{MAGENTO_BASE_URL}/rest/default/V1/stockItems/{sku}"
+    try:
+        stock_response = await upstream_request("GET", stock_url, "magento.stock", hedge=True, headers=headers)
+        stock_response.raise_for_status()
+        return stock_response.json().get("qty")
+    except (httpx.HTTPError, CircuitOpenError):
+        return None
+
+async def search_products(keyword):
+    """Like `app.search_products`, but the stock of all matches is fetched concurrently."""
+    token = await get_magento_token()
+    if not token:
+        return {"error": "Failed to authenticate with Magento"}, 500
+    headers = {"Authorization": f"Bearer {token}"}
+
+    if catalog_index.ready and keyword.strip():
+        matches = catalog_index.search(keyword, CATALOG_MAX_RESULTS)
+    else:
+        search_params = {
+            "searchCriteria[filterGroups][0][filters][0][field]": "name",
+            "searchCriteria[filterGroups][0][filters][0][value]": f"%{keyword}%",
+            "searchCriteria[filterGroups][0][filters][0][condition_type]": "like"
+        }
+        try:
+            response = await upstream_request("GET", f"{MAGENTO_BASE_URL}/rest/V1/products", "magento.products",
+                                              hedge=True, headers=headers, params=search_params)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            return {"error": str(e)}, 500
+        matches = response.json().get("items", [])
+
+    quantities = await asyncio.gather(*(fetch_stock_qty(product.get("sku"), headers) for product in matches))
+    return {"products": [
+        {
+            "name": product.get("name"),
+            "price": product.get("price"),
+            "sku": product.get("sku"),
+            "stock_qty": qty
+        }
+        for product, qty in zip(matches, quantities)
+    ]}, 200
+
+async def find_or_create_account(headers, phone, customer_name, address=None):
+    """Id of the newest Account with this phone, creating one when there is none."""
+    account_response = await upstream_request(
+        "GET", soql_url(f"SELECT Id FROM Account WHERE Phone = '{phone}' ORDER BY CreatedDate DESC LIMIT 1"),
+        "salesforce.query", hedge=True, headers=headers
+    )
+    account_response.raise_for_status()
+    records = account_response.json()["records"]
+    if records:
+        return records[0]["Id"]
+
+    payload = {"Name": customer_name, "Phone": phone}
+    if address is not None:
+        payload["BillingStreet"] = address
+    create_response = await upstream_request("POST", f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Account",
+                                             "salesforce.sobjects", headers=headers, json=payload)
+    create_response.raise_for_status()
+    return create_response.json().get("id")
+
+async def create_case(headers, payload):
+    """Creates a Case and returns its (Id, CaseNumber)."""
+    case_response = await upstream_request("POST", f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case",
+                                           "salesforce.sobjects", headers=headers, json=payload)
+    case_response.raise_for_status()
+    case_id = case_response.json().get("id")
+
+    case_lookup_response = await upstream_request(
+        "GET", f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Case/{case_id}",
+        "salesforce.sobjects", hedge=True, headers=headers
+    )
+    case_lookup_response.raise_for_status()
+    return case_id, case_lookup_response.json().get("CaseNumber")
+
+@app.route("/product-order", methods=["POST"])
+@log_request_input("/product-order")
+@idempotent
+async def product_order():
+    data = await request.get_json() or {}
+    customer_name = data.get("customer_name")
+    phone = data.get("phone")
+    address = data.get("address")
+    product_name = data.get("product_name")
+    sku = data.get("sku")
+    price = data.get("price")
+    quantity = data.get("quantity")
+    email = data.get("email")
+
+    missing = [k for k in ["customer_name", "phone", "address", "product_name", "sku", "price", "quantity"] if not data.get(k)]
+    if missing:
+        return jsonify({"error": f"Missing required fields: {', '.join(missing)}"}), 400
+
+    try:
+        headers = await salesforce_headers()
+        account_id = await find_or_create_account(headers, phone, customer_name, address)
+
+        case_id, case_number = await create_case(headers, {
+            "Subject": f"Delivery for order: {product_name}",
+            "Description": f"Deliver {quantity} x {product_name} (SKU: {sku}) to customer {customer_name}, phone: {phone}, address: {address}.",
+            "Status": "New",
+            "Priority": "Medium",
+            "Origin": "Web",
+            "AccountId": account_id,
+            "Type": "Pending",
+            "Reason": "Delivery"
+        })
+
+        opportunity_payload = {
+            "Name": f"Order for {product_name}",
+            "AccountId": account_id,
+            "StageName": "Closed Won",
+            "CloseDate": time.strftime("%Y-%m-%d", time.gmtime()),
+            "Amount": float(price) * int(quantity),
+            "Description": f"SKU: {sku}, Quantity: {quantity}, Price: {price}",
+            "DeliveryInstallationStatus__c": "In Progress",
+            "TrackingNumber__c": case_number
+        }
+        opp_response = await upstream_request("POST", f"{SALESFORCE_INSTANCE_URL}/services/data/v59.0/sobjects/Opportunity",
+                                              "salesforce.sobjects", headers=headers, json=opportunity_payload)
+        opp_response.raise_for_status()
+        opp_id = opp_response.json().get("id")
+        invalidate_case(case_number, phone)
+
+        if email:
+            send_mail_in_background(order_confirmation_email, email, customer_name, case_number, product_name,
+                                    sku, quantity, price, address, phone)
+
+        return jsonify({
+            "message": "Order and delivery ticket stored in Salesforce successfully.",
+            "opportunity_id": opp_id,
+            "delivery_case_id": case_id,
+            "delivery_case_number": case_number
+        }), 201
+    except httpx.HTTPError as e:
+        return jsonify({"error": str(e)}), 500
+    except CircuitOpenError:
+        raise
+    except Exception as e:
+        return jsonify({"error": f"Unexpected error: {str(e)}"}), 500
+
+@app.route("/salesforce-account", methods=["POST"])
+@log_request_input("/salesforce-account")
+async def get_salesforce_account():
+    data = await request.get_json()
+    phone = data.get("phone")
+
+    if not phone:
+        return jsonify({"error": "Missing 'phone' in request body"}), 400
+
+    key = ("account", phone)
+    record_prefetch_use(phone, key)
+    body, status = await cached_case_lookup(key, [f"phone:{phone}"], lambda: lookup_salesforce_account(phone))
+    return jsonify(body), status
+
+async def lookup_salesforce_account(phone):
+    """Fetches the Account for a phone number and its latest Opportunity; returns (body, status)."""
+    try:
+        headers = await salesforce_headers()
+        account_response = await upstream_request(
+            "GET", soql_url(f"SELECT Id, Name, Phone FROM Account WHERE Phone='{phone}' ORDER BY CreatedDate DESC LIMIT 1"),
+            "salesforce.query", hedge=True, headers=headers
+        )
+        account_response.raise_for_status()
+        account_data = account_response.json()
+
+        if not account_data["records"]:
+            return {"error": "No account found for this phone number."}, 404
+
+        account = account_data["records"][0]
+        account_name = account["Name"]
+
+        # The Opportunity is matched by the Account's name, so this one has to wait for the Account
+        opportunity_soql = f"""
+            SELECT Id, Name, CloseDate, Account.Name, Account.Phone
+            FROM Opportunity
+            WHERE Account.Name = '{account_name}'
+            ORDER BY CloseDate DESC
+            LIMIT 1
+        """
+        opportunity_response = await upstream_request("GET", soql_url(opportunity_soql), "salesforce.query",
+                                                      hedge=True, headers=headers)
+        opportunity_response.raise_for_status()
+        records = opportunity_response.json()["records"]
+        opportunity = records[0] if records else None
+
+        return {
+            "Customer Name": account_name,
+            "Customer Phone": account.get("Phone", ""),
+            "Past Purchase": opportunity["Name"] if opportunity else "N/A",
+            "Purchased on": opportunity["CloseDate"] if opportunity else "N/A",
+            "Purchase ID": opportunity["Id"] if opportunity else "N/A"
+        }, 200
+
+    except httpx.HTTPError as e:
+        return {"error": str(e)}, 500
+
+@app.route("/create-salesforce-ticket", methods=["POST"])
+@log_request_input("/create-salesforce-ticket")
+@idempotent
+async def create_salesforce_ticket():
+    data = await request.get_json()
+    phone = data.get("phone")
+    subject = data.get("subject", "Service")
+    description = data.get("description", "No description provided.")
+    status = "New"
+    priority = "Medium"
+    case_type = data.get("type", "Pending")
+    case_reason = data.get("reason", "Pending")
+    customer_name = data.get("customer_name")
+    email = data.get("email", "")
+
+    if not phone:
+        return jsonify({"error": "Missing 'phone' in request body"}), 400
+
+    try:
+        headers = await salesforce_headers()
+        account_id = await find_or_create_account(headers, phone, customer_name)
+
+        case_id, case_number = await create_case(headers, {
+            "Subject": subject,
+            "Description": description,
+            "Status": status,
+            "Priority": priority,
+            "Origin": "Web",
+            "AccountId": account_id,
+            "Type": case_type,
+            "Reason": case_reason
+        })
+        invalidate_case(case_number, phone)
+
+        if email:
+            send_mail_in_background(ticket_created_email, email, customer_name, case_number, subject, description,
+                                    status, priority, case_type, case_reason)
+
+        return jsonify({
+            "message": "Case created successfully",
+            "case_id": case_id,
+            "case_number": case_number
+        }), 201
+
+    except httpx.HTTPError as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route("/get-case-info", methods=["POST"])
+@log_request_input("/get-case-info")
+async def get_case_info():
+    data = await request.get_json()
+    case_number = data.get("case_number") if data else None
+
+    if not case_number:
+        return jsonify({"error": "Missing 'case_number' in request body"}), 400
+
+    if len(case_number) < 8:
+        case_number = case_number.zfill(8)
+
+    try:
+        fields = parse_fields(data.get("fields"), CASE_INFO_FIELDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    body, status = await cached_case_lookup(
+        ("case-info", case_number, fields), [f"case:{case_number}"], lambda: lookup_case_info(case_number, fields)
+    )
+    return jsonify(project(body, fields) if status == 200 else body), status
+
+async def lookup_case_info(case_number, fields=None):
+    """Fetches one Case by its (zero-padded) CaseNumber, optionally only some `fields`; returns (body, status)."""
+    try:
+        headers = await salesforce_headers()
+        response = await upstream_request("GET", soql_url(case_info_soql(case_number, fields)), "salesforce.query",
+                                          hedge=True, headers=headers)
+        response.raise_for_status()
+        records = response.json().get("records", [])
+
+        if not records:
+            return {"error": "No case found with that CaseNumber."}, 404
+
+        records[0].pop("attributes", None)
+        return records[0], 200
+
+    except httpx.HTTPError as e:
+        return {"error": str(e)}, 500
+
+@app.route("/salesforce-tickets", methods=["POST"])
+@log_request_input("/salesforce-tickets")
+async def get_salesforce_tickets():
+    data = await request.get_json() or {}
+    case_number = data.get("case_number")
+    owner_phone = data.get("owner_phone")
+    reason = data.get("reason")
+
+    if not (case_number or (owner_phone and reason)):
+        return jsonify({"error": "Provide either 'case_number' or both 'owner_phone' and 'reason' in request body"}), 400
+
+    if case_number and len(case_number) < 8:
+        case_number = case_number.zfill(8)
+
+    try:
+        fields = parse_fields(data.get("fields"), TICKET_FIELDS + ["AccountPhone"])
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if case_number:
+        key, tags = ("tickets", case_number, fields), [f"case:{case_number}"]
+    else:
+        key, tags = ("tickets", owner_phone, reason, fields), [f"phone:{owner_phone}"]
+        record_prefetch_use(owner_phone, ("cases-by-phone", owner_phone))
+        prefetched = case_cache.get(("cases-by-phone", owner_phone))
+        if prefetched is not None and prefetched[1] == 200:
+            tickets = [t for t in prefetched[0]["tickets"] if (t.get("Reason") or "").lower() == reason.lower()]
+            return jsonify({"tickets": [project(t, fields) for t in tickets]}), 200
+    body, status = await cached_case_lookup(
+        key, tags, lambda: lookup_salesforce_tickets(case_number, owner_phone, reason, fields)
+    )
+    if status == 200 and fields:
+        body = {"tickets": [project(t, fields) for t in body["tickets"]]}
+    return jsonify(body), status
+
+async def lookup_salesforce_tickets(case_number, owner_phone, reason, fields=None):
+    """Lists Cases by CaseNumber, or by Reason and account phone, optionally only some `fields`; returns (body, status)."""
+    try:
+        headers = await salesforce_headers()
+
+        if case_number:
+            response = await upstream_request("GET", soql_url(tickets_by_number_soql(case_number, fields)),
+                                              "salesforce.query", hedge=True, headers=headers)
+            response.raise_for_status()
+            records = response.json().get("records", [])
+            for record in records:
+                record.pop("attributes", None)
+            return {"tickets": records}, 200
+
+        soql = phone_tickets_soql(f"Reason = '{reason}' AND Account.Phone = '{owner_phone}'", fields)
+        response = await upstream_request("GET", soql_url(soql), "salesforce.query", hedge=True, headers=headers)
+        response.raise_for_status()
+        return {"tickets": phone_ticket_records(response.json().get("records", []))}, 200
+    except httpx.HTTPError as e:
+        return {"error": str(e)}, 500
+
+_wsgi_pool = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    # asgiref's own wrapper (thread_sensitive=True) runs every WSGI request on one shared thread
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__["run_wsgi_app"].func,
+                                 thread_sensitive=False, executor=_wsgi_pool)
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """`WsgiToAsgi` that runs each request on `_wsgi_pool`, so the Flask routes serve requests concurrently."""
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+_flask_app = PooledWsgiToAsgi(sync_app.app)
+
+async def application(scope, receive, send):
+    """Serves the async tool routes (and the server lifespan) from Quart, everything else from Flask."""
+    if scope["type"] == "lifespan" or (scope["type"] == "http" and scope["path"] in ASYNC_ROUTES):
+        await app(scope, receive, send)
+    else:
+        await _flask_app(scope, receive, send)
@@ -0,0 +1,275 @@
+"""
+Load-test harness: starts the local upstream stand-ins, points the wrapper at them, drives each tool route
+(and optionally the sync jobs) at fixed concurrency levels and reports latency percentiles, throughput and
+upstream calls per request. Results can be saved as a baseline and compared against on later runs.
+
+    python -m benchmark.run --concurrency 1,8,32 --requests 200 --latency salesforce=0.08,magento=0.05
+    python -m benchmark.run --save-baseline main
+    python -m benchmark.run --compare main --tolerance 0.2
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmark.stubs import StubServers, StubState, parse_profiles
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+SCENARIOS = {
+    "/products": lambda i: {"keyword": ["galaxy", "refrigerator", "tv", "washing machine"][i % 4]},
+    "/salesforce-account": lambda i: {"phone": f"0170000{i % 50:04d}"},
+    "/salesforce-tickets": lambda i: {"owner_phone": f"0170000{i % 50:04d}", "reason": "Service"},
+    "/get-case-info": lambda i: {"case_number": str(1 + i % 300)},
+    "/create-salesforce-ticket": lambda i: {"phone": f"0170000{i % 50:04d}", "subject": "TV Issue",
+                                            "description": "Benchmark ticket", "customer_name": "Bench"},
+    "/product-order": lambda i: {"customer_name": "Bench", "phone": f"0170000{i % 50:04d}", "address": "Dhaka",
+                                 "product_name": "Samsung Galaxy S24", "sku": "SKU-00002", "price": 999,
+                                 "quantity": 1},
+    "/batch": lambda i: {"calls": [
+        {"tool": "salesforce-account", "arguments": {"phone": f"0170000{i % 50:04d}"}},
+        {"tool": "products", "arguments": {"keyword": "galaxy"}},
+        {"tool": "get-case-info", "arguments": {"case_number": str(1 + i % 300)}}
+    ]}
+}
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+def summarize(latencies, errors, elapsed, upstream_calls, requests_sent):
+    return {
+        "requests": requests_sent,
+        "errors": errors,
+        "throughput_rps": round(requests_sent / elapsed, 2) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+        "upstream_calls": upstream_calls,
+        "upstream_calls_per_request": round(sum(upstream_calls.values()) / requests_sent, 3) if requests_sent else None
+    }
+
+def drive_route(base_url, path, payload_for, concurrency, total, state):
+    """Sends `total` POSTs to `path` from `concurrency` threads and summarizes them."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            response = session.post(f"{base_url}{path}", json=payload_for(i), timeout=60)
+            ok = response.status_code < 500
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors += 1
+
+    state.reset_counts()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - started
+    return summarize(latencies, errors, elapsed, state.snapshot_counts(), total)
+
+def drive_sync(app_module, state, runs):
+    """Runs each sync job `runs` times back to back and summarizes them."""
+    jobs = {
+        "fetch_and_store_calls": lambda: app_module.fetch_and_store_calls(app_module.IN_ENG_AGENT_ID),
+        "fetch_salesforce_cases": app_module.fetch_salesforce_cases
+    }
+    results = {}
+    for name, job in jobs.items():
+        latencies = []
+        errors = 0
+        state.reset_counts()
+        started = time.perf_counter()
+        for _ in range(runs):
+            job_started = time.perf_counter()
+            result = job()
+            latencies.append(time.perf_counter() - job_started)
+            if not isinstance(result, dict) or "error" in result or result.get("status") == "error":
+                errors += 1
+        results[name] = summarize(latencies, errors, time.perf_counter() - started, state.snapshot_counts(), runs)
+        if isinstance(result, dict) and "profile" in result:
+            results[name]["last_profile"] = result["profile"]
+    return results
+
+def serve_asgi():
+    """Serves asgi.application with hypercorn on a free port in a background loop; returns (base_url, stop)."""
+    import asyncio
+    import socket
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    import asgi
+
+    async def without_lifespan(scope, receive, send):
+        # The benchmark drives the sync jobs itself, so the app's scheduler is not started
+        if scope["type"] != "lifespan":
+            return await asgi.application(scope, receive, send)
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    config = Config()
+    config.bind = [f"127.0.0.1:{port}"]
+    config.accesslog = None
+    loop = asyncio.new_event_loop()
+    stopped = asyncio.Event()
+    started = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_until_complete(serve(without_lifespan, config, shutdown_trigger=stopped.wait))
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    time.sleep(0.5)
+    return f"http://127.0.0.1:{port}", lambda: loop.call_soon_threadsafe(stopped.set)
+
+def compare(results, baseline, tolerance):
+    """Returns a list of human-readable regressions of `results` against `baseline`."""
+    regressions = []
+    for scenario, levels in baseline.get("results", {}).items():
+        for level, old in levels.items():
+            new = results.get(scenario, {}).get(level)
+            if not new:
+                continue
+            for metric in ("p50_ms", "p95_ms", "p99_ms"):
+                if old.get(metric) and new.get(metric) and new[metric] > old[metric] * (1 + tolerance):
+                    regressions.append(f"{scenario} @{level}: {metric} {old[metric]} -> {new[metric]}")
+            if old.get("throughput_rps") and new.get("throughput_rps") and \
+                    new["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+                regressions.append(f"{scenario} @{level}: throughput_rps {old['throughput_rps']} -> {new['throughput_rps']}")
+            old_calls, new_calls = old.get("upstream_calls_per_request"), new.get("upstream_calls_per_request")
+            if old_calls is not None and new_calls is not None and new_calls > old_calls * (1 + tolerance) + 0.01:
+                regressions.append(f"{scenario} @{level}: upstream_calls_per_request {old_calls} -> {new_calls}")
+            if new.get("errors", 0) > old.get("errors", 0):
+                regressions.append(f"{scenario} @{level}: errors {old.get('errors', 0)} -> {new['errors']}")
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the wrapper against local upstream stand-ins.")
+    parser.add_argument("--concurrency", default="1,8,32", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="requests per route per concurrency level")
+    parser.add_argument("--routes", default=",".join(SCENARIOS), help="comma-separated routes to drive")
+    parser.add_argument("--latency", default="salesforce=0.08,magento=0.05,verbex=0.05",
+                        help="per-upstream latency in seconds")
+    parser.add_argument("--error-rate", default="", help="per-upstream error rate, e.g. salesforce=0.02")
+    parser.add_argument("--jitter", type=float, default=0.2, help="latency jitter as a fraction of the latency")
+    parser.add_argument("--warm", action="store_true", help="load the catalog index and stock snapshot first")
+    parser.add_argument("--asgi", action="store_true", help="serve the app through asgi.py (hypercorn) instead of werkzeug")
+    parser.add_argument("--db-uri", help="Postgres URI; when given, the sync jobs are benchmarked too")
+    parser.add_argument("--sync-runs", type=int, default=3)
+    parser.add_argument("--output", help="write the results JSON here")
+    parser.add_argument("--save-baseline", metavar="NAME", help="save the results as benchmark/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="compare against benchmark/baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression as a fraction")
+    args = parser.parse_args(argv)
+
+    state = StubState()
+    stubs = StubServers(parse_profiles(args.latency, args.error_rate, args.jitter), state).start()
+    os.environ.update(stubs.env())
+    os.environ.setdefault("SYNC_INTERVAL_MINUTES", "60")
+    os.environ.setdefault("IN_ENG_AGENT_ID", "bench-in-en")
+    if args.db_uri:
+        os.environ["DB_URI"] = args.db_uri
+
+    import app as app_module
+    from werkzeug.serving import make_server
+    logging.getLogger("app").setLevel(logging.WARNING)
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    if args.warm:
+        print(f"Catalog: {app_module.refresh_catalog_index(full=True)}")
+        print(f"Stock: {app_module.refresh_stock_snapshot()}")
+
+    if args.asgi:
+        base_url, stop_server = serve_asgi()
+    else:
+        server = make_server("127.0.0.1", 0, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        stop_server = server.shutdown
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    results = {}
+    for path in [route.strip() for route in args.routes.split(",") if route.strip()]:
+        if path not in SCENARIOS:
+            print(f"Skipping unknown route {path}")
+            continue
+        results[path] = {}
+        for level in levels:
+            summary = drive_route(base_url, path, SCENARIOS[path], level, args.requests, state)
+            results[path][str(level)] = summary
+            print(f"{path:28} c={level:<4} p50={summary['p50_ms']}ms p95={summary['p95_ms']}ms "
+                  f"p99={summary['p99_ms']}ms rps={summary['throughput_rps']} errors={summary['errors']} "
+                  f"upstream/req={summary['upstream_calls_per_request']}")
+
+    if args.db_uri:
+        for name, summary in drive_sync(app_module, state, args.sync_runs).items():
+            results[name] = {"1": summary}
+            print(f"{name:28} runs={args.sync_runs} p50={summary['p50_ms']}ms errors={summary['errors']} "
+                  f"upstream={summary['upstream_calls']}")
+
+    stop_server()
+    stubs.stop()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "settings": {
+            "concurrency": levels,
+            "requests": args.requests,
+            "latency": args.latency,
+            "error_rate": args.error_rate,
+            "jitter": args.jitter,
+            "warm": args.warm,
+            "asgi": args.asgi
+        },
+        "results": results
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(os.path.join(BASELINE_DIR, f"{args.save_baseline}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline {args.save_baseline}")
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,400 @@
+"""
+Local stand-ins for the upstream APIs the wrapper talks to (Magento REST, Salesforce token/query/sobjects
+and Case change events over CometD, Verbex calls/analysis/dial), with configurable latency and error rates
+and per-operation call counters.
+
+Run on their own for manual testing:
+    python -m benchmark.stubs --latency salesforce=0.08,magento=0.05 --error-rate salesforce=0.02
+    python -m benchmark.stubs --case-changes-per-second 2   # with CASE_CDC_ENABLED=true in the wrapper
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote_plus
+
+PRODUCT_NAMES = [
+    "Samsung Galaxy S24 Ultra", "Samsung Galaxy S24", "Samsung Galaxy A15", "Samsung Galaxy Tab S9",
+    "Samsung 55 inch Crystal UHD TV", "Samsung 65 inch Neo QLED TV", "Samsung Refrigerator 300L",
+    "Samsung Side by Side Refrigerator", "Samsung Front Load Washing Machine 8kg", "Samsung Microwave Oven 23L",
+    "Samsung Split Air Conditioner 1.5 Ton", "Samsung Galaxy Buds2 Pro", "Samsung Galaxy Watch6"
+]
+
+class UpstreamProfile:
+    """Latency (seconds, +/- `jitter` fraction) and error rate of one stand-in upstream."""
+    def __init__(self, latency=0.0, jitter=0.2, error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(max(0.0, random.uniform(self.latency * (1 - self.jitter), self.latency * (1 + self.jitter))))
+
+    def should_fail(self):
+        return random.random() < self.error_rate
+
+class StubState:
+    """Shared fake data and counters for all stand-ins."""
+    def __init__(self, products=500, calls_per_agent=100, messages_per_call=40, cases=300):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.products = [
+            {
+                "id": i + 1,
+                "sku": f"SKU-{i + 1:05d}",
+                "name": f"{PRODUCT_NAMES[i % len(PRODUCT_NAMES)]} {i // len(PRODUCT_NAMES) or ''}".strip(),
+                "price": round(100 + (i * 37) % 2000, 2),
+                "updated_at": f"2025-06-{1 + i % 28:02d} 10:00:00"
+            }
+            for i in range(products)
+        ]
+        self.calls_per_agent = calls_per_agent
+        self.messages_per_call = messages_per_call
+        self.cases = [
+            {
+                "Id": f"500STUB{i:08d}",
+                "CaseNumber": f"{i + 1:08d}",
+                "Subject": "TV Issue",
+                "Description": "TV display broken.",
+                "Status": "New" if i % 3 else "Closed",
+                "Priority": "Medium",
+                "Origin": "Web",
+                "Type": "Service",
+                "Reason": ["Service", "Complaint", "Delivery"][i % 3],
+                "AccountId": f"001STUB{i % 50:08d}",
+                "CreatedDate": "2025-06-18T04:51:06.000+0000",
+                "ClosedDate": None,
+                "Customer_Note__c": None,
+                "Account": {"Name": f"Customer {i % 50}", "Phone": f"0170000{i % 50:04d}"}
+            }
+            for i in range(cases)
+        ]
+        self.api_used = 0
+        self.case_events = []
+        self.case_events_changed = threading.Condition()
+        self.cometd_clients = {}
+        self.cometd_wait_seconds = 2.0
+
+    def publish_case_change(self, change_type, case_id, **fields):
+        """Applies a change to the fake cases and queues it as a Case change event with the next replay ID."""
+        with self.lock:
+            case = next((c for c in self.cases if c["Id"] == case_id), None)
+            if change_type == "DELETE" and case is not None:
+                self.cases.remove(case)
+            elif case is not None:
+                case.update(fields)
+        with self.case_events_changed:
+            payload = {
+                "ChangeEventHeader": {
+                    "entityName": "Case", "recordIds": [case_id], "changeType": change_type,
+                    "changedFields": list(fields) if change_type == "UPDATE" else [],
+                    "commitTimestamp": int(time.time() * 1000)
+                },
+                **fields
+            }
+            replay_id = len(self.case_events) + 1
+            self.case_events.append({"data": {"schema": "stub", "payload": payload, "event": {"replayId": replay_id}}})
+            self.case_events_changed.notify_all()
+        return replay_id
+
+    def count(self, operation):
+        with self.lock:
+            self.counts[operation] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts.clear()
+
+    def snapshot_counts(self):
+        with self.lock:
+            return dict(self.counts)
+
+def _handler(upstream, profile, state, route):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle on, each response waits for a delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body=None, headers=None):
+            payload = b"" if body is None else (body if isinstance(body, bytes) else json.dumps(body).encode())
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _handle(self, method):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            parsed = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+            profile.delay()
+            operation, status, body, headers = route(method, parsed.path, query, raw, state)
+            state.count(f"{upstream}.{operation}")
+            if profile.should_fail():
+                status, body = 503, {"error": "stub failure"}
+            self._reply(status, body, headers)
+
+        def do_GET(self):
+            self._handle("GET")
+
+        def do_POST(self):
+            self._handle("POST")
+
+        def do_PATCH(self):
+            self._handle("PATCH")
+
+    return Handler
+
+def magento_route(method, path, query, raw, state):
+    if path.endswith("/integration/admin/token"):
+        return "token", 200, b'"stub-magento-token"', None
+    if path.endswith("/V1/products"):
+        items = state.products
+        field = query.get("searchCriteria[filterGroups][0][filters][0][field]")
+        value = query.get("searchCriteria[filterGroups][0][filters][0][value]", "")
+        if field == "name":
+            needle = value.strip("%").lower()
+            items = [p for p in items if needle in p["name"].lower()]
+        elif field == "updated_at":
+            items = [p for p in items if p["updated_at"] > value]
+        page_size = int(query.get("searchCriteria[pageSize]", len(items) or 1))
+        page = int(query.get("searchCriteria[currentPage]", 1))
+        page_items = items[(page - 1) * page_size: page * page_size]
+        return "products", 200, {"items": page_items, "total_count": len(items)}, None
+    match = re.search(r"/stockItems/(.+)$", path)
+    if match:
+        sku = unquote_plus(match.group(1))
+        return "stock", 200, {"sku": sku, "qty": sum(map(ord, sku)) % 40}, None
+    if path.endswith("/inventory/source-items"):
+        page_size = int(query.get("searchCriteria[pageSize]", 1000))
+        page = int(query.get("searchCriteria[currentPage]", 1))
+        items = [
+            {"sku": p["sku"], "source_code": "default", "quantity": sum(map(ord, p["sku"])) % 40, "status": 1}
+            for p in state.products[(page - 1) * page_size: page * page_size]
+        ]
+        return "stock_bulk", 200, {"items": items, "total_count": len(state.products)}, None
+    return "unknown", 404, {"message": "not found"}, None
+
+def select_fields(record, soql):
+    """The fields of `record` a SOQL SELECT list asks for, with relationship fields (Account.Phone) nested."""
+    match = re.search(r"SELECT\s+(.*?)\s+FROM\s", soql, re.S | re.I)
+    if not match:
+        return dict(record)
+    selected = {}
+    for field in (f.strip() for f in match.group(1).split(",")):
+        if "." in field:
+            relation, name = field.split(".", 1)
+            if isinstance(record.get(relation), dict):
+                selected.setdefault(relation, {})[name] = record[relation].get(name)
+        elif field in record:
+            selected[field] = record[field]
+    return selected
+
+def cometd_route(raw, state):
+    """Bayeux handshake/subscribe/connect over long-polling, serving `state.case_events` from the subscribed replay ID."""
+    replies = []
+    for message in json.loads(raw or b"[]"):
+        channel = message.get("channel")
+        if channel == "/meta/handshake":
+            replies.append({"channel": channel, "successful": True, "version": "1.0",
+                            "clientId": f"stub-{random.randint(0, 10**8)}", "supportedConnectionTypes": ["long-polling"]})
+        elif channel == "/meta/subscribe":
+            subscription = message.get("subscription")
+            replay_id = (message.get("ext") or {}).get("replay", {}).get(subscription, -1)
+            with state.case_events_changed:
+                if replay_id > len(state.case_events):
+                    replies.append({"channel": channel, "successful": False, "subscription": subscription,
+                                    "error": f"400::The replayId {{{replay_id}}} you provided was invalid."})
+                    continue
+                position = len(state.case_events) if replay_id == -1 else max(replay_id, 0)
+                state.cometd_clients[message.get("clientId")] = [subscription, position]
+            replies.append({"channel": channel, "successful": True, "subscription": subscription})
+        elif channel == "/meta/connect":
+            client = state.cometd_clients.get(message.get("clientId"))
+            if client is None:
+                replies.append({"channel": channel, "successful": False, "error": "403::Unknown client",
+                                "advice": {"reconnect": "handshake"}})
+                continue
+            with state.case_events_changed:
+                state.case_events_changed.wait_for(lambda: len(state.case_events) > client[1], state.cometd_wait_seconds)
+                events = state.case_events[client[1]:]
+                client[1] = len(state.case_events)
+            replies.extend(dict(event, channel=client[0]) for event in events)
+            replies.append({"channel": channel, "successful": True})
+    return "cometd", 200, replies, None
+
+def salesforce_route(method, path, query, raw, state):
+    # Streaming API traffic does not count against the REST API limit
+    if re.search(r"/cometd/[\d.]+$", path):
+        return cometd_route(raw, state)
+    with state.lock:
+        state.api_used += 1
+        limit_headers = {"Sforce-Limit-Info": f"api-usage={state.api_used}/100000"}
+    if path.endswith("/oauth2/token"):
+        return "token", 200, {"access_token": "stub-salesforce-token", "instance_url": "", "token_type": "Bearer"}, None
+    if path.endswith("/query") or "/query/" in path:
+        soql = query.get("q", "")
+        if "FROM Account" in soql:
+            records = [{"attributes": {"type": "Account"}, "Id": "001STUB00000001", "Name": "Customer 1", "Phone": "01700000001"}]
+        elif "FROM Opportunity" in soql:
+            records = [{"attributes": {"type": "Opportunity"}, "Id": "006STUB00000001", "Name": "Order for Fridge",
+                        "CloseDate": "2025-08-02"}]
+        else:
+            records = state.cases
+            match = re.search(r"Id IN \(([^)]*)\)", soql)
+            if match:
+                ids = set(re.findall(r"'([^']+)'", match.group(1)))
+                records = [c for c in records if c["Id"] in ids]
+            match = re.search(r"CaseNumber = '(\d+)'", soql)
+            if match:
+                records = [c for c in records if c["CaseNumber"] == match.group(1)]
+            match = re.search(r"Account\.Phone = '([^']+)'", soql)
+            if match:
+                records = [c for c in records if c["Account"]["Phone"] == match.group(1)]
+            match = re.search(r"Reason = '([^']+)'", soql)
+            if match:
+                records = [c for c in records if c["Reason"].lower() == match.group(1).lower()]
+            if "Status != 'Closed'" in soql:
+                records = [c for c in records if c["Status"] != "Closed"]
+            match = re.search(r"CreatedDate <= (\S+)", soql)
+            if match:
+                cutoff = datetime.fromisoformat(match.group(1).replace("Z", "+00:00"))
+                records = [c for c in records if datetime.strptime(c["CreatedDate"], "%Y-%m-%dT%H:%M:%S.%f%z") <= cutoff]
+            records = [dict(select_fields(c, soql), attributes={"type": "Case"}) for c in records]
+        return "query", 200, {"totalSize": len(records), "done": True, "records": records}, limit_headers
+    if "/composite/sobjects" in path:
+        records = json.loads(raw or b"{}").get("records", [])
+        return "composite", 200, [{"id": r.get("id"), "success": True, "errors": []} for r in records], limit_headers
+    match = re.search(r"/sobjects/(\w+)(?:/(\w+))?$", path)
+    if match:
+        sobject, record_id = match.groups()
+        if method == "POST":
+            return "sobjects", 201, {"id": f"STUB{random.randint(0, 10**8):010d}", "success": True, "errors": []}, limit_headers
+        if method == "PATCH":
+            return "sobjects", 204, None, limit_headers
+        return "sobjects", 200, {"Id": record_id, "CaseNumber": f"{random.randint(1, 99999999):08d}"}, limit_headers
+    return "unknown", 404, [{"message": "not found"}], None
+
+def verbex_route(method, path, query, raw, state):
+    if path.endswith("/dial-outbound-phone-call"):
+        return "dial", 200, {"call_id": f"call_{random.randint(0, 10**8)}", "status": "queued"}, None
+    if "/postcall-analysis/results/" in path:
+        return "analysis", 200, {"data": {"items": [
+            {"name": "Products Searched ", "result": "1. Galaxy S24 2. Refrigerator"},
+            {"name": "Customer Sentiment", "result": "Positive"}
+        ]}}, None
+    match = re.search(r"/v1/calls/([^/]+)$", path)
+    if match and match.group(1) != "dial-outbound-phone-call":
+        return "call", 200, _stub_call(query.get("ai_agent_ids", "agent"), match.group(1), state), None
+    if path.endswith("/v1/calls"):
+        agent_id = query.get("ai_agent_ids", "agent")
+        page_size = int(query.get("page_size", 100))
+        page = int(query.get("page", 1))
+        start = (page - 1) * page_size
+        calls = [_stub_call(agent_id, f"{agent_id}-{i}", state)
+                 for i in range(start, min(start + page_size, state.calls_per_agent))]
+        return "calls", 200, {"calls": calls, "total": state.calls_per_agent}, None
+    return "unknown", 404, {"detail": "not found"}, None
+
+def _stub_call(agent_id, call_id, state):
+    messages = [{"role": "assistant", "content": "(0.8s - Playing welcome message) Hello!"}]
+    messages += [
+        {"role": "user" if i % 2 else "assistant", "content": f"({1.0 + i * 2.5}s - turn) Message {i}"}
+        for i in range(1, state.messages_per_call)
+    ]
+    return {
+        "_id": call_id,
+        "ai_agent_id": agent_id,
+        "ai_agent_name": f"Agent {agent_id}",
+        "call_status": "completed",
+        "call_start_time": "2025-07-01T10:00:00Z",
+        "call_end_time": "2025-07-01T10:05:00Z",
+        "recorded_call_audio_url": f"https://example.invalid/{call_id}.mp3",
+        "call_duration_seconds": 300,
+        "call_type": "inbound",
+        "call_finish_reason": "user_hangup",
+        "messages": messages
+    }
+
+ROUTES = {"magento": magento_route, "salesforce": salesforce_route, "verbex": verbex_route}
+
+class StubServers:
+    """Starts one threaded HTTP server per upstream on free localhost ports."""
+    def __init__(self, profiles=None, state=None):
+        self.state = state or StubState()
+        self.profiles = {name: (profiles or {}).get(name, UpstreamProfile()) for name in ROUTES}
+        self.servers = {}
+
+    def start(self):
+        for name, route in ROUTES.items():
+            server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(name, self.profiles[name], self.state, route))
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            self.servers[name] = server
+        return self
+
+    def url(self, name):
+        host, port = self.servers[name].server_address
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment variables that point the wrapper at these stand-ins."""
+        return {
+            "MAGENTO_BASE_URL": self.url("magento"),
+            "MAGENTO_USERNAME": "stub",
+            "MAGENTO_PASSWORD": "stub",
+            "SALESFORCE_INSTANCE_URL": self.url("salesforce"),
+            "SALESFORCE_TOKEN_URL": f"{self.url('salesforce')}/services/oauth2/token",
+            "SALESFORCE_USERNAME": "stub@example.invalid",
+            "VERBEX_API_BASE_URL": self.url("verbex"),
+            "AUTH_TOKEN": "stub-verbex-token"
+        }
+
+    def stop(self):
+        for server in self.servers.values():
+            server.shutdown()
+
+def parse_profiles(latency="", error_rate="", jitter=0.2):
+    """Parses "salesforce=0.08,magento=0.05" style options into UpstreamProfiles."""
+    def parse(option):
+        return {k.strip(): float(v) for k, v in (item.split("=", 1) for item in option.split(",") if "=" in item)}
+    latencies, errors = parse(latency), parse(error_rate)
+    return {
+        name: UpstreamProfile(latencies.get(name, 0.0), jitter, errors.get(name, 0.0))
+        for name in ROUTES
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run local stand-ins for Magento, Salesforce and Verbex.")
+    parser.add_argument("--latency", default="", help="per-upstream latency in seconds, e.g. salesforce=0.08")
+    parser.add_argument("--error-rate", default="", help="per-upstream error rate, e.g. magento=0.05")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--case-changes-per-second", type=float, default=0,
+                        help="publish random Case status changes as change events")
+    args = parser.parse_args()
+
+    stubs = StubServers(parse_profiles(args.latency, args.error_rate, args.jitter)).start()
+    for key, value in stubs.env().items():
+        print(f"{key}={value}")
+    try:
+        while True:
+            if args.case_changes_per_second > 0:
+                time.sleep(1 / args.case_changes_per_second)
+                case = random.choice(stubs.state.cases)
+                stubs.state.publish_case_change("UPDATE", case["Id"], Status=random.choice(["New", "Working", "Closed"]))
+            else:
+                time.sleep(3600)
+    except KeyboardInterrupt:
+        stubs.stop()